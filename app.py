@@ -1,47 +1,204 @@
 
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, Response, abort, g, jsonify, request, stream_with_context
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
 import json
+import hmac
 import jwt
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
+import math
 import secrets
+import threading
+import time
 import uuid
 from dotenv import load_dotenv
 import requests
 from functools import wraps
 import bcrypt
 from dateutil import parser
+from services.passwords import PasswordHasher, PasswordHasherBusy
+from services.verification import create_verification_store, VERIFIED, EXPIRED, LOCKED
+from services.tokens import create_revocation_list, new_token_id
+from services.ratelimit import create_bucket_store, route_group, check_limits
+from services.admission import AdmissionController, route_class
+from services.catalog import CatalogCache, dumps
+from services.compression import negotiate_encoding, compress, is_compressible
+from services.static import StaticAssets
+from services.metrics import registry, SharedMetrics, REQUESTS, REQUEST_LATENCY, time_upstream
+from services.tracing import SlowRequestLog, TracedJSONProvider, finish_trace, span, start_trace, traced_view
+from services.memory import MemoryMonitor
 
 # Load environment variables
 load_dotenv()
 
 # Initialize Flask app
 app = Flask(__name__, static_folder='dist')
+app.json = TracedJSONProvider(app)
 CORS(app)
 
+# Number of reverse proxies in front of the app (1 behind the Heroku router).
+# Only the X-Forwarded-For hops they appended are trusted; with 0 the header
+# is ignored, since clients can set it to anything.
+TRUSTED_PROXY_COUNT = int(os.getenv('TRUSTED_PROXY_COUNT', 0))
+if TRUSTED_PROXY_COUNT > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_COUNT)
+
 # Configuration
 SECRET_KEY = os.getenv('JWT_SECRET_KEY', secrets.token_hex(32))
 WEATHER_API_KEY = os.getenv('WEATHER_API_KEY', 'YOUR_OPENWEATHERMAP_API_KEY')
+WEATHER_API_URL = os.getenv('WEATHER_API_URL', 'https://api.openweathermap.org/data/2.5')
 SUPABASE_URL = os.getenv('SUPABASE_URL', 'YOUR_SUPABASE_URL')
 SUPABASE_KEY = os.getenv('SUPABASE_KEY', 'YOUR_SUPABASE_KEY')
 
+# Password hashing runs on a bounded pool so a burst of logins cannot tie up
+# every request worker. The method string uses werkzeug's format, e.g.
+# "pbkdf2:sha256:600000" or "scrypt:32768:8:1"; changing it upgrades stored
+# hashes the next time each user logs in.
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 4))
+PASSWORD_HASH_QUEUE = int(os.getenv('PASSWORD_HASH_QUEUE', 16))
+PASSWORD_HASH_PER_CLIENT = int(os.getenv('PASSWORD_HASH_PER_CLIENT', 2))
+
+password_hasher = PasswordHasher(
+    PASSWORD_HASH_METHOD,
+    max_workers=PASSWORD_HASH_WORKERS,
+    max_pending=PASSWORD_HASH_QUEUE,
+    per_client=PASSWORD_HASH_PER_CLIENT
+)
+
+# Verification codes expire and are bounded in number. Set
+# VERIFICATION_DB_PATH to share them between workers through SQLite.
+VERIFICATION_DB_PATH = os.getenv('VERIFICATION_DB_PATH')
+VERIFICATION_CODE_TTL = int(os.getenv('VERIFICATION_CODE_TTL', 15 * 60))
+VERIFICATION_CODE_MAX = int(os.getenv('VERIFICATION_CODE_MAX', 10000))
+VERIFICATION_MAX_ATTEMPTS = int(os.getenv('VERIFICATION_MAX_ATTEMPTS', 5))
+
+# Access tokens are short-lived; refresh tokens let clients renew them with a
+# signature check instead of another password hash. Refresh tokens rotate on
+# every use and revocations are shared through SQLite when
+# REVOCATION_DB_PATH is set.
+ACCESS_TOKEN_MINUTES = int(os.getenv('ACCESS_TOKEN_MINUTES', 30))
+REFRESH_TOKEN_DAYS = int(os.getenv('REFRESH_TOKEN_DAYS', 30))
+REVOCATION_DB_PATH = os.getenv('REVOCATION_DB_PATH')
+
+# Token bucket rate limiting per IP, user and route group. Set
+# RATE_LIMIT_DB_PATH to share buckets between workers through SQLite.
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+RATE_LIMIT_DB_PATH = os.getenv('RATE_LIMIT_DB_PATH')
+
+# Admission control: at most ADMISSION_CAPACITY requests run at once, in
+# route classes with their own limits and queues (see services/admission.py).
+# Shed requests are told to retry after ADMISSION_RETRY_AFTER seconds. Limits
+# are per process and only matter with threaded workers; gunicorn.conf.py runs
+# gthread workers and sizes the capacity to their threads.
+ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'true').lower() == 'true'
+ADMISSION_CAPACITY = int(os.getenv('ADMISSION_CAPACITY', 64))
+ADMISSION_INTERVAL = float(os.getenv('ADMISSION_INTERVAL', 1.0))
+ADMISSION_RETRY_AFTER = float(os.getenv('ADMISSION_RETRY_AFTER', 2))
+
+# Data files are cached in memory along with their encoded JSON views and
+# reloaded when they change on disk
+DATA_DIR = os.getenv('DATA_DIR', 'data')
+CATALOG_CHECK_INTERVAL = float(os.getenv('CATALOG_CHECK_INTERVAL', 2))
+
+# Responses smaller than this are sent uncompressed
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+
+# Request counts and latency per route, served in the Prometheus text format
+# at /api/metrics. Each worker process keeps its own counts; when
+# METRICS_DIR is set (gunicorn.conf.py sets it), workers write their counts
+# there every METRICS_WRITE_INTERVAL seconds and a scrape reports the sum.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+METRICS_WRITE_INTERVAL = float(os.getenv('METRICS_WRITE_INTERVAL', 5))
+
+# Each request is traced (JSON parsing, auth, upstream calls, the view and
+# serialization). Requests slower than SLOW_REQUEST_MS are written with their
+# spans as JSON lines to SLOW_REQUEST_LOG, which rotates at
+# SLOW_REQUEST_LOG_MAX_BYTES and keeps SLOW_REQUEST_LOG_BACKUPS old files.
+TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'true').lower() == 'true'
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', 1000))
+SLOW_REQUEST_LOG = os.getenv('SLOW_REQUEST_LOG', os.path.join(DATA_DIR, 'slow-requests.log'))
+SLOW_REQUEST_LOG_MAX_BYTES = int(os.getenv('SLOW_REQUEST_LOG_MAX_BYTES', 10 * 1024 * 1024))
+SLOW_REQUEST_LOG_BACKUPS = int(os.getenv('SLOW_REQUEST_LOG_BACKUPS', 5))
+
+# Memory accounting. Every MEMORY_LOG_INTERVAL seconds (0 turns it off) the
+# RSS and each in-memory store's size are printed, along with the MEMORY_TOP
+# allocation sites that grew the most while tracemalloc is tracing.
+# MEMORY_TRACEMALLOC starts tracing with the first request, keeping
+# MEMORY_TRACEMALLOC_FRAMES frames per allocation; it can also be switched
+# on and off through /api/admin/memory/tracemalloc. The last
+# MEMORY_MAX_SNAPSHOTS snapshots are kept for diffing.
+MEMORY_LOG_INTERVAL = float(os.getenv('MEMORY_LOG_INTERVAL', 600))
+MEMORY_TRACEMALLOC = os.getenv('MEMORY_TRACEMALLOC', 'false').lower() == 'true'
+MEMORY_TRACEMALLOC_FRAMES = int(os.getenv('MEMORY_TRACEMALLOC_FRAMES', 1))
+MEMORY_MAX_SNAPSHOTS = int(os.getenv('MEMORY_MAX_SNAPSHOTS', 5))
+MEMORY_TOP = int(os.getenv('MEMORY_TOP', 10))
+
+# Shared key for the /api/admin endpoints (sent as X-Admin-Key); they are
+# disabled when it is empty
+ADMIN_API_KEY = os.getenv('ADMIN_API_KEY', '')
+
 # Mock database (replace with actual database in production)
 users_db = {}
 profiles_db = {}
 itineraries_db = {}
 activities_db = {}
-verification_codes = {}
+verification_codes = create_verification_store(
+    VERIFICATION_DB_PATH,
+    ttl=VERIFICATION_CODE_TTL,
+    max_size=VERIFICATION_CODE_MAX,
+    max_attempts=VERIFICATION_MAX_ATTEMPTS
+)
+revoked_tokens = create_revocation_list(REVOCATION_DB_PATH)
+rate_limit_buckets = create_bucket_store(RATE_LIMIT_DB_PATH)
+admission = AdmissionController(
+    capacity=ADMISSION_CAPACITY, interval=ADMISSION_INTERVAL, retry_after=ADMISSION_RETRY_AFTER
+)
+catalog_cache = CatalogCache(DATA_DIR, check_interval=CATALOG_CHECK_INTERVAL)
+slow_request_log = SlowRequestLog(SLOW_REQUEST_LOG, SLOW_REQUEST_LOG_MAX_BYTES, SLOW_REQUEST_LOG_BACKUPS)
+static_assets = StaticAssets(app.static_folder)
+memory_monitor = MemoryMonitor(MEMORY_MAX_SNAPSHOTS, MEMORY_TOP)
+
+# Stores accounted for by /api/admin/memory and the periodic memory log
+for name, store in [
+    ('users_db', users_db),
+    ('profiles_db', profiles_db),
+    ('itineraries_db', itineraries_db),
+    ('activities_db', activities_db),
+    ('verification_codes', verification_codes),
+    ('revoked_tokens', revoked_tokens),
+    ('rate_limit_buckets', rate_limit_buckets),
+    ('catalog_cache', catalog_cache),
+    ('metrics', registry),
+]:
+    memory_monitor.register(name, store)
 
 # Helper function to load JSON data
 def load_json_data(filename):
-    try:
-        with open(f"data/{filename}", 'r', encoding='utf-8') as file:
-            return json.load(file)
-    except FileNotFoundError:
+    data = catalog_cache.load(filename)
+    if data is None:
         print(f"Warning: Data file {filename} not found")
         return []
+    return data
+
+# Response for JSON that has already been encoded
+def json_response(payload, status=200, encoding=None):
+    response = Response(payload, status=status, mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+# Serve a cached view of a data file, pre-compressed when the client allows it;
+# views keyed by client-supplied text are cached with query=True
+def catalog_response(filename, key, build, query=False):
+    payload = catalog_cache.encoded(filename, key, build, query=query)
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    if encoding is None or len(payload) < COMPRESSION_MIN_SIZE:
+        return json_response(payload)
+    return json_response(catalog_cache.encoded(filename, key, build, encoding, query=query), encoding=encoding)
 
 # Generate UUID
 def generate_uuid():
@@ -59,35 +216,219 @@ def is_valid_email(email):
     # Basic validation - you may want to enhance this
     return '@' in email and '.' in email.split('@')[1]
 
+# Client address; ProxyFix resolves it from X-Forwarded-For behind trusted proxies
+def get_client_ip():
+    return request.remote_addr
+
+# Response for requests rejected because the hashing pool is busy
+def hasher_busy_response():
+    return jsonify({'message': 'Too many requests, please try again shortly'}), 429, {'Retry-After': '1'}
+
+# Issue an access token plus a rotated refresh token in the same family
+def issue_tokens(user_id, family_id=None):
+    now = datetime.utcnow()
+    access_token = jwt.encode({
+        'id': user_id,
+        'exp': now + timedelta(minutes=ACCESS_TOKEN_MINUTES)
+    }, SECRET_KEY, algorithm="HS256")
+    refresh_token = jwt.encode({
+        'id': user_id,
+        'type': 'refresh',
+        'jti': new_token_id(),
+        'fam': family_id or new_token_id(),
+        'exp': now + timedelta(days=REFRESH_TOKEN_DAYS)
+    }, SECRET_KEY, algorithm="HS256")
+    
+    return {
+        'access_token': access_token,
+        'refresh_token': refresh_token,
+        'token_type': 'bearer'
+    }
+
+# Read the refresh token from a JSON body or a form post
+def get_refresh_token():
+    data = request.get_json(silent=True) or request.form
+    return data.get('refresh_token') if data else None
+
 # JWT token required decorator
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
-        auth_header = request.headers.get('Authorization')
-        
-        if auth_header and auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
+        with span('auth'):
+            token = None
+            auth_header = request.headers.get('Authorization')
             
-        if not token:
-            return jsonify({'message': 'Token is missing'}), 401
-        
-        try:
-            data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-            current_user = users_db.get(data['id'])
+            if auth_header and auth_header.startswith('Bearer '):
+                token = auth_header.split(' ')[1]
             
-            if not current_user:
-                return jsonify({'message': 'User not found'}), 401
-                
-        except jwt.ExpiredSignatureError:
-            return jsonify({'message': 'Token has expired'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'message': 'Invalid token'}), 401
+            if not token:
+                return jsonify({'message': 'Token is missing'}), 401
+            
+            try:
+                data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+                if data.get('type') == 'refresh':
+                    return jsonify({'message': 'Invalid token'}), 401
+                current_user = users_db.get(data['id'])
+            
+                if not current_user:
+                    return jsonify({'message': 'User not found'}), 401
+            
+            except jwt.ExpiredSignatureError:
+                return jsonify({'message': 'Token has expired'}), 401
+            except jwt.InvalidTokenError:
+                return jsonify({'message': 'Invalid token'}), 401
             
         return f(current_user, *args, **kwargs)
         
     return decorated
 
+# Admin key required decorator; the admin routes 404 while no key is configured
+def admin_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not ADMIN_API_KEY:
+            abort(404)
+        key = request.headers.get('X-Admin-Key', '')
+        if not hmac.compare_digest(key.encode(), ADMIN_API_KEY.encode()):
+            return jsonify({'message': 'Invalid admin key'}), 403
+        return f(*args, **kwargs)
+        
+    return decorated
+
+# Start the request timer before anything else runs
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+# Start the request's trace
+@app.before_request
+def start_request_trace():
+    if TRACING_ENABLED:
+        g.trace_token = start_trace()
+    return None
+
+@app.after_request
+def remember_response_status(response):
+    g.response_status = response.status_code
+    return response
+
+# Write requests slower than SLOW_REQUEST_MS to the slow-request log, once
+# the response (streamed ones included) has been sent
+@app.teardown_request
+def finish_request_trace(exc):
+    token = g.pop('trace_token', None)
+    if token is None:
+        return
+    trace = finish_trace(token)
+    duration_ms = (time.perf_counter() - trace.started) * 1000
+    if duration_ms < SLOW_REQUEST_MS:
+        return
+    slow_request_log.write({
+        'time': datetime.utcnow().isoformat() + 'Z',
+        'method': request.method,
+        'path': request.path,
+        'route': request.url_rule.rule if request.url_rule is not None else 'unmatched',
+        'status': g.get('response_status', 500),
+        'duration_ms': round(duration_ms, 2),
+        'spans': trace.spans,
+    })
+
+# Record request count and latency by route template; registered before
+# compress_response so it runs after it and times the compression too
+@app.after_request
+def record_request_metrics(response):
+    start = g.get('request_start')
+    if METRICS_ENABLED and start is not None:
+        # Unmatched paths share one label so 404 probes cannot add a series per URL
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        REQUEST_LATENCY.observe(time.perf_counter() - start, request.method, route)
+        REQUESTS.inc(request.method, route, str(response.status_code))
+    return response
+
+# Rate limiting, applied before any route runs
+@app.before_request
+def enforce_rate_limits():
+    if not RATE_LIMIT_ENABLED or request.method == 'OPTIONS':
+        return None
+        
+    group = route_group(request.path)
+    if group is None:
+        return None
+        
+    # Key user buckets by the token's user id; invalid tokens fall back to IP only
+    user_id = None
+    auth_header = request.headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        try:
+            user_id = jwt.decode(auth_header[7:], SECRET_KEY, algorithms=["HS256"]).get('id')
+        except jwt.InvalidTokenError:
+            pass
+            
+    wait = check_limits(rate_limit_buckets, group, get_client_ip(), user_id)
+    if wait:
+        return jsonify({'message': 'Too many requests'}), 429, {'Retry-After': str(math.ceil(wait))}
+        
+    return None
+
+# Admission control, after rate limiting so clients over their limit get a
+# 429 without taking a slot; the slot is freed when the request is torn down
+@app.before_request
+def admit_request():
+    if not ADMISSION_ENABLED:
+        return None
+        
+    name = route_class(request.method, request.path)
+    if name is None:
+        return None
+        
+    with span('admission', route_class=name):
+        wait = admission.acquire(name)
+    if wait is not None:
+        return jsonify({'message': 'Server is busy, try again later'}), 503, {'Retry-After': str(math.ceil(wait))}
+        
+    g.admission_class = name
+    return None
+
+# Parse JSON bodies of admitted requests inside a span; views get the cached result
+@app.before_request
+def parse_json_body():
+    if TRACING_ENABLED and request.is_json and request.content_length:
+        with span('parse_json', bytes=request.content_length):
+            request.get_json(silent=True)
+    return None
+
+@app.teardown_request
+def release_admission(exc):
+    name = g.pop('admission_class', None)
+    if name is not None:
+        admission.release(name)
+
+# Compress responses that were not already pre-compressed
+@app.after_request
+def compress_response(response):
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+        or 'Content-Encoding' in response.headers
+        or not is_compressible(response.mimetype)
+    ):
+        return response
+        
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    if encoding is None:
+        return response
+        
+    body = response.get_data()
+    if len(body) < COMPRESSION_MIN_SIZE:
+        return response
+        
+    response.set_data(compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
 # Authentication routes
 @app.route('/api/token', methods=['POST'])
 def login():
@@ -113,20 +454,79 @@ def login():
     if not user.get('email_verified', False):
         return jsonify({'message': 'Email not verified', 'WWW-Authenticate': 'Bearer'}), 401
         
-    if check_password_hash(user.get('password_hash', ''), password):
-        # Generate token
-        token = jwt.encode({
-            'id': user['id'],
-            'exp': datetime.utcnow() + timedelta(minutes=30)
-        }, SECRET_KEY, algorithm="HS256")
+    client_ip = get_client_ip()
+    try:
+        password_valid = password_hasher.verify(user.get('password_hash', ''), password, client=client_ip)
+    except PasswordHasherBusy:
+        return hasher_busy_response()
         
-        return jsonify({
-            'access_token': token,
-            'token_type': 'bearer'
-        }), 200
+    if password_valid:
+        # Transparently upgrade hashes made with older parameters
+        if password_hasher.needs_rehash(user['password_hash']):
+            user_record = users_db[user['id']]
+            password_hasher.rehash_in_background(
+                password,
+                lambda new_hash: user_record.update(password_hash=new_hash),
+                client=client_ip
+            )
+        
+        # Generate tokens
+        return jsonify(issue_tokens(user['id'])), 200
         
     return jsonify({'message': 'Invalid credentials', 'WWW-Authenticate': 'Bearer'}), 401
 
+@app.route('/api/token/refresh', methods=['POST'])
+def refresh_access_token():
+    refresh_token = get_refresh_token()
+    
+    if not refresh_token:
+        return jsonify({'message': 'Refresh token is missing', 'WWW-Authenticate': 'Bearer'}), 401
+        
+    try:
+        data = jwt.decode(refresh_token, SECRET_KEY, algorithms=["HS256"])
+    except jwt.ExpiredSignatureError:
+        return jsonify({'message': 'Refresh token has expired', 'WWW-Authenticate': 'Bearer'}), 401
+    except jwt.InvalidTokenError:
+        return jsonify({'message': 'Invalid refresh token', 'WWW-Authenticate': 'Bearer'}), 401
+        
+    if data.get('type') != 'refresh':
+        return jsonify({'message': 'Invalid refresh token', 'WWW-Authenticate': 'Bearer'}), 401
+        
+    revoked_tokens.sweep()
+    
+    if data['id'] not in users_db:
+        return jsonify({'message': 'User not found', 'WWW-Authenticate': 'Bearer'}), 401
+        
+    # Rotate: the presented token can no longer be used. A rotated token
+    # being presented again means it leaked; revoke the whole family so the
+    # other holder is logged out too
+    if not revoked_tokens.consume(data['jti'], data['fam'], data['exp']):
+        revoked_tokens.revoke_family(data['fam'], time.time() + REFRESH_TOKEN_DAYS * 86400)
+        return jsonify({'message': 'Refresh token has been revoked', 'WWW-Authenticate': 'Bearer'}), 401
+    
+    return jsonify(issue_tokens(data['id'], data['fam'])), 200
+
+@app.route('/api/token/revoke', methods=['POST'])
+def revoke_refresh_token():
+    refresh_token = get_refresh_token()
+    
+    if not refresh_token:
+        return jsonify({'message': 'Refresh token is missing'}), 400
+        
+    try:
+        data = jwt.decode(refresh_token, SECRET_KEY, algorithms=["HS256"])
+    except jwt.InvalidTokenError:
+        return jsonify({'message': 'Invalid refresh token'}), 400
+        
+    if data.get('type') != 'refresh':
+        return jsonify({'message': 'Invalid refresh token'}), 400
+        
+    # Newer tokens of the family may outlive this one, so revoke it for as
+    # long as any of them can be valid
+    revoked_tokens.revoke_family(data['fam'], time.time() + REFRESH_TOKEN_DAYS * 86400)
+    
+    return '', 204
+
 @app.route('/api/auth/register', methods=['POST'])
 def register():
     data = request.json
@@ -152,11 +552,14 @@ def register():
     created_at = datetime.utcnow().isoformat()
     
     # Hash password
-    password_hash = generate_password_hash(password)
+    try:
+        password_hash = password_hasher.hash(password, client=get_client_ip())
+    except PasswordHasherBusy:
+        return hasher_busy_response()
     
     # Generate verification code
     verification_code = ''.join(secrets.choice('0123456789') for _ in range(6))
-    verification_codes[email] = verification_code
+    verification_codes.put(email, verification_code)
     
     # In a real app, you would send this code via email
     print(f"Verification code for {email}: {verification_code}")
@@ -192,18 +595,46 @@ def verify_email():
     code = data.get('code')
     
     # Check if verification code is valid
-    if verification_codes.get(email) != code:
+    result = verification_codes.check(email, code)
+    if result == EXPIRED:
+        return jsonify({'message': 'Verification code has expired'}), 400
+    if result == LOCKED:
+        return jsonify({'message': 'Too many invalid attempts, please request a new code'}), 429
+    if result != VERIFIED:
         return jsonify({'message': 'Invalid verification code'}), 400
         
     # Update user verification status
     for user_id, user_data in users_db.items():
         if user_data.get('email') == email:
             users_db[user_id]['email_verified'] = True
-            del verification_codes[email]
             return jsonify({'message': 'Email verified successfully'}), 200
             
     return jsonify({'message': 'User not found'}), 404
 
+# Issue a fresh code for an unverified account, replacing any expired,
+# evicted or locked one; rate limited with the other /api/auth routes
+@app.route('/api/auth/resend-verification', methods=['POST'])
+def resend_verification():
+    data = request.json
+
+    if not data or not data.get('email'):
+        return jsonify({'message': 'Missing required fields'}), 400
+
+    email = data.get('email')
+
+    # Only unverified accounts get a code, but the answer is the same either
+    # way so the endpoint does not reveal which emails are registered
+    for user_data in users_db.values():
+        if user_data.get('email') == email and not user_data.get('email_verified'):
+            verification_code = ''.join(secrets.choice('0123456789') for _ in range(6))
+            verification_codes.put(email, verification_code)
+
+            # In a real app, you would send this code via email
+            print(f"Verification code for {email}: {verification_code}")
+            break
+
+    return jsonify({'message': 'If the account is awaiting verification, a new code has been sent'}), 200
+
 @app.route('/api/auth/me', methods=['GET'])
 @token_required
 def get_current_user(current_user):
@@ -231,6 +662,47 @@ def get_user_itineraries(current_user):
     
     return jsonify(user_itineraries), 200
 
+@app.route('/api/itineraries/summary', methods=['GET'])
+@token_required
+def get_user_itinerary_summaries(current_user):
+    user_id = current_user.get('id')
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 100)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    
+    # Get user's itineraries, most recent first
+    user_itineraries = []
+    for itinerary_id, itinerary in itineraries_db.items():
+        if itinerary.get('user_id') == user_id:
+            user_itineraries.append({**itinerary, 'id': itinerary_id})
+    
+    user_itineraries.sort(key=lambda x: parser.parse(x.get('updated_at', x.get('created_at'))), reverse=True)
+    user_itineraries = user_itineraries[offset:offset + limit]
+    
+    # Group activities for the whole page in a single pass
+    page_activities = {itinerary['id']: [] for itinerary in user_itineraries}
+    for activity in activities_db.values():
+        if activity.get('itinerary_id') in page_activities:
+            page_activities[activity['itinerary_id']].append(activity)
+    
+    summaries = []
+    for itinerary in user_itineraries:
+        activities = sorted(page_activities[itinerary['id']], key=lambda x: (x.get('day', 0), x.get('time', '')))
+        
+        categories = []
+        for activity in activities:
+            if activity.get('category') and activity['category'] not in categories:
+                categories.append(activity['category'])
+        
+        summaries.append({
+            **itinerary,
+            'activity_count': len(activities),
+            'day_count': len({activity.get('day') for activity in activities}),
+            'first_image': next((a['image'] for a in activities if a.get('image')), None),
+            'categories': categories
+        })
+    
+    return jsonify(summaries), 200
+
 @app.route('/api/itineraries/<itinerary_id>', methods=['GET'])
 @token_required
 def get_itinerary_by_id(current_user, itinerary_id):
@@ -510,7 +982,7 @@ def get_places():
     if not places:
         return jsonify({'message': 'Places data not found'}), 500
     
-    return jsonify(places), 200
+    return catalog_response('places.json', 'all', lambda data: data)
 
 @app.route('/api/restaurants', methods=['GET'])
 def get_restaurants():
@@ -519,7 +991,7 @@ def get_restaurants():
     if not restaurants:
         return jsonify({'message': 'Restaurants data not found'}), 500
     
-    return jsonify(restaurants), 200
+    return catalog_response('restaurants.json', 'all', lambda data: data)
 
 @app.route('/api/places/nearby', methods=['GET'])
 def get_nearby_places():
@@ -532,15 +1004,36 @@ def get_nearby_places():
     if not places:
         return jsonify({'message': 'Places data not found'}), 500
     
-    # Simulate distance calculation
+    # Simulate distance calculation on copies so the cached data is not mutated
     import random
-    for place in places:
-        place['distance'] = random.randint(100, radius)
+    places = [{**place, 'distance': random.randint(100, radius)} for place in places]
     
     # Filter places within radius
     nearby = [p for p in places if p.get('distance', 0) <= radius]
     
-    return jsonify(nearby), 200
+    return json_response(dumps(nearby))
+
+# Yield the generated itinerary one day at a time so it can be streamed
+def iter_itinerary_days(template, data):
+    days = data.get('days', 3)
+    pace = data.get('pace', 'moderate')
+    interests = data.get('interests', [])
+    
+    # Adjust activities based on pace
+    activities_per_day = 3  # Default for moderate pace
+    if pace == 'relaxed':
+        activities_per_day = 2
+    elif pace == 'intensive':
+        activities_per_day = 4
+    
+    # Generate itinerary
+    for day in range(1, days + 1):
+        day_activities = template.get('activities', [])[:activities_per_day]
+        
+        yield {
+            'day': day,
+            'activities': day_activities
+        }
 
 @app.route('/api/generate-itinerary', methods=['POST'])
 def generate_itinerary():
@@ -554,30 +1047,41 @@ def generate_itinerary():
     if not template:
         return jsonify({'message': 'Itinerary template not found'}), 500
     
-    days = data.get('days', 3)
-    pace = data.get('pace', 'moderate')
-    interests = data.get('interests', [])
+    result = list(iter_itinerary_days(template, data))
     
-    result = []
+    return jsonify(result), 200
+
+@app.route('/api/generate-itinerary/stream', methods=['POST'])
+def generate_itinerary_stream():
+    data = request.json
     
-    # Generate itinerary
-    for day in range(1, days + 1):
-        # Adjust activities based on pace
-        activities_per_day = 3  # Default for moderate pace
-        if pace == 'relaxed':
-            activities_per_day = 2
-        elif pace == 'intensive':
-            activities_per_day = 4
-        
-        day_activities = template.get('activities', [])[:activities_per_day]
-        
-        day_data = {
-            'day': day,
-            'activities': day_activities
-        }
-        result.append(day_data)
+    if not data:
+        return jsonify({'message': 'No data provided'}), 400
     
-    return jsonify(result), 200
+    template = load_json_data('itinerary_template.json')
+    
+    if not template:
+        return jsonify({'message': 'Itinerary template not found'}), 500
+    
+    days = iter_itinerary_days(template, data)
+    
+    # Server-Sent Events for EventSource-style clients, NDJSON otherwise
+    if 'text/event-stream' in request.headers.get('Accept', ''):
+        def body():
+            for day in days:
+                yield f"event: day\ndata: {json.dumps(day)}\n\n"
+            yield "event: done\ndata: {}\n\n"
+        mimetype = 'text/event-stream'
+    else:
+        def body():
+            for day in days:
+                yield json.dumps(day) + '\n'
+        mimetype = 'application/x-ndjson'
+    
+    return Response(stream_with_context(body()), mimetype=mimetype, headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
 
 @app.route('/api/places/search', methods=['GET'])
 def search_places():
@@ -589,18 +1093,21 @@ def search_places():
     if not places:
         return jsonify({'message': 'Places data not found'}), 500
     
-    results = []
-    
-    for place in places:
-        name = place.get('name', '').lower()
-        description = place.get('description', '').lower()
-        place_category = place.get('category', '').lower()
+    def search(places):
+        results = []
         
-        if query in name or query in description:
-            if category is None or (category and category.lower() == place_category):
-                results.append(place)
+        for place in places:
+            name = place.get('name', '').lower()
+            description = place.get('description', '').lower()
+            place_category = place.get('category', '').lower()
+            
+            if query in name or query in description:
+                if category is None or (category and category.lower() == place_category):
+                    results.append(place)
+        
+        return results
     
-    return jsonify(results), 200
+    return catalog_response('places.json', ('search', query, category), search, query=True)
 
 # Weather routes
 @app.route('/api/weather', methods=['GET'])
@@ -610,10 +1117,11 @@ def get_weather():
     if not city:
         return jsonify({'message': 'City parameter is required'}), 400
     
-    url = f"https://api.openweathermap.org/data/2.5/weather?q={city}&units=metric&appid={WEATHER_API_KEY}"
+    url = f"{WEATHER_API_URL}/weather?q={city}&units=metric&appid={WEATHER_API_KEY}"
     
     try:
-        response = requests.get(url)
+        with time_upstream('openweathermap', 'weather'):
+            response = requests.get(url)
         response.raise_for_status()
         return jsonify(response.json()), 200
     except requests.exceptions.RequestException as e:
@@ -630,10 +1138,11 @@ def get_weather_forecast():
     if days < 1 or days > 7:
         return jsonify({'message': 'Days parameter must be between 1 and 7'}), 400
     
-    url = f"https://api.openweathermap.org/data/2.5/forecast?q={city}&units=metric&appid={WEATHER_API_KEY}"
+    url = f"{WEATHER_API_URL}/forecast?q={city}&units=metric&appid={WEATHER_API_KEY}"
     
     try:
-        response = requests.get(url)
+        with time_upstream('openweathermap', 'forecast'):
+            response = requests.get(url)
         response.raise_for_status()
         data = response.json()
         
@@ -693,10 +1202,11 @@ def get_weather_recommendation():
     if not city:
         return jsonify({'message': 'City parameter is required'}), 400
     
-    url = f"https://api.openweathermap.org/data/2.5/weather?q={city}&units=metric&appid={WEATHER_API_KEY}"
+    url = f"{WEATHER_API_URL}/weather?q={city}&units=metric&appid={WEATHER_API_KEY}"
     
     try:
-        response = requests.get(url)
+        with time_upstream('openweathermap', 'weather'):
+            response = requests.get(url)
         response.raise_for_status()
         weather_data = response.json()
         
@@ -761,84 +1271,187 @@ def get_weather_recommendation():
     except requests.exceptions.RequestException as e:
         return jsonify({'message': f'Failed to generate weather recommendation: {str(e)}'}), 500
 
+# Metrics in the Prometheus text format
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    if not METRICS_ENABLED:
+        abort(404)
+    body = shared_metrics.render() if shared_metrics is not None else registry.render()
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+# Memory usage of the in-memory stores and caches, and tracemalloc state
+@app.route('/api/admin/memory', methods=['GET'])
+@admin_required
+def get_memory():
+    sample = max(1, min(request.args.get('sample', 200, type=int), 10000))
+    return jsonify(memory_monitor.report(sample)), 200
+
+@app.route('/api/admin/memory/tracemalloc', methods=['POST'])
+@admin_required
+def start_tracemalloc():
+    frames = max(1, min(request.args.get('frames', 1, type=int), 100))
+    memory_monitor.start_tracing(frames)
+    return jsonify(memory_monitor.report()['tracemalloc']), 200
+
+@app.route('/api/admin/memory/tracemalloc', methods=['DELETE'])
+@admin_required
+def stop_tracemalloc():
+    memory_monitor.stop_tracing()
+    return jsonify(memory_monitor.report()['tracemalloc']), 200
+
+@app.route('/api/admin/memory/snapshots', methods=['POST'])
+@admin_required
+def take_memory_snapshot():
+    try:
+        return jsonify(memory_monitor.take_snapshot()), 200
+    except RuntimeError as e:
+        return jsonify({'message': str(e)}), 409
+
+# Compare a snapshot with a later one, or with a new one when no target is given
+@app.route('/api/admin/memory/snapshots/<int:base_id>/diff', methods=['GET'])
+@admin_required
+def diff_memory_snapshots(base_id):
+    target = request.args.get('target', type=int)
+    limit = request.args.get('limit', type=int)
+    try:
+        return jsonify(memory_monitor.diff(base_id, target, limit)), 200
+    except KeyError:
+        return jsonify({'message': 'Snapshot not found'}), 404
+    except RuntimeError as e:
+        return jsonify({'message': str(e)}), 409
+
 # Serve static files for production build
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
-    if path != "" and os.path.exists(os.path.join(app.static_folder, path)):
-        return send_from_directory(app.static_folder, path)
-    else:
-        return send_from_directory(app.static_folder, 'index.html')
-
-# Create data directory if it doesn't exist
-os.makedirs('data', exist_ok=True)
-
-# Ensure JSON data files exist
-data_files = ['places.json', 'restaurants.json', 'itinerary_template.json']
-for file in data_files:
-    file_path = f"data/{file}"
-    if not os.path.exists(file_path):
-        with open(file_path, 'w', encoding='utf-8') as f:
-            if file == 'places.json':
-                json.dump([
-                    {
-                        "id": "p1",
-                        "name": "Vashi Central Park",
-                        "description": "Beautiful park in the heart of Vashi",
-                        "image": "/images/places/vashi-park.jpg",
-                        "rating": 4.5,
-                        "category": "park"
-                    }
-                ], f, indent=2)
-            elif file == 'restaurants.json':
-                json.dump([
-                    {
-                        "id": "r1",
-                        "name": "Coastal Cuisine",
-                        "description": "Authentic seafood restaurant",
-                        "image": "/images/restaurants/coastal.jpg",
-                        "rating": 4.2,
-                        "category": "seafood"
-                    }
-                ], f, indent=2)
-            elif file == 'itinerary_template.json':
-                json.dump({
-                    "activities": [
-                        {
-                            "time": "09:00 AM",
-                            "title": "Morning Walk",
-                            "location": "Vashi Central Park",
-                            "description": "Start your day with a refreshing walk",
-                            "image": "/images/activities/morning-walk.jpg",
-                            "category": "outdoor"
-                        },
-                        {
-                            "time": "12:00 PM",
-                            "title": "Lunch Break",
-                            "location": "Coastal Cuisine",
-                            "description": "Enjoy seafood for lunch",
-                            "image": "/images/activities/lunch.jpg",
-                            "category": "food"
-                        },
-                        {
-                            "time": "03:00 PM",
-                            "title": "Shopping",
-                            "location": "Inorbit Mall",
-                            "description": "Explore the mall",
-                            "image": "/images/activities/shopping.jpg",
-                            "category": "shopping"
-                        },
-                        {
-                            "time": "07:00 PM",
-                            "title": "Dinner",
-                            "location": "Raghuleela Mall",
-                            "description": "Dinner at food court",
-                            "image": "/images/activities/dinner.jpg",
-                            "category": "food"
-                        }
-                    ]
-                }, f, indent=2)
+    # Assets come from an index built once from dist/, so no per-request stat
+    asset = static_assets.get(path) if path != "" else None
+    if asset is not None:
+        return static_assets.send(asset, request)
+    
+    response = static_assets.send_index(request)
+    if response is None:
+        abort(404)
+    return response
+
+# Default data files, written by ensure_data_files() for a fresh checkout
+DEFAULT_DATA_FILES = {
+    'places.json': [
+        {
+            "id": "p1",
+            "name": "Vashi Central Park",
+            "description": "Beautiful park in the heart of Vashi",
+            "image": "/images/places/vashi-park.jpg",
+            "rating": 4.5,
+            "category": "park"
+        }
+    ],
+    'restaurants.json': [
+        {
+            "id": "r1",
+            "name": "Coastal Cuisine",
+            "description": "Authentic seafood restaurant",
+            "image": "/images/restaurants/coastal.jpg",
+            "rating": 4.2,
+            "category": "seafood"
+        }
+    ],
+    'itinerary_template.json': {
+        "activities": [
+            {
+                "time": "09:00 AM",
+                "title": "Morning Walk",
+                "location": "Vashi Central Park",
+                "description": "Start your day with a refreshing walk",
+                "image": "/images/activities/morning-walk.jpg",
+                "category": "outdoor"
+            },
+            {
+                "time": "12:00 PM",
+                "title": "Lunch Break",
+                "location": "Coastal Cuisine",
+                "description": "Enjoy seafood for lunch",
+                "image": "/images/activities/lunch.jpg",
+                "category": "food"
+            },
+            {
+                "time": "03:00 PM",
+                "title": "Shopping",
+                "location": "Inorbit Mall",
+                "description": "Explore the mall",
+                "image": "/images/activities/shopping.jpg",
+                "category": "shopping"
+            },
+            {
+                "time": "07:00 PM",
+                "title": "Dinner",
+                "location": "Raghuleela Mall",
+                "description": "Dinner at food court",
+                "image": "/images/activities/dinner.jpg",
+                "category": "food"
+            }
+        ]
+    }
+}
+
+# Create the data directory and any missing data files
+def ensure_data_files():
+    os.makedirs(DATA_DIR, exist_ok=True)
+    for file, default in DEFAULT_DATA_FILES.items():
+        file_path = os.path.join(DATA_DIR, file)
+        if not os.path.exists(file_path):
+            with open(file_path, 'w', encoding='utf-8') as f:
+                json.dump(default, f, indent=2)
+
+# The data files are created before the first request rather than on import,
+# so importing the app (in tests, tools or a gunicorn master) writes nothing
+data_files_ready = False
+data_files_lock = threading.Lock()
+
+@app.before_request
+def prepare_data_files():
+    global data_files_ready
+    if data_files_ready:
+        return None
+    with data_files_lock:
+        if not data_files_ready:
+            ensure_data_files()
+            data_files_ready = True
+    return None
+
+# Like the data files, the memory log and tracemalloc start with the first
+# request, so importing the app starts no threads
+memory_monitor_started = False
+memory_monitor_lock = threading.Lock()
+
+@app.before_request
+def start_memory_monitor():
+    global memory_monitor_started
+    if memory_monitor_started:
+        return None
+    with memory_monitor_lock:
+        if not memory_monitor_started:
+            if MEMORY_TRACEMALLOC:
+                memory_monitor.start_tracing(MEMORY_TRACEMALLOC_FRAMES)
+            memory_monitor.start(MEMORY_LOG_INTERVAL)
+            memory_monitor_started = True
+    return None
+
+# Under gunicorn the workers add up their metrics through files in
+# METRICS_DIR; each worker's writer starts with its first request
+shared_metrics = SharedMetrics(registry, METRICS_DIR, METRICS_WRITE_INTERVAL) if METRICS_ENABLED and METRICS_DIR else None
+
+@app.before_request
+def start_metrics_writer():
+    if shared_metrics is not None:
+        shared_metrics.start()
+    return None
+
+# Trace every view as the 'view' span of its request
+for endpoint, view in list(app.view_functions.items()):
+    app.view_functions[endpoint] = traced_view(view)
 
 if __name__ == '__main__':
+    ensure_data_files()
     port = int(os.environ.get('PORT', 8000))
     app.run(host='0.0.0.0', port=port, debug=True)
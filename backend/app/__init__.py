@@ -2,12 +2,15 @@
 # Backend application package
 # This package contains all the FastAPI application code
 
-from . import main
-from . import models
-from . import auth
-from . import database
-from . import config
-from . import utils
-from . import routers
+import importlib
 
 __version__ = '1.0.0'
+
+# Submodules are imported on first access (e.g. `app.main`) rather than all
+# up front, so importing one module does not pull in the whole app
+_SUBMODULES = ("main", "models", "auth", "database", "config", "utils", "routers")
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
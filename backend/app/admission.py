@@ -0,0 +1,229 @@
+
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from typing import Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from .metrics import ADMISSION_EVENTS, ADMISSION_WAIT
+from .tracing import span
+
+class RouteClass(NamedTuple):
+    priority: int  # 0 is the most important
+    limit: int  # requests of the class running at once
+    queue: int  # requests of the class waiting for a slot
+    max_wait: float  # seconds a request may wait before it is shed
+    target: float  # acceptable standing queue delay in seconds
+
+# Per worker. Logins and writes are never shed for lower-priority work, and
+# their queue delay decides when catalog reads, weather and generation are
+ROUTE_CLASSES: Dict[str, RouteClass] = {
+    "write": RouteClass(priority=0, limit=32, queue=64, max_wait=2.0, target=0.1),
+    "read": RouteClass(priority=1, limit=16, queue=32, max_wait=1.0, target=0.1),
+    "catalog": RouteClass(priority=1, limit=32, queue=64, max_wait=0.5, target=0.05),
+    "upstream": RouteClass(priority=2, limit=8, queue=16, max_wait=0.5, target=0.1),
+    "generate": RouteClass(priority=2, limit=4, queue=8, max_wait=0.5, target=0.1),
+}
+
+# The first matching path prefix wins; "database" paths are split into
+# "read" and "write" by method
+ROUTE_CLASS_PREFIXES: List[Tuple[str, Tuple[str, ...]]] = [
+    ("upstream", ("/api/weather",)),
+    ("generate", ("/api/generate-itinerary",)),
+    ("catalog", ("/api/places", "/api/restaurants", "/api/regions", "/api/locations")),
+    ("database", ("/api/token", "/api/auth", "/api/itineraries", "/api/profile")),
+]
+
+def route_class(method: str, path: str) -> Optional[str]:
+    """Return the admission class for a request, or None if it is not admission controlled."""
+    if method == "OPTIONS":
+        return None
+    for name, prefixes in ROUTE_CLASS_PREFIXES:
+        if path.startswith(prefixes):
+            if name == "database":
+                return "read" if method in ("GET", "HEAD") else "write"
+            return name
+    return None
+
+class _QueueDelay:
+    """
+    The standing queue delay of a class, as in CoDel: the smallest delay
+    seen over the last full interval. A burst that drains quickly leaves it
+    at 0; it only stays high while the queue never empties.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.standing = 0.0
+        self._started = 0.0
+        self._smallest: Optional[float] = None
+
+    def _roll(self, now: float) -> None:
+        if now - self._started < self.interval:
+            return
+        # No samples, or none for a whole interval, means nothing was queued
+        recent = now - self._started < 2 * self.interval
+        self.standing = self._smallest if self._smallest is not None and recent else 0.0
+        self._started = now
+        self._smallest = None
+
+    def record(self, delay: float, now: float) -> None:
+        self._roll(now)
+        self._smallest = delay if self._smallest is None else min(self._smallest, delay)
+
+    def current(self, now: float) -> float:
+        self._roll(now)
+        return self.standing
+
+class AdmissionController:
+    """
+    Bounded concurrency and queueing per route class, for one event loop.
+
+    A request starts at once if its class and the worker (`capacity`) have
+    a free slot, otherwise it waits in its class's queue for up to the
+    class's max_wait. Waiting requests are started in priority order as
+    slots free up. Load is shed early, before it can wait out the timeout:
+    - while a class's standing queue delay is over its target, its requests
+      no longer queue and only start if a slot is free;
+    - while any higher-priority class is over its target, lower-priority
+      requests are refused outright.
+    A refused request gets a 503 with Retry-After.
+    """
+
+    def __init__(
+        self,
+        classes: Dict[str, RouteClass] = ROUTE_CLASSES,
+        capacity: int = 64,
+        interval: float = 1.0,
+        retry_after: float = 2,
+        clock=time.monotonic
+    ):
+        self.classes = classes
+        self.capacity = capacity
+        self.retry_after = retry_after
+        self.clock = clock
+        self.total = 0
+        self.inflight = {name: 0 for name in classes}
+        self._queues: Dict[str, Deque[Tuple[float, asyncio.Future]]] = {name: deque() for name in classes}
+        self._delays = {name: _QueueDelay(interval) for name in classes}
+
+    def _has_slot(self, name: str) -> bool:
+        return self.total < self.capacity and self.inflight[name] < self.classes[name].limit
+
+    def _start(self, name: str, delay: float, now: float) -> None:
+        self.total += 1
+        self.inflight[name] += 1
+        self._delays[name].record(delay, now)
+        ADMISSION_WAIT.observe(delay, name)
+
+    def congested(self, name: str) -> bool:
+        return self._delays[name].current(self.clock()) > self.classes[name].target
+
+    def _outranked(self, name: str) -> bool:
+        priority = self.classes[name].priority
+        return any(
+            route.priority < priority and self.congested(other)
+            for other, route in self.classes.items()
+        )
+
+    def _shed(self, name: str, reason: str) -> float:
+        ADMISSION_EVENTS.inc(name, reason)
+        return self.retry_after
+
+    async def acquire(self, name: str) -> Optional[float]:
+        """Wait for a slot; returns None once admitted, or the Retry-After seconds if the request is shed."""
+        route = self.classes[name]
+        now = self.clock()
+        if self._outranked(name):
+            return self._shed(name, "shed_priority")
+        if self._has_slot(name) and not self._queues[name]:
+            self._start(name, 0.0, now)
+            ADMISSION_EVENTS.inc(name, "admitted")
+            return None
+        if self.congested(name) or len(self._queues[name]) >= route.queue:
+            return self._shed(name, "shed_queue")
+
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (now, waiter)
+        self._queues[name].append(entry)
+        try:
+            await asyncio.wait({waiter}, timeout=route.max_wait)
+        except asyncio.CancelledError:
+            # The client went away; hand on a slot we were given meanwhile
+            if waiter.done() and not waiter.cancelled():
+                self.release(name)
+            else:
+                self._drop(name, entry)
+            raise
+        if waiter.done():
+            ADMISSION_EVENTS.inc(name, "queued")
+            return None
+        self._drop(name, entry)
+        self._delays[name].record(route.max_wait, self.clock())
+        return self._shed(name, "shed_timeout")
+
+    def _drop(self, name: str, entry: Tuple[float, asyncio.Future]) -> None:
+        entry[1].cancel()
+        try:
+            self._queues[name].remove(entry)
+        except ValueError:
+            pass
+
+    def release(self, name: str) -> None:
+        """Free a slot and start the most important waiting request, if any."""
+        self.total -= 1
+        self.inflight[name] -= 1
+        now = self.clock()
+        while self.total < self.capacity:
+            ready = [
+                (self.classes[other].priority, queue[0][0], other)
+                for other, queue in self._queues.items()
+                if queue and self.inflight[other] < self.classes[other].limit
+            ]
+            if not ready:
+                return
+            _, enqueued, other = min(ready)
+            _, waiter = self._queues[other].popleft()
+            if waiter.done():
+                continue
+            self._start(other, now - enqueued, now)
+            waiter.set_result(True)
+
+class AdmissionMiddleware:
+    """ASGI middleware that holds each request in its route class's queue, or answers 503 with Retry-After."""
+
+    def __init__(self, app, controller: Optional[AdmissionController] = None):
+        self.app = app
+        self.controller = controller if controller is not None else AdmissionController()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        name = route_class(scope["method"], scope["path"])
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        with span("admission", route_class=name):
+            wait = await self.controller.acquire(name)
+        if wait is None:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                self.controller.release(name)
+            return
+
+        body = json.dumps({"detail": "Server is busy, try again later"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(math.ceil(wait)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -1,24 +1,90 @@
 
-from fastapi import Depends, HTTPException, status
+import hashlib
+import hmac
+from typing import Optional
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from .config import ADMIN_API_KEY, AUTH_CACHE_SIZE, AUTH_STALE_TTL
 from .database import supabase
+from .memory import monitor
+from .metrics import CIRCUIT_EVENTS
+from .resilience import StaleCache, UpstreamError
+from .tracing import span
 
 # Authentication token setup
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Users verified recently, by token hash; only consulted while Supabase auth is unavailable
+verified_users = StaleCache(AUTH_CACHE_SIZE)
+monitor.register("verified_users", verified_users)
+
+def service_unavailable(detail: str, error: UpstreamError) -> HTTPException:
+    """A 503 telling the client when the failing upstream may be retried."""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=detail,
+        headers={"Retry-After": str(max(1, round(error.retry_after)))}
+    )
+
 # Authentication utilities
 async def get_current_user(token: str = Depends(oauth2_scheme)):
+    with span("auth"):
+        return verify_token(token)
+
+def verify_token(token: str):
+    """Return the Supabase user for a bearer token, or raise 401 (503 while Supabase is unavailable)."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     
+    token_key = hashlib.sha256(token.encode("utf-8")).digest()
     try:
         # Verify the JWT token using Supabase
         user = supabase.auth.get_user(token)
         if not user:
             raise credentials_exception
-        return user.user
+    except UpstreamError as e:
+        # Supabase is down: accept a token it verified in the last AUTH_STALE_TTL seconds
+        cached = verified_users.get(token_key, AUTH_STALE_TTL)
+        if cached is None:
+            raise service_unavailable("Authentication service unavailable", e)
+        CIRCUIT_EVENTS.inc("supabase", "fallback")
+        return cached
     except Exception:
         raise credentials_exception
+    verified_users.put(token_key, user.user)
+    return user.user
+
+def verified_subject(authorization: str) -> Optional[str]:
+    """
+    Return the user id behind a bearer token that has already been verified, or None.
+
+    Rate limiting runs before the route authenticates the request and must
+    not call Supabase, so it only trusts tokens found in the verified-users
+    cache; any other token is limited by IP alone.
+    """
+    if not authorization.startswith("Bearer "):
+        return None
+    user = verified_users.get(hashlib.sha256(authorization[7:].encode("utf-8")).digest(), AUTH_STALE_TTL)
+    return getattr(user, "id", None)
+
+def is_admin_key(key: Optional[str]) -> bool:
+    """Check a key against the configured admin key in constant time."""
+    if not ADMIN_API_KEY or key is None:
+        return False
+    return hmac.compare_digest(key.encode("utf-8"), ADMIN_API_KEY.encode("utf-8"))
+
+async def require_admin(x_admin_key: Optional[str] = Header(None)):
+    """Allow the request only if it carries the configured admin key."""
+    if not ADMIN_API_KEY:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Admin API is disabled"
+        )
+    if not is_admin_key(x_admin_key):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid admin key"
+        )
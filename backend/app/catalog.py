@@ -0,0 +1,661 @@
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple, Union
+
+from fastapi import Request, Response
+
+from .compression import compress, negotiate_encoding
+from .config import (
+    CATALOG_CHECK_INTERVAL, CATALOG_ENCODED_CACHE_SIZE, CATALOG_INCREMENTAL_RELOAD, CATALOG_LOADED_SHARDS,
+    CATALOG_MAX_OVERLAY, CATALOG_QUERY_CACHE_SIZE, CATALOG_SNAPSHOT_AUTOBUILD, CATALOG_SNAPSHOT_PATH,
+    COMPRESSION_MIN_SIZE
+)
+from .indexes import DistanceMatrix, Point
+from .memory import monitor
+from .overlay import OverlayRecordSet
+from .shards import ShardedDatasetWriter, ShardedRecordSet, load_dataset
+from .snapshot import (
+    DatasetWriter, RecordSet, Selection, Snapshot, encode_locations, encode_record, load_locations, open_snapshot,
+    write_snapshot
+)
+from .utils import load_json_data, resolve_data_path
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the standard library
+    orjson = None
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; snapshot builds are atomic anyway
+    fcntl = None
+
+# locations.json is optional: {"locations": {"Vashi": {"lat": ..., "lng": ...}}}
+# gives coordinates to records that do not carry their own
+CATALOG_FILES = ("places.json", "restaurants.json", "locations.json")
+DATASETS = (("places", "places.json"), ("restaurants", "restaurants.json"))
+
+# Low-cardinality fields stored as dictionary-encoded columns, and numeric
+# fields stored as float32 columns, for filtering and sorting
+CATEGORICAL_FIELDS = {
+    "places": ("region", "category", "location"),
+    "restaurants": ("region", "cuisine", "price", "location"),
+}
+NUMERIC_FIELDS = ("rating",)
+TEXT_FIELDS = ("name", "description")
+# Datasets are split into shards by this field, loaded only when needed
+SHARD_FIELD = "region"
+
+REQUIRED_FIELDS = {
+    "places": ("id", "name", "category", "description", "location", "region"),
+    "restaurants": ("id", "name", "cuisine", "description", "location", "region", "price"),
+}
+
+class CatalogValidationError(ValueError):
+    """Raised when the JSON files or a catalog change contain invalid records."""
+
+    def __init__(self, errors: List[str]):
+        super().__init__(f"{len(errors)} invalid catalog record(s)")
+        self.errors = errors
+
+class CatalogChangeError(ValueError):
+    """Raised when a catalog change cannot be applied (unknown id, duplicate, ...)."""
+
+CHANGE_OPS = ("add", "update", "delete")
+
+# Upserted records by id and deleted ids, per dataset
+ChangePlan = Dict[str, Tuple[Dict[str, Dict[str, Any]], List[str]]]
+Records = Union[RecordSet, ShardedRecordSet, OverlayRecordSet]
+
+def dumps(obj: Any) -> bytes:
+    """Encode an object as compact JSON bytes, using orjson when installed."""
+    if isinstance(obj, (RecordSet, Selection)):
+        # Already encoded in the snapshot
+        return obj.encoded()
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def json_response(payload: bytes, status_code: int = 200, encoding: Optional[str] = None) -> Response:
+    """Wrap already-encoded (and possibly compressed) JSON bytes in a response."""
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=payload, status_code=status_code, media_type="application/json", headers=headers)
+
+class Catalog:
+    """
+    One loaded version of the places and restaurants data.
+
+    Records are RecordSets, normally backed by a memory-mapped snapshot that
+    every worker shares, and are decoded into dicts only when read. Filters
+    and sorts run on their compact columns instead.
+
+    Edits are applied copy-on-write: `apply` returns a new catalog whose
+    datasets are overlays on the same base, leaving this one untouched.
+
+    Encoded views are cached on the catalog itself, keyed by the view name
+    and its filters, so a reload starts from an empty cache and a hot list
+    endpoint costs a dict lookup rather than a serialization. Compressed
+    variants are cached alongside, so each is compressed once per version.
+    Both are LRUs; views keyed by client-supplied text go in a smaller LRU
+    of their own, so a stream of distinct searches cannot evict the list
+    views.
+    """
+
+    def __init__(
+        self,
+        places: Optional[Records],
+        restaurants: Optional[Records],
+        version: str,
+        snapshot: Optional[Snapshot] = None,
+        locations: Optional[DistanceMatrix] = None
+    ):
+        self.places = places
+        self.restaurants = restaurants
+        self.version = version
+        self.snapshot = snapshot
+        self.locations = locations
+        self._encoded: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._queries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def dataset(self, name: str) -> Optional[Records]:
+        return {"places": self.places, "restaurants": self.restaurants}[name]
+
+    @property
+    def pinned(self) -> Set[str]:
+        """Datasets imported into the snapshot rather than read from JSON."""
+        if self.snapshot is None:
+            return set()
+        pinned = self.snapshot.metadata.get("pinned") or []
+        return set(pinned if isinstance(pinned, list) else [name for name, _ in DATASETS])
+
+    @property
+    def overlay_size(self) -> int:
+        """Number of records changed since the base was loaded."""
+        return sum(
+            records.changes for records in (self.places, self.restaurants)
+            if isinstance(records, OverlayRecordSet)
+        )
+
+    def apply(self, plan: ChangePlan, version: Optional[str] = None) -> "Catalog":
+        """Return a new catalog with the planned changes applied on overlays."""
+        coordinates = load_location_coordinates()
+        datasets = {"places": self.places, "restaurants": self.restaurants}
+        for name, (upserts, deletes) in plan.items():
+            if not upserts and not deletes:
+                continue
+            records = datasets[name]
+            if not isinstance(records, OverlayRecordSet):
+                records = OverlayRecordSet(records)
+            points = {record_id: record_point(record, coordinates) for record_id, record in upserts.items()}
+            datasets[name] = records.apply(upserts, deletes, points)
+        return Catalog(
+            datasets["places"],
+            datasets["restaurants"],
+            version or self.version,
+            self.snapshot,
+            self.locations
+        )
+
+    def _cached(self, query: bool, key: Hashable, build: Callable[[], bytes]) -> bytes:
+        cache = self._queries if query else self._encoded
+        max_size = CATALOG_QUERY_CACHE_SIZE if query else CATALOG_ENCODED_CACHE_SIZE
+        with self._lock:
+            payload = cache.get(key)
+            if payload is not None:
+                cache.move_to_end(key)
+                return payload
+
+        payload = build()
+        with self._lock:
+            cache[key] = payload
+            while len(cache) > max_size:
+                cache.popitem(last=False)
+        return payload
+
+    def encoded(
+        self,
+        key: Hashable,
+        build: Callable[[], Any],
+        encoding: Optional[str] = None,
+        query: bool = False
+    ) -> bytes:
+        """
+        Return the encoded JSON for a view, building it on first use.
+
+        With an `encoding`, the compressed variant is returned instead; callers
+        should only ask for one when the body is worth compressing. Pass
+        `query=True` when the key holds text sent by the client.
+        """
+        payload = self._cached(query, (key, None), lambda: dumps(build()))
+        if encoding is None:
+            return payload
+        # Only the bounded list views are worth the slowest setting; query
+        # views are compressed at the default level, so distinct queries
+        # cannot each buy a maximum-effort compression
+        return self._cached(query, (key, encoding), lambda: compress(payload, encoding, best=not query))
+
+    def response(self, request: Request, key: Hashable, build: Callable[[], Any], query: bool = False) -> Response:
+        """Return a view as a raw response, pre-compressed when the client allows it."""
+        payload = self.encoded(key, build, query=query)
+        encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+        if encoding is None or len(payload) < COMPRESSION_MIN_SIZE:
+            return json_response(payload)
+        return json_response(self.encoded(key, build, encoding, query), encoding=encoding)
+
+def data_version() -> str:
+    """Identify the current catalog files by their modification times and sizes."""
+    parts = []
+    for filename in CATALOG_FILES:
+        path = resolve_data_path(filename)
+        if path is None:
+            parts.append(f"{filename}:missing")
+            continue
+        stat = os.stat(path)
+        parts.append(f"{filename}:{stat.st_mtime_ns}:{stat.st_size}")
+    return "|".join(parts)
+
+def data_digest() -> str:
+    """Identify the current catalog files by their contents."""
+    digest = hashlib.sha256()
+    for filename in CATALOG_FILES:
+        digest.update(filename.encode("utf-8") + b"\0")
+        path = resolve_data_path(filename)
+        if path is not None:
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def parse_point(value: Any) -> Optional[Point]:
+    """Return (lat, lng) from a {"lat", "lng"} object, or None if it is not valid."""
+    if not isinstance(value, dict):
+        return None
+    lat, lng = value.get("lat"), value.get("lng")
+    if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in (lat, lng)):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    return (float(lat), float(lng))
+
+def load_location_coordinates() -> Dict[str, Point]:
+    """Return the known coordinates of named locations from locations.json."""
+    locations = load_json_data("locations.json").get("locations", {})
+    coordinates = {}
+    for name, value in locations.items():
+        point = parse_point(value)
+        if point is not None:
+            coordinates[name] = point
+    return coordinates
+
+def validate_dataset(name: str, records: Any) -> List[str]:
+    """Return a description of every invalid record in a dataset."""
+    if not isinstance(records, list):
+        return [f"{name}: expected a list of records"]
+
+    errors = []
+    seen_ids = set()
+    for position, record in enumerate(records):
+        label = f"{name}[{position}]"
+        errors.extend(f"{label}: {error}" for error in validate_record(name, record))
+        record_id = record.get("id") if isinstance(record, dict) else None
+        if isinstance(record_id, str):
+            if record_id in seen_ids:
+                errors.append(f"{label}: duplicate id '{record_id}'")
+            seen_ids.add(record_id)
+    return errors
+
+def validate_record(name: str, record: Any) -> List[str]:
+    """Return what is wrong with one record of a dataset, if anything."""
+    if not isinstance(record, dict):
+        return ["expected an object"]
+
+    errors = []
+    for field in REQUIRED_FIELDS[name]:
+        value = record.get(field)
+        if not isinstance(value, str) or not value.strip():
+            errors.append(f"'{field}' must be a non-empty string")
+    rating = record.get("rating")
+    if not isinstance(rating, (int, float)) or isinstance(rating, bool) or not 0 <= rating <= 5:
+        errors.append("'rating' must be a number between 0 and 5")
+    if record.get("coordinates") is not None and parse_point(record["coordinates"]) is None:
+        errors.append("'coordinates' must be an object with numeric 'lat' and 'lng'")
+    return errors
+
+def load_datasets(validate: bool = False) -> Dict[str, Any]:
+    """Read the catalog JSON files, optionally raising CatalogValidationError on bad records."""
+    datasets = {}
+    errors = []
+    for name, filename in DATASETS:
+        data = load_json_data(filename)
+        if not data:
+            if validate:
+                errors.append(f"{name}: {filename} not found")
+            continue
+        datasets[name] = data.get(name, [])
+        if validate:
+            errors.extend(validate_dataset(name, datasets[name]))
+    if errors:
+        raise CatalogValidationError(errors)
+    return datasets
+
+def record_point(record: Dict[str, Any], coordinates: Dict[str, Point]) -> Optional[Point]:
+    """Return a record's own coordinates, or those of its location."""
+    return parse_point(record.get("coordinates")) or coordinates.get(record.get("location"))
+
+def dataset_writer(name: str, spool_dir: Optional[str] = None, grouped: bool = False) -> ShardedDatasetWriter:
+    """Return a writer that encodes a catalog dataset into shards with their columns and indexes."""
+    def shard_writer(shard: str) -> DatasetWriter:
+        return DatasetWriter(shard, CATEGORICAL_FIELDS[name], NUMERIC_FIELDS, TEXT_FIELDS, points=True, spool_dir=spool_dir)
+    return ShardedDatasetWriter(name, SHARD_FIELD, shard_writer, spool_dir, grouped)
+
+def encode_catalog(datasets: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Encode the catalog into snapshot sections: records, columns and indexes."""
+    if datasets is None:
+        datasets = load_datasets()
+    coordinates = load_location_coordinates()
+
+    sections = {}
+    for name, records in datasets.items():
+        writer = dataset_writer(name)
+        for record in records:
+            writer.add(record, record_point(record, coordinates))
+        sections.update(writer.sections())
+    if coordinates:
+        sections.update(encode_locations(coordinates))
+    return sections
+
+def build_snapshot(path: str = CATALOG_SNAPSHOT_PATH, validate: bool = False) -> Dict[str, Any]:
+    """Encode the catalog JSON files into a snapshot file and return its metadata."""
+    version, digest = data_version(), data_digest()
+    datasets = load_datasets(validate)
+    metadata = {
+        "source_version": version,
+        "source_digest": digest,
+        "compiled_at": datetime.now().isoformat(),
+        "counts": {name: len(records) for name, records in datasets.items()},
+    }
+    write_snapshot(path, encode_catalog(datasets), metadata)
+    return metadata
+
+def compile_catalog(path: str = CATALOG_SNAPSHOT_PATH) -> Dict[str, Any]:
+    """Validate the catalog JSON files and write a snapshot; see compile_catalog.py."""
+    return build_snapshot(path, validate=True)
+
+def snapshot_is_current(snapshot: Snapshot, version: str) -> bool:
+    """Return True if a snapshot was built from the current JSON files."""
+    # Imported catalogs (see ingest.py) replace the JSON files rather than
+    # derive from them, so they stay in use until they are recompiled
+    if snapshot.metadata.get("pinned"):
+        return True
+    if snapshot.metadata.get("source_version") == version:
+        return True
+    # Copying files (e.g. into a container image) changes their mtimes but
+    # not their contents, so fall back to comparing digests
+    return snapshot.metadata.get("source_digest") == data_digest()
+
+def ensure_snapshot(path: str = CATALOG_SNAPSHOT_PATH) -> Optional[Snapshot]:
+    """
+    Open the snapshot, rebuilding it first if the JSON files have changed.
+
+    Under gunicorn the master calls this before forking, so workers only
+    ever attach to an existing file. A lock file keeps workers that notice
+    a change at the same time from all rebuilding it. With
+    CATALOG_SNAPSHOT_AUTOBUILD off, a stale snapshot is ignored instead and
+    the catalog is served from the JSON files until it is recompiled.
+    """
+    version = data_version()
+    snapshot = open_snapshot(path)
+    if snapshot is not None and snapshot_is_current(snapshot, version):
+        return snapshot
+
+    if not CATALOG_SNAPSHOT_AUTOBUILD:
+        print("Catalog snapshot is missing or stale, using JSON files")
+        return None
+
+    try:
+        with open(path + ".lock", "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            snapshot = open_snapshot(path)
+            if snapshot is None or not snapshot_is_current(snapshot, version):
+                build_snapshot(path)
+                snapshot = open_snapshot(path)
+    except OSError as e:
+        print(f"Catalog snapshot unavailable, using JSON files: {str(e)}")
+        return None
+    return snapshot
+
+def load_catalog() -> Catalog:
+    """Attach to the catalog snapshot, falling back to reading the JSON files."""
+    version = data_version()
+    snapshot = ensure_snapshot()
+    if snapshot is not None:
+        catalog = Catalog(
+            load_dataset(snapshot.sections, "places", CATALOG_LOADED_SHARDS, snapshot.release),
+            load_dataset(snapshot.sections, "restaurants", CATALOG_LOADED_SHARDS, snapshot.release),
+            version,
+            snapshot,
+            snapshot.locations()
+        )
+        # A pinned snapshot is not rebuilt when the other datasets' files
+        # change, so bring those up to date as an overlay
+        if catalog.pinned:
+            plan = diff_catalog(catalog, load_datasets())
+            if plan:
+                catalog = catalog.apply(plan)
+        return catalog
+
+    sections = encode_catalog()
+    return Catalog(
+        load_dataset(sections, "places", CATALOG_LOADED_SHARDS),
+        load_dataset(sections, "restaurants", CATALOG_LOADED_SHARDS),
+        version,
+        locations=load_locations(sections)
+    )
+
+def snapshot_changed(catalog: Catalog) -> bool:
+    """Return True if the snapshot file has been replaced since it was mapped."""
+    if catalog.snapshot is None:
+        return False
+    try:
+        stat = os.stat(catalog.snapshot.path)
+    except FileNotFoundError:
+        return True
+    return (stat.st_ino, stat.st_mtime_ns) != (catalog.snapshot.stat.st_ino, catalog.snapshot.stat.st_mtime_ns)
+
+def plan_changes(catalog: Catalog, changes: List[Dict[str, Any]]) -> ChangePlan:
+    """
+    Check add/update/delete changes against a catalog and group them by dataset.
+
+    Each change is {"op", "dataset", "id"} for a delete or {"op", "dataset",
+    "record"} for an add or update; later changes see the earlier ones.
+    """
+    plan: ChangePlan = {}
+    for position, change in enumerate(changes):
+        label = f"changes[{position}]"
+        op, name = change.get("op"), change.get("dataset")
+        if op not in CHANGE_OPS:
+            raise CatalogChangeError(f"{label}: 'op' must be one of {', '.join(CHANGE_OPS)}")
+        if name not in CATEGORICAL_FIELDS:
+            raise CatalogChangeError(f"{label}: unknown dataset '{name}'")
+        if name in catalog.pinned:
+            raise CatalogChangeError(f"{label}: {name} were imported with ingest_catalog.py; re-import them instead")
+        records = catalog.dataset(name)
+        if records is None:
+            raise CatalogChangeError(f"{label}: {name} data file not found")
+
+        upserts, deletes = plan.setdefault(name, ({}, []))
+        if op == "delete":
+            record_id = change.get("id")
+        else:
+            record = change.get("record")
+            errors = validate_record(name, record)
+            if errors:
+                raise CatalogValidationError([f"{label}: {error}" for error in errors])
+            record_id = record.get("id")
+            if not isinstance(record_id, str) or not record_id:
+                raise CatalogValidationError([f"{label}: 'id' must be a non-empty string"])
+
+        exists = record_id in upserts or (record_id not in deletes and records.index_of(record_id) is not None)
+        if op == "add" and exists:
+            raise CatalogChangeError(f"{label}: {name} record '{record_id}' already exists")
+        if op != "add" and not exists:
+            raise CatalogChangeError(f"{label}: no {name} record with id '{record_id}'")
+
+        if op == "delete":
+            upserts.pop(record_id, None)
+            deletes.append(record_id)
+        else:
+            upserts[record_id] = record
+            if record_id in deletes:
+                deletes.remove(record_id)
+    return plan
+
+def diff_catalog(catalog: Catalog, datasets: Dict[str, Any]) -> Optional[ChangePlan]:
+    """
+    Work out the changes between a catalog and freshly read JSON files.
+
+    Records are compared by id and encoded bytes, so nothing is decoded
+    except the ids. Returns None when the files cannot be diffed (missing
+    or duplicate ids, a dataset appearing or disappearing).
+    """
+    plan: ChangePlan = {}
+    for name, _ in DATASETS:
+        if name in catalog.pinned:
+            continue
+        records, new_records = catalog.dataset(name), datasets.get(name)
+        if records is None or new_records is None:
+            if records is None and new_records is None:
+                continue
+            return None
+
+        upserts, seen = {}, set()
+        for record in new_records:
+            record_id = record.get("id") if isinstance(record, dict) else None
+            if not isinstance(record_id, str) or record_id in seen:
+                return None
+            seen.add(record_id)
+            index = records.index_of(record_id)
+            if index is None or bytes(records.raw(index)) != encode_record(record):
+                upserts[record_id] = record
+        deletes = [record_id for record_id in records.record_ids() if record_id not in seen]
+        plan[name] = (upserts, deletes)
+    return plan
+
+def plan_size(plan: ChangePlan) -> int:
+    return sum(len(upserts) + len(deletes) for upserts, deletes in plan.values())
+
+def changed_files(old_version: str, new_version: str) -> Set[str]:
+    """Return the catalog files whose entries differ between two data versions."""
+    old_parts, new_parts = old_version.split("|"), new_version.split("|")
+    return {filename for filename, old, new in zip(CATALOG_FILES, old_parts, new_parts) if old != new}
+
+def reload_catalog(catalog: Catalog, version: str) -> Catalog:
+    """
+    Bring a catalog up to date with changed JSON files.
+
+    Small edits to places.json or restaurants.json are diffed and applied as
+    an overlay, which leaves the snapshot and its indexes alone. A change to
+    locations.json, an undiffable file or an overlay that has grown past
+    CATALOG_MAX_OVERLAY records falls back to a full reload (except over a
+    pinned snapshot, which a reload would not refresh).
+    """
+    if CATALOG_INCREMENTAL_RELOAD and "locations.json" not in changed_files(catalog.version, version):
+        plan = diff_catalog(catalog, load_datasets())
+        if plan is not None and (catalog.pinned or catalog.overlay_size + plan_size(plan) <= CATALOG_MAX_OVERLAY):
+            return catalog.apply(plan, version)
+    return load_catalog()
+
+def write_changes(plan: ChangePlan) -> None:
+    """Apply planned changes to the JSON files, replacing each file atomically."""
+    for name, filename in DATASETS:
+        if name not in plan:
+            continue
+        upserts, deletes = plan[name]
+        path = resolve_data_path(filename)
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        records = []
+        removed = set(deletes)
+        for record in data.get(name, []):
+            record_id = record.get("id")
+            if record_id in removed:
+                continue
+            records.append(upserts.get(record_id, record))
+        existing = {record.get("id") for record in records}
+        records.extend(record for record_id, record in upserts.items() if record_id not in existing)
+        data[name] = records
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        os.replace(tmp_path, path)
+
+_catalog: Optional[Catalog] = None
+_checked_at = 0.0
+_catalog_lock = threading.Lock()
+
+# Looked up at report time, so accounting never loads the catalog
+monitor.register("catalog", lookup=lambda: _catalog)
+monitor.register("catalog_views", lookup=lambda: _catalog._encoded if _catalog is not None else None)
+monitor.register("catalog_queries", lookup=lambda: _catalog._queries if _catalog is not None else None)
+
+def _refresh() -> Catalog:
+    global _catalog
+    if _catalog is None or snapshot_changed(_catalog):
+        _catalog = load_catalog()
+    else:
+        version = data_version()
+        if version != _catalog.version:
+            _catalog = reload_catalog(_catalog, version)
+    return _catalog
+
+def get_catalog() -> Catalog:
+    """
+    Return the current catalog, reloading it when the data files change.
+
+    The files are only stat'ed every CATALOG_CHECK_INTERVAL seconds. A
+    reload swaps in a new catalog; requests still holding the old one keep
+    using it until they finish.
+    """
+    global _checked_at
+
+    now = time.monotonic()
+    if _catalog is not None and now - _checked_at < CATALOG_CHECK_INTERVAL:
+        return _catalog
+
+    with _catalog_lock:
+        catalog = _refresh()
+        _checked_at = now
+        return catalog
+
+def refresh_catalog() -> Catalog:
+    """Check the data files now instead of waiting for the next interval."""
+    global _checked_at
+    with _catalog_lock:
+        catalog = _refresh()
+        _checked_at = time.monotonic()
+        return catalog
+
+def update_catalog(changes: List[Dict[str, Any]]) -> Catalog:
+    """
+    Apply add/update/delete changes to the live catalog and its JSON files.
+
+    The edit lock serializes writers across workers, and the catalog is
+    synced with the files before the changes are checked, so concurrent
+    edits never overwrite each other. This worker applies the changes as an
+    overlay straight away; the others pick them up as a file diff.
+    """
+    global _catalog, _checked_at
+    with _catalog_lock, open(CATALOG_SNAPSHOT_PATH + ".edits.lock", "a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        catalog = _refresh()
+        plan = plan_changes(catalog, changes)
+        write_changes(plan)
+        _catalog = catalog.apply(plan, data_version())
+        _checked_at = time.monotonic()
+        return _catalog
+
+def _most_places(catalog: Catalog, field: str, limit: int) -> List[str]:
+    places = catalog.places
+    if places is None:
+        return []
+    counts = Counter(places.value(index, field) for index in places.indices())
+    return [value for value, _ in counts.most_common() if value][:limit]
+
+def top_regions(catalog: Catalog, limit: int) -> List[str]:
+    """Return the `limit` regions with the most places, busiest first."""
+    return _most_places(catalog, "region", limit)
+
+def top_locations(catalog: Catalog, limit: int) -> List[str]:
+    """Return the `limit` place locations (towns and cities) with the most places, busiest first."""
+    return _most_places(catalog, "location", limit)
+
+def warm_catalog(regions: int = CATALOG_LOADED_SHARDS) -> List[str]:
+    """
+    Load the catalog and the shards and indexes of its busiest regions.
+
+    Run at startup so the first requests for those regions do not pay for
+    loading them; returns the regions that were warmed.
+    """
+    catalog = get_catalog()
+    busiest = top_regions(catalog, regions)
+    for records in (catalog.places, catalog.restaurants):
+        if records is None:
+            continue
+        for region in busiest:
+            records.order_by("rating", records.where("region", region), descending=True)
+    return busiest
@@ -12,6 +12,135 @@ SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY", "")
 
 # API Keys
 WEATHER_API_KEY = os.getenv("WEATHER_API_KEY", "562c360f0d7884a7ec779f34559a11fb")
+WEATHER_API_URL = os.getenv("WEATHER_API_URL", "https://api.openweathermap.org/data/2.5")
+
+# OpenWeatherMap responses are cached per city for WEATHER_CACHE_TTL seconds
+# (the API itself only updates every ten minutes). At startup the cache is
+# primed for WEATHER_WARM_CITIES, or else for the WEATHER_WARM_LOCATIONS
+# place locations (towns and cities; regions such as "Western Ghats" are not
+# places OpenWeatherMap knows) with the most places
+WEATHER_TIMEOUT = float(os.getenv("WEATHER_TIMEOUT", "10"))
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", "600"))
+WEATHER_CACHE_SIZE = int(os.getenv("WEATHER_CACHE_SIZE", "256"))
+WEATHER_WARM_CITIES = [city.strip() for city in os.getenv("WEATHER_WARM_CITIES", "").split(",") if city.strip()]
+WEATHER_WARM_LOCATIONS = int(os.getenv("WEATHER_WARM_LOCATIONS", "3"))
+
+# Circuit breakers for Supabase and OpenWeatherMap. A service's circuit opens
+# when BREAKER_FAILURE_RATE of at least BREAKER_MIN_CALLS calls in the last
+# BREAKER_WINDOW seconds failed or took over BREAKER_SLOW_CALL seconds; calls
+# then fail fast for BREAKER_OPEN_SECONDS before trial calls are let through
+BREAKER_WINDOW = float(os.getenv("BREAKER_WINDOW", "30"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "10"))
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_SLOW_CALL = float(os.getenv("BREAKER_SLOW_CALL", "5"))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "15"))
+BREAKER_HALF_OPEN_CALLS = int(os.getenv("BREAKER_HALF_OPEN_CALLS", "1"))
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "10"))
+
+# While an upstream is failing, serve the last good response if it is no
+# older than these (seconds): cached weather, each user's itinerary reads,
+# and users already verified for a token
+WEATHER_STALE_TTL = float(os.getenv("WEATHER_STALE_TTL", "10800"))
+ITINERARY_STALE_TTL = float(os.getenv("ITINERARY_STALE_TTL", "3600"))
+ITINERARY_CACHE_SIZE = int(os.getenv("ITINERARY_CACHE_SIZE", "2048"))
+AUTH_STALE_TTL = float(os.getenv("AUTH_STALE_TTL", "300"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "2048"))
+
+# Rate limiting (set RATE_LIMIT_DB_PATH to share buckets between workers)
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_DB_PATH = os.getenv("RATE_LIMIT_DB_PATH", "")
+
+# Number of reverse proxies in front of the app. Only the X-Forwarded-For
+# hops they appended are trusted; with 0 the header is ignored, since
+# clients can set it to anything
+TRUSTED_PROXY_COUNT = int(os.getenv("TRUSTED_PROXY_COUNT", "0"))
+
+# Admission control: requests run at most ADMISSION_CAPACITY at a time per
+# worker, in route classes with their own limits and queues (see
+# app/admission.py). Shed requests are told to retry after
+# ADMISSION_RETRY_AFTER seconds; queue delay is measured over
+# ADMISSION_INTERVAL second windows
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_CAPACITY = int(os.getenv("ADMISSION_CAPACITY", "64"))
+ADMISSION_INTERVAL = float(os.getenv("ADMISSION_INTERVAL", "1.0"))
+ADMISSION_RETRY_AFTER = float(os.getenv("ADMISSION_RETRY_AFTER", "2"))
+
+# Catalog caching
+CATALOG_CHECK_INTERVAL = float(os.getenv("CATALOG_CHECK_INTERVAL", "2"))
+CATALOG_ENCODED_CACHE_SIZE = int(os.getenv("CATALOG_ENCODED_CACHE_SIZE", "512"))
+# Views keyed by client-supplied text (search queries, free-text filters)
+# are kept in a smaller LRU of their own
+CATALOG_QUERY_CACHE_SIZE = int(os.getenv("CATALOG_QUERY_CACHE_SIZE", "64"))
+
+# Prometheus metrics at /api/metrics
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# With several workers, set METRICS_DIR so that each writes its series there
+# (every METRICS_WRITE_INTERVAL seconds) and a scrape of any worker reports
+# the sum; gunicorn.conf.py sets it
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+METRICS_WRITE_INTERVAL = float(os.getenv("METRICS_WRITE_INTERVAL", "5"))
+
+# Response compression (bodies below the minimum size are sent as is)
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
 
 # Constants
-DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data"))
+
+# Memory-mapped catalog snapshot shared by all workers. Turn autobuild off
+# when snapshots are compiled ahead of time (python compile_catalog.py)
+CATALOG_SNAPSHOT_PATH = os.getenv("CATALOG_SNAPSHOT_PATH", os.path.join(DATA_DIR, "catalog.snapshot"))
+CATALOG_SNAPSHOT_AUTOBUILD = os.getenv("CATALOG_SNAPSHOT_AUTOBUILD", "true").lower() == "true"
+
+# Shards (regions) of each catalog dataset kept loaded per worker; the
+# least recently used is dropped when another is needed
+CATALOG_LOADED_SHARDS = int(os.getenv("CATALOG_LOADED_SHARDS", "16"))
+
+# Apply small edits to the catalog files as an overlay instead of a full
+# reload, until this many records have changed
+CATALOG_INCREMENTAL_RELOAD = os.getenv("CATALOG_INCREMENTAL_RELOAD", "true").lower() == "true"
+CATALOG_MAX_OVERLAY = int(os.getenv("CATALOG_MAX_OVERLAY", "1000"))
+
+# Opt-in request profiling. PROFILE_SAMPLE_RATE of requests are profiled,
+# as is any request sent with X-Profile: 1 and the admin key. PROFILE_MODE is
+# "cprofile" (every call, higher overhead) or "sample" (stack samples every
+# PROFILE_SAMPLE_INTERVAL seconds); the last PROFILE_MAX_DUMPS dumps are kept
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_MODE = os.getenv("PROFILE_MODE", "cprofile")
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(DATA_DIR, "profiles"))
+PROFILE_MAX_DUMPS = int(os.getenv("PROFILE_MAX_DUMPS", "50"))
+
+# Each request is traced (body parsing, auth, every Supabase and weather
+# call, the endpoint and serialization). Requests slower than
+# SLOW_REQUEST_MS are written with their spans as JSON lines to
+# SLOW_REQUEST_LOG, which rotates at SLOW_REQUEST_LOG_MAX_BYTES and keeps
+# SLOW_REQUEST_LOG_BACKUPS old files
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "1000"))
+SLOW_REQUEST_LOG = os.getenv("SLOW_REQUEST_LOG", os.path.join(DATA_DIR, "slow-requests.log"))
+SLOW_REQUEST_LOG_MAX_BYTES = int(os.getenv("SLOW_REQUEST_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+SLOW_REQUEST_LOG_BACKUPS = int(os.getenv("SLOW_REQUEST_LOG_BACKUPS", "5"))
+
+# Memory accounting. Every MEMORY_LOG_INTERVAL seconds (0 turns it off) the
+# RSS and each in-process store's size are printed, along with the
+# MEMORY_TOP allocation sites that grew the most while tracemalloc is
+# tracing. MEMORY_TRACEMALLOC starts tracing at startup, keeping
+# MEMORY_TRACEMALLOC_FRAMES frames per allocation; it can also be switched
+# on and off through /api/admin/memory/tracemalloc. The last
+# MEMORY_MAX_SNAPSHOTS snapshots are kept for diffing
+MEMORY_LOG_INTERVAL = float(os.getenv("MEMORY_LOG_INTERVAL", "600"))
+MEMORY_TRACEMALLOC = os.getenv("MEMORY_TRACEMALLOC", "false").lower() == "true"
+MEMORY_TRACEMALLOC_FRAMES = int(os.getenv("MEMORY_TRACEMALLOC_FRAMES", "1"))
+MEMORY_MAX_SNAPSHOTS = int(os.getenv("MEMORY_MAX_SNAPSHOTS", "5"))
+MEMORY_TOP = int(os.getenv("MEMORY_TOP", "10"))
+
+# /api/ready answers 503 until the startup warm-up has finished and while any
+# dependency in READY_REQUIRED is failing; dependencies are re-checked at
+# most every READY_CHECK_INTERVAL seconds
+READY_REQUIRED = [name.strip() for name in os.getenv("READY_REQUIRED", "catalog").split(",") if name.strip()]
+READY_CHECK_INTERVAL = float(os.getenv("READY_CHECK_INTERVAL", "30"))
+
+# Shared key for the /api/admin endpoints (sent as X-Admin-Key); they are
+# disabled when it is empty
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY", "")
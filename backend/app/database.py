@@ -1,17 +1,154 @@
 
-from supabase import create_client, Client
-from .config import SUPABASE_URL, SUPABASE_KEY
-
-# Initialize Supabase client
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-# Verify the connection and log it
-try:
-    # Test a simple query to check connection
-    response = supabase.auth.get_user("dummy_token_for_test")
-    print("✅ Supabase connection initialized successfully")
-except Exception as e:
-    print(f"❌ Error initializing Supabase connection: {str(e)}")
-    print(f"SUPABASE_URL: {SUPABASE_URL[:10]}...")  # Print partial URL for debugging
-    # Don't print the complete key for security reasons
+import threading
+from typing import TYPE_CHECKING, Any, Optional
+from .config import (
+    SUPABASE_URL, SUPABASE_KEY, SUPABASE_TIMEOUT, BREAKER_WINDOW, BREAKER_MIN_CALLS, BREAKER_FAILURE_RATE,
+    BREAKER_SLOW_CALL, BREAKER_OPEN_SECONDS, BREAKER_HALF_OPEN_CALLS
+)
+from .metrics import time_upstream
+from .resilience import CircuitBreaker, UpstreamError
 
+if TYPE_CHECKING:
+    from supabase import Client
+
+# Builder methods that name the kind of a table query
+QUERY_OPERATIONS = ("select", "insert", "update", "upsert", "delete", "rpc")
+
+def is_upstream_failure(error: Exception) -> bool:
+    """True for errors that mean Supabase is down or overloaded, not that the request was refused."""
+    import httpx
+    if isinstance(error, httpx.TransportError):
+        return True
+    # Auth errors carry the HTTP status (0 for network errors), PostgREST
+    # errors only when the response body was not JSON
+    status = getattr(error, "status", None)
+    if status is None:
+        status = getattr(error, "code", None)
+    if isinstance(status, str) and status.isdigit():
+        status = int(status)
+    return isinstance(status, int) and (status == 0 or status >= 500)
+
+# Every Supabase call goes through one breaker, so an outage fails fast
+breaker = CircuitBreaker(
+    "supabase",
+    is_upstream_failure,
+    window=BREAKER_WINDOW,
+    min_calls=BREAKER_MIN_CALLS,
+    failure_rate=BREAKER_FAILURE_RATE,
+    slow_call=BREAKER_SLOW_CALL,
+    open_seconds=BREAKER_OPEN_SECONDS,
+    half_open_calls=BREAKER_HALF_OPEN_CALLS
+)
+
+class _TimedQuery:
+    """A postgrest query builder whose execute() is timed as `<table>.<operation>` and guarded by the breaker."""
+
+    def __init__(self, builder: Any, table: str, operation: str = "query"):
+        self._builder = builder
+        self._table = table
+        self._operation = operation
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._builder, name)
+        if name == "execute":
+            def execute(*args, **kwargs):
+                with time_upstream("supabase", f"{self._table}.{self._operation}"):
+                    return breaker.call(attr, *args, **kwargs)
+            return execute
+        if not callable(attr):
+            return attr
+
+        def chain(*args, **kwargs):
+            operation = name if name in QUERY_OPERATIONS else self._operation
+            return _TimedQuery(attr(*args, **kwargs), self._table, operation)
+        return chain
+
+class _TimedNamespace:
+    """An API object (e.g. client.auth) whose method calls are timed as `<prefix>.<method>` and guarded by the breaker."""
+
+    def __init__(self, target: Any, prefix: str):
+        self._target = target
+        self._prefix = prefix
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._target, name)
+        if callable(attr):
+            def call(*args, **kwargs):
+                with time_upstream("supabase", f"{self._prefix}.{name}"):
+                    return breaker.call(attr, *args, **kwargs)
+            return call
+        if hasattr(attr, "__dict__"):
+            return _TimedNamespace(attr, f"{self._prefix}.{name}")  # e.g. auth.admin
+        return attr
+
+class InstrumentedClient:
+    """
+    The Supabase client with every call timed for /api/metrics.
+
+    Table queries are timed when executed and auth calls when made; anything
+    else is passed through to the wrapped client. The client itself (and the
+    supabase package, which is slow to import) is only created on first use,
+    so importing the app stays fast and free of network calls.
+    """
+
+    def __init__(self, url: str, key: str):
+        self._url = url
+        self._key = key
+        self._client: Optional["Client"] = None
+        self._lock = threading.Lock()
+
+    @property
+    def initialized(self) -> bool:
+        return self._client is not None
+
+    @property
+    def client(self) -> "Client":
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import httpx
+                    from supabase import ClientOptions, create_client
+                    # One pooled HTTP client with a timeout for auth and table calls alike
+                    options = ClientOptions(httpx_client=httpx.Client(timeout=SUPABASE_TIMEOUT))
+                    self._client = create_client(self._url, self._key, options)
+        return self._client
+
+    @property
+    def auth(self) -> _TimedNamespace:
+        return _TimedNamespace(self.client.auth, "auth")
+
+    def table(self, name: str) -> _TimedQuery:
+        return _TimedQuery(self.client.table(name), name)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.client, name)
+
+# Supabase client, created on first use
+supabase = InstrumentedClient(SUPABASE_URL, SUPABASE_KEY)
+
+def ping() -> None:
+    """
+    Make a round trip to the Supabase auth and REST APIs, opening the client's connections.
+
+    Raises if Supabase cannot be reached. Error responses (the probe token is
+    not a valid session) still count as reachable.
+    """
+    for probe in (
+        lambda: supabase.auth.get_user("dummy_token_for_test"),
+        lambda: supabase.table("user_itineraries").select("id").limit(1).execute()
+    ):
+        try:
+            probe()
+        except UpstreamError:
+            raise
+        except Exception:
+            pass
+
+def close_client() -> None:
+    """Close the client's HTTP connections, if it was ever created."""
+    if not supabase.initialized:
+        return
+    client = supabase.client
+    for session in (getattr(client.postgrest, "session", None), getattr(client.auth, "_http_client", None)):
+        if session is not None:
+            session.close()
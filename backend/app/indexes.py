@@ -0,0 +1,244 @@
+
+import json
+import math
+import os
+import re
+import sqlite3
+import tempfile
+from array import array
+from bisect import bisect_left
+from itertools import groupby
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+Buffer = Union[array, memoryview]
+Point = Tuple[float, float]
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+EARTH_RADIUS_METERS = 6371000.0
+GRID_CELL_DEGREES = 0.05
+# Offset that keeps grid rows and columns positive when packed into one key
+GRID_OFFSET = 1 << 20
+# Pairs buffered before each insert into a spooled postings table
+SPOOL_BATCH_SIZE = 10000
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+def haversine(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Return the great-circle distance between two points in meters."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(min(1.0, math.sqrt(a)))
+
+class PostingsBuilder:
+    """
+    Collect (key, record index) pairs and read them back grouped by key.
+
+    Pairs are kept in a dict, or, with a `spool_dir`, in a temporary SQLite
+    table so that very large imports are grouped on disk rather than in
+    memory. Keys come back sorted and each key's records sorted and unique.
+    """
+
+    def __init__(self, spool_dir: Optional[str] = None):
+        self._groups: Optional[Dict[Any, List[int]]] = None
+        self._db = None
+        if spool_dir is None:
+            self._groups = {}
+            return
+
+        fd, self._path = tempfile.mkstemp(dir=spool_dir, prefix="postings-", suffix=".db")
+        os.close(fd)
+        self._db = sqlite3.connect(self._path)
+        self._db.execute("PRAGMA journal_mode=OFF")
+        self._db.execute("PRAGMA synchronous=OFF")
+        self._db.execute("CREATE TABLE postings (key, record INTEGER)")
+        self._pending: List[Tuple[Any, int]] = []
+
+    def add(self, key: Any, record: int) -> None:
+        if self._groups is not None:
+            self._groups.setdefault(key, []).append(record)
+            return
+        self._pending.append((key, record))
+        if len(self._pending) >= SPOOL_BATCH_SIZE:
+            self._flush()
+
+    def _flush(self) -> None:
+        self._db.executemany("INSERT INTO postings VALUES (?, ?)", self._pending)
+        self._pending.clear()
+
+    def groups(self) -> Iterator[Tuple[Any, List[int]]]:
+        """Yield (key, sorted record indices) in key order."""
+        if self._groups is not None:
+            for key in sorted(self._groups):
+                yield key, sorted(set(self._groups[key]))
+            return
+
+        # SQLite compares text as UTF-8 bytes, which sorts like Python str
+        self._flush()
+        rows = self._db.execute("SELECT DISTINCT key, record FROM postings ORDER BY key, record")
+        for key, group in groupby(rows, key=itemgetter(0)):
+            yield key, [record for _, record in group]
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            os.unlink(self._path)
+            self._db = None
+
+class TextIndex:
+    """
+    Inverted index from word tokens to the records that contain them.
+
+    Lookups are conservative: `candidates` returns every record that could
+    contain the query as a substring, and the caller confirms the match on
+    the record text. Only the (small) term list is decoded; postings stay
+    in the snapshot.
+    """
+
+    def __init__(self, terms: List[str], starts: Buffer, postings: Buffer):
+        self.terms = terms
+        self.starts = starts
+        self.postings = postings
+
+    def _records(self, position: int) -> Set[int]:
+        return set(self.postings[self.starts[position]:self.starts[position + 1]])
+
+    def _union(self, positions: Iterable[int]) -> Set[int]:
+        records: Set[int] = set()
+        for position in positions:
+            records |= self._records(position)
+        return records
+
+    def _matching(self, predicate: Callable[[str], bool]) -> Set[int]:
+        return self._union(position for position, term in enumerate(self.terms) if predicate(term))
+
+    def _exact(self, token: str) -> Set[int]:
+        position = bisect_left(self.terms, token)
+        if position < len(self.terms) and self.terms[position] == token:
+            return self._records(position)
+        return set()
+
+    def _prefixed(self, token: str) -> Set[int]:
+        position = bisect_left(self.terms, token)
+        end = position
+        while end < len(self.terms) and self.terms[end].startswith(token):
+            end += 1
+        return self._union(range(position, end))
+
+    def candidates(self, query: str) -> Optional[Set[int]]:
+        """Return the records that may contain `query`, or None if it cannot be narrowed."""
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        if len(tokens) == 1:
+            return self._matching(lambda term: tokens[0] in term)
+
+        # Inner tokens are whole words; the outer ones may be cut off by
+        # the substring, so they only need to end or start a word
+        first, *middle, last = tokens
+        records = self._matching(lambda term: term.endswith(first))
+        for token in middle:
+            if not records:
+                break
+            records &= self._exact(token)
+        if records:
+            records &= self._prefixed(last)
+        return records
+
+def grid_cell(lat: float, lng: float, cell_size: float) -> Tuple[int, int]:
+    return math.floor(lat / cell_size), math.floor(lng / cell_size)
+
+def _cell_key(row: int, column: int) -> int:
+    return ((row + GRID_OFFSET) << 32) | (column + GRID_OFFSET)
+
+def grid_key(point: Point, cell_size: float = GRID_CELL_DEGREES) -> int:
+    """Return the packed key of the grid cell containing a point."""
+    return _cell_key(*grid_cell(point[0], point[1], cell_size))
+
+def bounding_box(lat: float, lng: float, radius: float) -> Tuple[float, float, float, float]:
+    """Return (min lat, min lng, max lat, max lng) of a circle of `radius` meters."""
+    lat_span = math.degrees(radius / EARTH_RADIUS_METERS)
+    lng_span = lat_span / max(math.cos(math.radians(lat)), 1e-6)
+    return lat - lat_span, lng - lng_span, lat + lat_span, lng + lng_span
+
+class GeoIndex:
+    """
+    Uniform lat/lng grid over the records that have coordinates.
+
+    A radius query only visits the cells overlapping the circle's bounding
+    box and computes exact distances for the records found there.
+    """
+
+    def __init__(self, points: Buffer, keys: Buffer, starts: Buffer, postings: Buffer, cell_size: float):
+        self.points = points
+        self.keys = keys
+        self.starts = starts
+        self.postings = postings
+        self.cell_size = cell_size
+
+    def point(self, index: int) -> Optional[Point]:
+        """Return a record's (lat, lng), or None if it has no coordinates."""
+        lat, lng = self.points[2 * index], self.points[2 * index + 1]
+        return None if lat != lat else (lat, lng)
+
+    def _cells(self, min_row: int, max_row: int, min_column: int, max_column: int) -> Iterable[int]:
+        # Probe each cell of a small box; scan the occupied cells of a large one
+        if (max_row - min_row + 1) * (max_column - min_column + 1) <= len(self.keys):
+            for row in range(min_row, max_row + 1):
+                for column in range(min_column, max_column + 1):
+                    key = _cell_key(row, column)
+                    position = bisect_left(self.keys, key)
+                    if position < len(self.keys) and self.keys[position] == key:
+                        yield position
+            return
+        for position, key in enumerate(self.keys):
+            row, column = (key >> 32) - GRID_OFFSET, (key & 0xFFFFFFFF) - GRID_OFFSET
+            if min_row <= row <= max_row and min_column <= column <= max_column:
+                yield position
+
+    def within(self, lat: float, lng: float, radius: float) -> Dict[int, float]:
+        """Return {record index: distance in meters} for records within `radius` meters."""
+        min_lat, min_lng, max_lat, max_lng = bounding_box(lat, lng, radius)
+        min_row, min_column = grid_cell(min_lat, min_lng, self.cell_size)
+        max_row, max_column = grid_cell(max_lat, max_lng, self.cell_size)
+
+        found = {}
+        for position in self._cells(min_row, max_row, min_column, max_column):
+            for index in self.postings[self.starts[position]:self.starts[position + 1]]:
+                point_lat, point_lng = self.points[2 * index], self.points[2 * index + 1]
+                distance = haversine(lat, lng, point_lat, point_lng)
+                if distance <= radius:
+                    found[index] = distance
+        return found
+
+class DistanceMatrix:
+    """Precomputed straight-line distances (meters) between named locations."""
+
+    def __init__(self, names: List[str], distances: Buffer):
+        self.names = names
+        self.distances = distances
+        self._positions = {name: position for position, name in enumerate(names)}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._positions
+
+    def distance(self, origin: str, destination: str) -> Optional[float]:
+        """Return the distance between two locations, or None if either is unknown."""
+        if origin not in self._positions or destination not in self._positions:
+            return None
+        return self.distances[self._positions[origin] * len(self.names) + self._positions[destination]]
+
+def encode_distance_matrix(coordinates: Dict[str, Point]) -> Tuple[bytes, array]:
+    """Compute the distances between every pair of locations."""
+    names = sorted(coordinates)
+    distances = array("f", (
+        haversine(*coordinates[origin], *coordinates[destination])
+        for origin in names
+        for destination in names
+    ))
+    return json.dumps(names, ensure_ascii=False).encode("utf-8"), distances
@@ -0,0 +1,367 @@
+
+import csv
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import sqlite3
+import tempfile
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from .catalog import (
+    SHARD_FIELD, data_digest, data_version, dataset_writer, encode_catalog, load_datasets, load_location_coordinates,
+    record_point, validate_record
+)
+from .config import CATALOG_SNAPSHOT_PATH
+from .models import Place
+from .snapshot import write_snapshot
+
+# Canonical place categories, as used in places.json
+CATEGORIES = (
+    "Amusement", "Beaches", "Hill Stations", "Historical Sites", "Landmarks", "Natural Attractions",
+    "Parks & Gardens", "Religious Sites", "Sports", "Wildlife", "Winery",
+)
+
+# Vendor spellings of the canonical categories, keyed by category_key()
+CATEGORY_ALIASES = {
+    "amusement park": "Amusement",
+    "amusement parks": "Amusement",
+    "theme park": "Amusement",
+    "beach": "Beaches",
+    "fort": "Historical Sites",
+    "forts": "Historical Sites",
+    "heritage": "Historical Sites",
+    "historic": "Historical Sites",
+    "historical": "Historical Sites",
+    "historical site": "Historical Sites",
+    "monument": "Historical Sites",
+    "monuments": "Historical Sites",
+    "hill station": "Hill Stations",
+    "landmark": "Landmarks",
+    "natural attraction": "Natural Attractions",
+    "nature": "Natural Attractions",
+    "garden": "Parks & Gardens",
+    "gardens": "Parks & Gardens",
+    "park": "Parks & Gardens",
+    "parks": "Parks & Gardens",
+    "parks and gardens": "Parks & Gardens",
+    "religious": "Religious Sites",
+    "religious site": "Religious Sites",
+    "temple": "Religious Sites",
+    "temples": "Religious Sites",
+    "sport": "Sports",
+    "stadium": "Sports",
+    "wildlife sanctuary": "Wildlife",
+    "vineyard": "Winery",
+    "wineries": "Winery",
+}
+
+SOURCE_EXTENSIONS = (".csv", ".ndjson", ".jsonl")
+
+BOOLEAN_FIELDS = ("featured",)
+FLOAT_FIELDS = ("rating",)
+INTEGER_FIELDS = ("price_level",)
+
+# Chunks handed to each parse worker at a time, and the most chunks in
+# flight per worker; together they bound how much of a source is in memory
+DEFAULT_CHUNK_SIZE = 1000
+CHUNKS_IN_FLIGHT = 2
+# Invalid rows are counted in full but only this many are described
+MAX_REPORTED_ERRORS = 100
+# The snapshot is not written when more than this share of rows is invalid
+DEFAULT_MAX_INVALID = 0.1
+
+WHITESPACE = re.compile(r"\s+")
+NON_WORD = re.compile(r"[^\w]+")
+
+def category_key(category: str) -> str:
+    return NON_WORD.sub(" ", category.casefold().replace("&", " and ")).strip()
+
+_CANONICAL = {category_key(category): category for category in CATEGORIES}
+
+def normalize_category(category: str) -> str:
+    """Map a vendor category onto the catalog's spelling of it."""
+    key = category_key(category)
+    if key in _CANONICAL:
+        return _CANONICAL[key]
+    if key in CATEGORY_ALIASES:
+        return CATEGORY_ALIASES[key]
+    return WHITESPACE.sub(" ", category).strip().title()
+
+def dedupe_key(record: Dict[str, Any]) -> str:
+    """Records with the same name at the same location are the same place."""
+    name = WHITESPACE.sub(" ", str(record.get("name", ""))).strip().casefold()
+    location = WHITESPACE.sub(" ", str(record.get("location", ""))).strip().casefold()
+    return f"{name}|{location}"
+
+def _parse_bool(value: str) -> bool:
+    return value.strip().lower() in ("1", "true", "yes", "y")
+
+def normalize_record(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Turn one source row into a catalog record.
+
+    CSV values arrive as strings: empty cells are dropped, numeric and
+    boolean columns are converted, and `lat`/`lng` (or `latitude`/
+    `longitude`) columns become a `coordinates` object. Strings are trimmed,
+    the category normalized, and a stable id derived when there is none.
+    """
+    record: Dict[str, Any] = {}
+    for field, value in raw.items():
+        if field is None:
+            continue  # extra cells on a CSV row
+        field = field.strip()
+        if isinstance(value, str):
+            value = value.strip()
+            if not value:
+                continue
+            try:
+                if field in FLOAT_FIELDS:
+                    value = float(value)
+                elif field in INTEGER_FIELDS:
+                    value = int(value)
+                elif field in BOOLEAN_FIELDS:
+                    value = _parse_bool(value)
+            except ValueError:
+                pass  # left as a string for validation to report
+        if value is not None:
+            record[field] = value
+
+    lat = record.pop("latitude", record.pop("lat", None))
+    lng = record.pop("longitude", record.pop("lng", None))
+    if "coordinates" not in record and lat is not None and lng is not None:
+        try:
+            record["coordinates"] = {"lat": float(lat), "lng": float(lng)}
+        except (TypeError, ValueError):
+            record["coordinates"] = {"lat": lat, "lng": lng}
+
+    for field in ("name", "location", "region"):
+        if isinstance(record.get(field), str):
+            record[field] = WHITESPACE.sub(" ", record[field])
+    if isinstance(record.get("category"), str):
+        record["category"] = normalize_category(record["category"])
+    if "id" not in record and record.get("name") and record.get("location"):
+        record["id"] = "p" + hashlib.sha1(dedupe_key(record).encode("utf-8")).hexdigest()[:12]
+    elif "id" in record:
+        record["id"] = str(record["id"])
+    return record
+
+def validate_place(record: Dict[str, Any]) -> List[str]:
+    """Check a record against the Place model and the catalog's own rules."""
+    errors = validate_record("places", record)
+    try:
+        Place(**record)
+    except ValidationError as e:
+        for error in e.errors():
+            field = ".".join(str(part) for part in error["loc"])
+            message = f"'{field}': {error['msg']}"
+            if not any(f"'{field}'" in existing for existing in errors):
+                errors.append(message)
+    return errors
+
+ParsedRow = Tuple[int, Optional[str], Optional[Dict[str, Any]], List[str]]
+
+class InvalidRow:
+    """Stands in for a source row that could not even be decoded."""
+
+    def __init__(self, message: str):
+        self.message = message
+
+def parse_chunk(rows: List[Tuple[int, Any]]) -> List[ParsedRow]:
+    """Normalize and validate a chunk of (line number, raw row) pairs in a worker."""
+    parsed = []
+    for line, raw in rows:
+        if isinstance(raw, InvalidRow):
+            parsed.append((line, None, None, [raw.message]))
+            continue
+        if not isinstance(raw, dict):
+            parsed.append((line, None, None, ["expected an object"]))
+            continue
+        record = normalize_record(raw)
+        errors = validate_place(record)
+        if errors:
+            parsed.append((line, None, None, errors))
+        else:
+            parsed.append((line, dedupe_key(record), record, []))
+    return parsed
+
+def iter_source(path: str) -> Iterator[Tuple[int, Any]]:
+    """Stream (line number, row) pairs from a CSV or NDJSON file."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+    elif extension in (".ndjson", ".jsonl"):
+        with open(path, "r", encoding="utf-8") as f:
+            for line, text in enumerate(f, start=1):
+                if not text.strip():
+                    continue
+                try:
+                    yield line, json.loads(text)
+                except ValueError as e:
+                    yield line, InvalidRow(f"invalid JSON: {str(e)}")
+    else:
+        raise ValueError(f"{path}: unsupported source format (expected {', '.join(SOURCE_EXTENSIONS)})")
+
+def iter_chunks(rows: Iterable[Tuple[int, Any]], size: int) -> Iterator[List[Tuple[int, Any]]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def parse_chunks(chunks: Iterable[List[Tuple[int, Any]]], workers: int) -> Iterator[List[ParsedRow]]:
+    """
+    Parse chunks on a process pool, yielding results in source order.
+
+    Only a few chunks per worker are submitted ahead of the consumer, so
+    reading the source never runs far ahead of staging it.
+    """
+    if workers <= 1:
+        for chunk in chunks:
+            yield parse_chunk(chunk)
+        return
+
+    with multiprocessing.Pool(workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(parse_chunk, (chunk,)))
+            if len(pending) >= workers * CHUNKS_IN_FLIGHT:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+class StagingStore:
+    """
+    On-disk staging table that drops duplicate places.
+
+    The first record seen for a name and location wins; records come back
+    grouped by region, each region in the order it was first staged, so
+    the snapshot can be written one shard at a time.
+    """
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=OFF")
+        self.conn.execute("PRAGMA synchronous=OFF")
+        self.conn.execute("CREATE TABLE records (key TEXT PRIMARY KEY, region TEXT, record BLOB NOT NULL)")
+
+    def add_many(self, rows: List[Tuple[str, Optional[str], bytes]]) -> int:
+        """Stage (key, region, record) rows, returning how many were new."""
+        before = self.conn.total_changes
+        self.conn.executemany("INSERT OR IGNORE INTO records (key, region, record) VALUES (?, ?, ?)", rows)
+        return self.conn.total_changes - before
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        for (record,) in self.conn.execute("SELECT record FROM records ORDER BY region, rowid"):
+            yield json.loads(record)
+
+    def close(self) -> None:
+        self.conn.close()
+
+class IngestRejectedError(ValueError):
+    """Raised instead of writing the snapshot when an import has no valid rows or too many invalid ones."""
+
+    def __init__(self, message: str, report: "IngestReport"):
+        super().__init__(message)
+        self.report = report
+
+class IngestReport:
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.errors: List[str] = []
+
+    def add_error(self, source: str, line: int, errors: List[str]) -> None:
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"{source}:{line}: {'; '.join(errors)}")
+
+def ingest_places(
+    sources: List[str],
+    output: str = CATALOG_SNAPSHOT_PATH,
+    workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    max_invalid: float = DEFAULT_MAX_INVALID
+) -> IngestReport:
+    """
+    Import places from CSV/NDJSON sources into a catalog snapshot.
+
+    Sources are streamed through the parse workers into an on-disk staging
+    table and then through a spooling DatasetWriter, so memory stays flat
+    however many rows are imported. The other datasets are taken from
+    their JSON files. The places are pinned: the service keeps using them
+    even though they no longer match places.json, while edits to the other
+    files are still picked up.
+
+    The existing snapshot is left alone, and IngestRejectedError raised,
+    when no rows were imported or more than `max_invalid` of them (a
+    fraction) were invalid.
+    """
+    for source in sources:
+        if os.path.splitext(source)[1].lower() not in SOURCE_EXTENSIONS:
+            raise ValueError(f"{source}: unsupported source format (expected {', '.join(SOURCE_EXTENSIONS)})")
+
+    workers = workers or os.cpu_count() or 1
+    report = IngestReport()
+    directory = os.path.dirname(os.path.abspath(output))
+
+    with tempfile.TemporaryDirectory(dir=directory, prefix=".ingest-") as spool_dir:
+        staging = StagingStore(os.path.join(spool_dir, "staging.db"))
+        try:
+            for source in sources:
+                for parsed in parse_chunks(iter_chunks(iter_source(source), chunk_size), workers):
+                    rows = []
+                    for line, key, record, errors in parsed:
+                        report.rows += 1
+                        if errors:
+                            report.add_error(source, line, errors)
+                        else:
+                            rows.append((key, record.get(SHARD_FIELD), json.dumps(record, ensure_ascii=False)))
+                    added = staging.add_many(rows)
+                    report.imported += added
+                    report.duplicates += len(rows) - added
+
+            if report.imported == 0:
+                raise IngestRejectedError(f"No valid rows in {report.rows} read; the snapshot was not written", report)
+            if report.invalid > max_invalid * report.rows:
+                raise IngestRejectedError(
+                    f"{report.invalid} of {report.rows} rows are invalid (over {max_invalid:.0%}); "
+                    "the snapshot was not written",
+                    report
+                )
+
+            coordinates = load_location_coordinates()
+            writer = dataset_writer("places", spool_dir, grouped=True)
+            for record in staging.records():
+                writer.add(record, record_point(record, coordinates))
+            sections = writer.sections()
+        finally:
+            staging.close()
+
+        # Also encodes the location distance matrix
+        others = {name: records for name, records in load_datasets().items() if name != "places"}
+        sections.update(encode_catalog(others))
+
+        metadata = {
+            "pinned": ["places"],
+            "sources": [os.path.basename(source) for source in sources],
+            "source_version": data_version(),
+            "source_digest": data_digest(),
+            "compiled_at": datetime.now().isoformat(),
+            "counts": {"places": writer.count, **{name: len(records) for name, records in others.items()}},
+        }
+        write_snapshot(output, sections, metadata)
+    return report
@@ -1,11 +1,103 @@
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from .routers import auth, itineraries, weather, places, profile
-from .auth import get_current_user
-import importlib
+from fastapi.responses import JSONResponse
+from .routers import auth, itineraries, weather, places, profile, admin
+from .config import (
+    RATE_LIMIT_ENABLED, RATE_LIMIT_DB_PATH, TRUSTED_PROXY_COUNT, COMPRESSION_MIN_SIZE, METRICS_ENABLED,
+    METRICS_DIR, METRICS_WRITE_INTERVAL,
+    PROFILING_ENABLED, PROFILE_SAMPLE_RATE, PROFILE_MODE, PROFILE_SAMPLE_INTERVAL,
+    READY_REQUIRED, READY_CHECK_INTERVAL, ADMISSION_ENABLED, ADMISSION_CAPACITY, ADMISSION_INTERVAL,
+    ADMISSION_RETRY_AFTER, TRACING_ENABLED, SLOW_REQUEST_MS, SLOW_REQUEST_LOG, SLOW_REQUEST_LOG_MAX_BYTES,
+    SLOW_REQUEST_LOG_BACKUPS, MEMORY_LOG_INTERVAL, MEMORY_TRACEMALLOC, MEMORY_TRACEMALLOC_FRAMES
+)
+from .ratelimit import RateLimitMiddleware, create_bucket_store
+from .admission import AdmissionController, AdmissionMiddleware
+from .compression import CompressionMiddleware
+from .metrics import MetricsMiddleware, SharedMetrics, registry
+from .profiling import ProfilingMiddleware, profile_store
+from .tracing import SlowRequestLog, TracingMiddleware
+from .catalog import get_catalog, warm_catalog
+from .database import ping, close_client
+from .auth import verified_subject
+from .memory import monitor
+from .readiness import Readiness
+from .resilience import UpstreamError
+
+# Startup warm-up, in order: the catalog and its busiest shards, the
+# Supabase connections, then the weather cache for the busiest locations
+readiness = Readiness(READY_CHECK_INTERVAL)
+readiness.add("catalog", warm_catalog, get_catalog, required="catalog" in READY_REQUIRED)
+readiness.add("supabase", ping, required="supabase" in READY_REQUIRED)
+readiness.add(
+    "weather",
+    weather.prime_weather_cache,
+    lambda: weather.prime_weather_cache(weather.warm_cities()[:1]),
+    required="weather" in READY_REQUIRED
+)
+
+# Under gunicorn the workers add up their metrics through files in METRICS_DIR
+shared_metrics = SharedMetrics(registry, METRICS_DIR, METRICS_WRITE_INTERVAL) if METRICS_ENABLED and METRICS_DIR else None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Startup and shutdown hooks.
+
+    Nothing is loaded while the app is imported. The warm-up runs in the
+    background once the worker has started, so /api/ready can answer 503
+    until it has finished instead of the worker appearing hung.
+    """
+    if MEMORY_TRACEMALLOC:
+        monitor.start_tracing(MEMORY_TRACEMALLOC_FRAMES)
+    monitor.start(MEMORY_LOG_INTERVAL)
+    if shared_metrics is not None:
+        shared_metrics.start()
+    readiness.start()
+    yield
+    monitor.stop()
+    if shared_metrics is not None:
+        shared_metrics.stop()
+    close_client()
+    weather.session.close()
+
+app = FastAPI(title="Travel Planner API", lifespan=lifespan)
 
-app = FastAPI(title="Travel Planner API")
+# Profile sampled or explicitly requested requests (innermost, so the profile
+# is of the route and not of compression or rate limiting)
+if PROFILING_ENABLED:
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=profile_store,
+        sample_rate=PROFILE_SAMPLE_RATE,
+        mode=PROFILE_MODE,
+        interval=PROFILE_SAMPLE_INTERVAL
+    )
+
+# Compress JSON responses that were not already pre-compressed
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+
+# Admission control and load shedding (inside rate limiting, so clients over
+# their limit get a 429 without taking a slot)
+if ADMISSION_ENABLED:
+    app.add_middleware(
+        AdmissionMiddleware,
+        controller=AdmissionController(
+            capacity=ADMISSION_CAPACITY, interval=ADMISSION_INTERVAL, retry_after=ADMISSION_RETRY_AFTER
+        )
+    )
+
+# Rate limiting (added before CORS so that 429 responses still carry CORS headers)
+if RATE_LIMIT_ENABLED:
+    bucket_store = create_bucket_store(RATE_LIMIT_DB_PATH)
+    monitor.register("rate_limit_buckets", bucket_store)
+    app.add_middleware(
+        RateLimitMiddleware,
+        store=bucket_store,
+        identify=verified_subject,
+        trusted_proxies=TRUSTED_PROXY_COUNT
+    )
 
 # Configure CORS
 app.add_middleware(
@@ -16,9 +108,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Fix import issue for auth router
-from app.auth import get_current_user
-auth.get_current_user = get_current_user
+# Trace spans per request and the slow-request log (outside admission control,
+# so time spent queueing shows up in the trace)
+if TRACING_ENABLED:
+    app.add_middleware(
+        TracingMiddleware,
+        log=SlowRequestLog(SLOW_REQUEST_LOG, SLOW_REQUEST_LOG_MAX_BYTES, SLOW_REQUEST_LOG_BACKUPS),
+        threshold_ms=SLOW_REQUEST_MS
+    )
+
+# Request counts and latency per route (outermost, so every response is counted)
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Writes and other calls without a fallback answer 503 while an upstream is failing
+@app.exception_handler(UpstreamError)
+async def upstream_error_handler(request: Request, exc: UpstreamError):
+    return JSONResponse(
+        {"detail": f"{exc.service} is unavailable, try again later"},
+        status_code=503,
+        headers={"Retry-After": str(max(1, round(exc.retry_after)))}
+    )
 
 # Include routers
 app.include_router(auth.router, prefix="/api")
@@ -26,6 +136,7 @@ app.include_router(itineraries.router, prefix="/api")
 app.include_router(weather.router, prefix="/api")
 app.include_router(places.router, prefix="/api")
 app.include_router(profile.router, prefix="/api")
+app.include_router(admin.router, prefix="/api")
 
 @app.get("/")
 async def root():
@@ -38,3 +149,16 @@ async def health_check():
         "version": "1.0.0",
         "api": "Travel Planner API",
     }
+
+@app.get("/api/ready")
+async def ready_check():
+    """Readiness for load balancers: 200 once warmed up and while required dependencies are up, else 503."""
+    readiness.refresh()
+    return JSONResponse(readiness.report(), status_code=200 if readiness.ready else 503)
+
+@app.get("/api/metrics", include_in_schema=False)
+async def metrics():
+    if not METRICS_ENABLED:
+        return Response(status_code=404)
+    body = shared_metrics.render() if shared_metrics is not None else registry.render()
+    return Response(body, media_type="text/plain; version=0.0.4; charset=utf-8")
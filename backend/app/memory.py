@@ -0,0 +1,251 @@
+
+import gc
+import itertools
+import os
+import sys
+import threading
+import tracemalloc
+import types
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .config import MEMORY_MAX_SNAPSHOTS, MEMORY_TOP
+
+# Never walked into: they are shared by the whole process, not held by a store
+_SKIPPED_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+
+def _items(container: Any, retries: int = 5) -> List[Any]:
+    """
+    Copy a container's items (key-value pairs for a dict) into a list.
+
+    Request threads keep changing the stores while they are measured, and
+    iterating a dict or set that changes size raises RuntimeError; copying
+    first means the walk below never iterates a live container, and a copy
+    that races with a change is simply retried. Returns [] if every try fails.
+    """
+    for _ in range(retries):
+        try:
+            return list(container.items()) if isinstance(container, dict) else list(container)
+        except RuntimeError:
+            continue
+    return []
+
+def estimate_size(obj: Any, sample: int = 200, max_depth: int = 32) -> int:
+    """
+    Estimate the bytes held by `obj` and the objects it references.
+
+    Containers with more than `sample` items are measured on an evenly
+    spaced sample and scaled up, so even a large store is measured in
+    bounded time. Objects reachable twice are counted once. Containers are
+    copied before they are walked, so `obj` may be changed by other threads
+    while it is measured.
+    """
+    seen = set()
+
+    def size(value: Any, depth: int) -> float:
+        if id(value) in seen or isinstance(value, _SKIPPED_TYPES):
+            return 0
+        seen.add(id(value))
+        total = sys.getsizeof(value, 0)
+        if depth >= max_depth:
+            return total
+        if isinstance(value, dict):
+            # Each key and value are measured together, so sampling keeps them paired
+            children = _items(value)
+            count = len(children)
+        elif isinstance(value, (list, tuple, set, frozenset, deque)):
+            children = _items(value)
+            count = len(children)
+        else:
+            children = [getattr(value, slot) for slot in getattr(type(value), "__slots__", ()) if hasattr(value, slot)]
+            if hasattr(value, "__dict__"):
+                children.append(vars(value))
+            count = len(children)
+        if isinstance(value, dict):
+            measure = lambda item: size(item[0], depth + 1) + size(item[1], depth + 1)
+        else:
+            measure = lambda item: size(item, depth + 1)
+        if count > sample:
+            picked = itertools.islice(children, 0, None, max(1, count // sample))
+            measured = [measure(child) for child in itertools.islice(picked, sample)]
+            return total + sum(measured) * count / max(1, len(measured))
+        return total + sum(measure(child) for child in children)
+
+    return int(size(obj, 0))
+
+def rss_bytes() -> Optional[int]:
+    """Return the process's resident set size, or its peak where the current size is unavailable."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def _top(stats: List[Any], limit: int) -> List[Dict[str, Any]]:
+    top = []
+    for stat in stats[:limit]:
+        frame = stat.traceback[0]
+        entry = {"location": f"{frame.filename}:{frame.lineno}", "size_bytes": stat.size, "count": stat.count}
+        if isinstance(stat, tracemalloc.StatisticDiff):
+            entry["size_diff_bytes"] = stat.size_diff
+            entry["count_diff"] = stat.count_diff
+        top.append(entry)
+    return top
+
+def _filtered(snapshot: tracemalloc.Snapshot) -> tracemalloc.Snapshot:
+    return snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ))
+
+class MemoryMonitor:
+    """
+    Memory accounting for the worker's in-process stores and caches.
+
+    Modules register their stores by name; report() gives each one's item
+    count and estimated size along with the process RSS. While tracemalloc
+    is tracing, snapshots can be taken and diffed (the last
+    `max_snapshots` are kept), and the periodic log started by start()
+    lists the allocation sites that grew the most since the previous log.
+    """
+
+    def __init__(self, max_snapshots: int = 5, top: int = 10):
+        self.max_snapshots = max_snapshots
+        self.top = top
+        self._stores: Dict[str, Callable[[], Any]] = {}
+        self._snapshots: "OrderedDict[int, Tuple[str, tracemalloc.Snapshot]]" = OrderedDict()
+        self._next_id = 1
+        self._logged: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, name: str, store: Any = None, lookup: Optional[Callable[[], Any]] = None) -> None:
+        """Account for `store`, or for whatever `lookup` returns at report time (None if it does not exist yet)."""
+        self._stores[name] = lookup if lookup is not None else (lambda: store)
+
+    def stores(self, sample: int = 200) -> Dict[str, Dict[str, Optional[int]]]:
+        report = {}
+        for name, get in sorted(self._stores.items()):
+            store = get()
+            if store is None:
+                report[name] = {"count": None, "bytes": 0}
+                continue
+            try:
+                count = len(store)
+            except TypeError:
+                count = None
+            report[name] = {"count": count, "bytes": estimate_size(store, sample)}
+        return report
+
+    def report(self, sample: int = 200) -> Dict[str, Any]:
+        tracing = tracemalloc.is_tracing()
+        current, peak = tracemalloc.get_traced_memory() if tracing else (None, None)
+        with self._lock:
+            snapshots = [{"id": key, "taken_at": taken_at} for key, (taken_at, _) in self._snapshots.items()]
+        return {
+            "rss_bytes": rss_bytes(),
+            "gc": {"objects": len(gc.get_objects()), "counts": gc.get_count()},
+            "stores": self.stores(sample),
+            "tracemalloc": {
+                "tracing": tracing,
+                "frames": tracemalloc.get_traceback_limit() if tracing else None,
+                "traced_bytes": current,
+                "peak_bytes": peak,
+                "snapshots": snapshots,
+            },
+        }
+
+    def start_tracing(self, frames: int = 1) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    def stop_tracing(self) -> None:
+        """Stop tracemalloc, which also discards the snapshots taken so far."""
+        tracemalloc.stop()
+        with self._lock:
+            self._snapshots.clear()
+            self._logged = None
+
+    def take_snapshot(self) -> Dict[str, Any]:
+        """Take and keep a tracemalloc snapshot; raises RuntimeError if tracemalloc is not tracing."""
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not tracing")
+        snapshot = _filtered(tracemalloc.take_snapshot())
+        taken_at = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            snapshot_id = self._next_id
+            self._next_id += 1
+            self._snapshots[snapshot_id] = (taken_at, snapshot)
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        return {
+            "id": snapshot_id,
+            "taken_at": taken_at,
+            "traced_bytes": sum(stat.size for stat in snapshot.statistics("filename")),
+            "top": _top(snapshot.statistics("lineno"), self.top),
+        }
+
+    def diff(self, base_id: int, target_id: Optional[int] = None, limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Compare two kept snapshots, or a kept snapshot with a new one, by
+        allocation site. Raises KeyError for an unknown snapshot id.
+        """
+        with self._lock:
+            base = self._snapshots[base_id][1]
+            target = self._snapshots[target_id][1] if target_id is not None else None
+        if target is None:
+            target_id = self.take_snapshot()["id"]
+            target = self._snapshots[target_id][1]
+        stats = target.compare_to(base, "lineno")
+        return {
+            "base": base_id,
+            "target": target_id,
+            "size_diff_bytes": sum(stat.size_diff for stat in stats),
+            "top": _top(stats, limit or self.top),
+        }
+
+    def log(self) -> None:
+        """Print the RSS, each store's size and, while tracing, the top growing allocation sites."""
+        stores = ", ".join(
+            f"{name}={usage['count']}/{usage['bytes'] // 1024} KiB" for name, usage in self.stores().items()
+        )
+        rss = rss_bytes()
+        print(f"Memory: rss={rss // (1024 * 1024) if rss else '?'} MiB; {stores}")
+        if not tracemalloc.is_tracing():
+            return
+        snapshot = _filtered(tracemalloc.take_snapshot())
+        previous, self._logged = self._logged, snapshot
+        stats = snapshot.compare_to(previous, "lineno") if previous is not None else snapshot.statistics("lineno")
+        for entry in _top(stats, self.top):
+            growth = f" ({entry['size_diff_bytes'] / 1024:+.1f} KiB)" if "size_diff_bytes" in entry else ""
+            print(f"Memory:   {entry['size_bytes'] / 1024:.1f} KiB in {entry['count']} blocks{growth} at {entry['location']}")
+
+    def _run(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.log()
+            except Exception as e:
+                print(f"Memory: logging failed: {e}")
+
+    def start(self, interval: float) -> None:
+        """Log memory usage every `interval` seconds on a background thread (0 turns it off)."""
+        if interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="memory-log", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread = None
+
+monitor = MemoryMonitor(MEMORY_MAX_SNAPSHOTS, MEMORY_TOP)
@@ -81,6 +81,12 @@ class ItineraryResponse(BaseModel):
     class Config:
         orm_mode = True
 
+class ItinerarySummary(ItineraryResponse):
+    activity_count: int = 0
+    day_count: int = 0
+    first_image: Optional[str] = None
+    categories: List[str] = []
+
 class ItineraryDetail(BaseModel):
     details: ItineraryResponse
     days: List[ItineraryDay]
@@ -111,3 +117,13 @@ class Place(BaseModel):
     
 class NearbyPlace(Place):
     distance: int
+
+# Catalog admin models
+class CatalogChange(BaseModel):
+    op: str  # add, update or delete
+    dataset: str  # places or restaurants
+    id: Optional[str] = None  # for delete
+    record: Optional[Dict[str, Any]] = None  # for add and update
+
+class CatalogChanges(BaseModel):
+    changes: List[CatalogChange]
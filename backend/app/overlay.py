@@ -0,0 +1,201 @@
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Union
+
+from .indexes import Point, haversine
+from .shards import ShardedRecordSet
+from .snapshot import RecordSet, Selection, encode_record, to_number
+
+class _Entry:
+    __slots__ = ("record", "raw", "point")
+
+    def __init__(self, record: Dict[str, Any], point: Optional[Point]):
+        self.record = record
+        self.raw = encode_record(record)
+        self.point = point
+
+class OverlayRecordSet:
+    """
+    A RecordSet with edits layered on top of it.
+
+    Edited and deleted base records are shadowed by index and new records
+    take indices after the base, so the base and its columns and indexes
+    are never rebuilt. Each edit returns a new overlay that shares the base
+    and copies only the (small) edit maps: readers holding the previous
+    overlay are unaffected, and an edit costs O(changes), not O(catalog).
+
+    Presents the same interface as RecordSet to the route handlers.
+    """
+
+    def __init__(
+        self,
+        base: Union[RecordSet, ShardedRecordSet],
+        entries: Optional[Dict[int, Optional[_Entry]]] = None,
+        ids: Optional[Dict[str, Optional[int]]] = None,
+        size: Optional[int] = None
+    ):
+        self.base = base
+        # index -> replacement entry, or None where the record was deleted
+        self._entries = entries or {}
+        # id -> index for every id the overlay has added, moved or removed
+        self._ids = ids or {}
+        self._size = len(base) if size is None else size
+
+    @property
+    def changes(self) -> int:
+        """Number of records the overlay shadows or adds."""
+        return len(self._entries)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def indices(self) -> Sequence[int]:
+        if all(entry is not None for entry in self._entries.values()):
+            return range(self._size)
+        return [i for i in range(self._size) if self._entries.get(i, True) is not None]
+
+    def index_of(self, record_id: str) -> Optional[int]:
+        if record_id in self._ids:
+            return self._ids[record_id]
+        return self.base.index_of(record_id)
+
+    def record_ids(self) -> Set[Any]:
+        ids = {record_id for record_id in self.base.record_ids() if record_id not in self._ids}
+        ids.update(record_id for record_id, index in self._ids.items() if index is not None)
+        return ids
+
+    def raw(self, index: int) -> memoryview:
+        entry = self._entries.get(index)
+        if entry is not None:
+            return memoryview(entry.raw)
+        return self.base.raw(index)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index in self._entries:
+            entry = self._entries[index]
+            if entry is None:
+                raise IndexError("record was deleted")
+            return dict(entry.record)
+        return self.base[index]
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for index in self.indices():
+            yield self[index]
+
+    def encoded(self) -> bytes:
+        return self.encode_subset(self.indices())
+
+    def encode_subset(self, indices: Iterable[int]) -> bytes:
+        return b"[" + b",".join(self.raw(i) for i in indices) + b"]"
+
+    def value(self, index: int, field: str) -> Any:
+        entry = self._entries.get(index)
+        if entry is not None:
+            return entry.record.get(field)
+        return self.base.value(index, field)
+
+    def _untouched(self, indices: Iterable[int]) -> List[int]:
+        base_size = len(self.base)
+        return [i for i in indices if i < base_size and i not in self._entries]
+
+    def where(self, field: str, value: str, ignore_case: bool = False, indices: Optional[Sequence[int]] = None) -> List[int]:
+        if indices is None:
+            indices = self.indices()
+
+        # Untouched base records are matched through the base columns
+        matches = set(self.base.where(field, value, ignore_case, self._untouched(indices)))
+
+        wanted = value.lower() if ignore_case else value
+        for i in indices:
+            entry = self._entries.get(i)
+            if entry is None:
+                continue
+            stored = entry.record.get(field, "")
+            if ignore_case and isinstance(stored, str):
+                stored = stored.lower()
+            if stored == wanted:
+                matches.add(i)
+        return [i for i in indices if i in matches]
+
+    def order_by(self, field: str, indices: Optional[Sequence[int]] = None, descending: bool = False) -> List[int]:
+        if indices is None:
+            indices = self.indices()
+
+        missing = float("inf") if not descending else float("-inf")
+
+        def key(i: int) -> float:
+            number = self.number(i, field)
+            return missing if number != number else number
+        return sorted(indices, key=key, reverse=descending)
+
+    def number(self, index: int, field: str) -> float:
+        entry = self._entries.get(index)
+        if entry is not None:
+            return to_number(entry.record.get(field))
+        return self.base.number(index, field)
+
+    def candidates(self, query: str, indices: Optional[Sequence[int]] = None) -> Sequence[int]:
+        if indices is None:
+            indices = self.indices()
+        matches = set(self.base.candidates(query, self._untouched(indices)))
+        # Overlay records are few, so they are always candidates and left
+        # to the caller's text match
+        matches.update(i for i in indices if self._entries.get(i) is not None)
+        return [i for i in indices if i in matches]
+
+    def point(self, index: int) -> Optional[Point]:
+        if index in self._entries:
+            entry = self._entries[index]
+            return entry.point if entry is not None else None
+        return self.base.point(index)
+
+    def within(self, lat: float, lng: float, radius: float, indices: Optional[Sequence[int]] = None) -> Dict[int, float]:
+        untouched = self._untouched(indices) if indices is not None else None
+        found = {
+            i: distance for i, distance in self.base.within(lat, lng, radius, untouched).items()
+            if i not in self._entries
+        }
+        live = self._live_entries() if indices is None else (i for i in indices if self._entries.get(i) is not None)
+        for i in live:
+            point = self._entries[i].point
+            if point is not None:
+                distance = haversine(lat, lng, point[0], point[1])
+                if distance <= radius:
+                    found[i] = distance
+        return found
+
+    def select(self, indices: Sequence[int]) -> Selection:
+        return Selection(self, indices)
+
+    def _live_entries(self) -> Iterator[int]:
+        return (i for i, entry in self._entries.items() if entry is not None)
+
+    def apply(self, upserts: Dict[str, Dict[str, Any]], deletes: Iterable[str], points: Dict[str, Optional[Point]]) -> "OverlayRecordSet":
+        """
+        Return a new overlay with records upserted and deleted by id.
+
+        An upsert replaces the record in place when the id exists and is
+        appended otherwise. `points` gives the coordinates of upserted ids.
+        """
+        entries = dict(self._entries)
+        ids = dict(self._ids)
+        size = self._size
+
+        for record_id in deletes:
+            index = self.index_of(record_id)
+            if index is not None:
+                entries[index] = None
+                ids[record_id] = None
+
+        for record_id, record in upserts.items():
+            index = ids[record_id] if record_id in ids else self.base.index_of(record_id)
+            if index is None:
+                index = size
+                size += 1
+            entries[index] = _Entry(record, points.get(record_id))
+            ids[record_id] = index
+
+        return OverlayRecordSet(self.base, entries, ids, size)
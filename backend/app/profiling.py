@@ -0,0 +1,229 @@
+
+import cProfile
+import json
+import marshal
+import os
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from .auth import is_admin_key
+from .config import PROFILE_DIR, PROFILE_MAX_DUMPS
+from .metrics import route_label
+
+PROFILE_MODES = ("cprofile", "sample")
+
+# Dump ids are generated here; anything else is rejected before touching the disk
+_ID_PATTERN = re.compile(r"^\d{13}-\d+-[0-9a-f]{6}$")
+
+_EXTENSIONS = {"cprofile": ".prof", "sample": ".folded"}
+
+class ProfileStore:
+    """
+    A bounded ring of profile dumps in one directory.
+
+    Each dump is a data file (pstats for cProfile, collapsed stacks for the
+    sampler) plus a JSON file describing the request. Ids start with the
+    creation time, so the oldest dumps are dropped first once there are more
+    than `max_dumps`. Several workers may share the directory.
+    """
+
+    def __init__(self, directory: str, max_dumps: int):
+        self.directory = directory
+        self.max_dumps = max(1, max_dumps)
+
+    def _path(self, profile_id: str, extension: str) -> str:
+        return os.path.join(self.directory, profile_id + extension)
+
+    def _write(self, path: str, data: bytes) -> None:
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def new_id(self) -> str:
+        return f"{int(time.time() * 1000):013d}-{os.getpid()}-{secrets.token_hex(3)}"
+
+    def save(self, profile_id: str, mode: str, data: bytes, info: Dict[str, Any]) -> None:
+        """Write a dump and its description and drop the oldest beyond the bound."""
+        os.makedirs(self.directory, exist_ok=True)
+        extension = _EXTENSIONS[mode]
+        self._write(self._path(profile_id, extension), data)
+        # The description is written last: a dump is listed only once complete
+        info = {"id": profile_id, "mode": mode, "size": len(data), **info}
+        self._write(self._path(profile_id, ".json"), json.dumps(info).encode("utf-8"))
+        self._prune()
+
+    def _ids(self) -> List[str]:
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-5] for name in names if name.endswith(".json") and _ID_PATTERN.match(name[:-5]))
+
+    def _prune(self) -> None:
+        ids = self._ids()
+        for profile_id in ids[:max(0, len(ids) - self.max_dumps)]:
+            # Description first, so a half-removed dump is no longer listed
+            for extension in (".json", *_EXTENSIONS.values()):
+                try:
+                    os.remove(self._path(profile_id, extension))
+                except FileNotFoundError:
+                    pass
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Describe the stored dumps, newest first."""
+        profiles = []
+        for profile_id in reversed(self._ids()):
+            try:
+                with open(self._path(profile_id, ".json"), "rb") as f:
+                    profiles.append(json.load(f))
+            except (FileNotFoundError, ValueError):
+                continue
+        return profiles
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        """Return a dump's description with the path of its data file, or None."""
+        if not _ID_PATTERN.match(profile_id):
+            return None
+        try:
+            with open(self._path(profile_id, ".json"), "rb") as f:
+                info = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        path = self._path(profile_id, _EXTENSIONS.get(info.get("mode"), ".prof"))
+        if not os.path.exists(path):
+            return None
+        return {**info, "path": path}
+
+profile_store = ProfileStore(PROFILE_DIR, PROFILE_MAX_DUMPS)
+
+class StackSampler:
+    """
+    Low-overhead sampling profiler for one thread.
+
+    A background thread records the target thread's stack every `interval`
+    seconds; the result is in the collapsed-stack format read by flame
+    graph tools (one "outer;...;inner count" line per distinct stack).
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = 0
+        self._stacks: Counter = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self._stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def dump(self) -> bytes:
+        return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common()).encode("utf-8")
+
+def _dump_cprofile(profiler: cProfile.Profile) -> bytes:
+    # Same format as Profile.dump_stats, readable with pstats or snakeviz
+    profiler.create_stats()
+    return marshal.dumps(profiler.stats)
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles a sample of requests.
+
+    A request is profiled with probability `sample_rate`, or on demand when
+    it carries `X-Profile: 1` together with a valid `X-Admin-Key`. One
+    request is profiled at a time per worker; others run unprofiled. The
+    profile covers the event loop thread, so it also contains whatever else
+    the worker ran while the request was waiting. The dump id is returned
+    in the X-Profile-Id response header.
+    """
+
+    def __init__(self, app, store: ProfileStore, sample_rate: float = 0.0, mode: str = "cprofile", interval: float = 0.005):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode '{mode}', expected one of {', '.join(PROFILE_MODES)}")
+        self.app = app
+        self.store = store
+        self.sample_rate = sample_rate
+        self.mode = mode
+        self.interval = interval
+        self._busy = threading.Lock()
+
+    def _requested(self, scope) -> bool:
+        headers = dict(scope["headers"])
+        if headers.get(b"x-profile") not in (b"1", b"true"):
+            return False
+        key = headers.get(b"x-admin-key")
+        return key is not None and is_admin_key(key.decode("latin-1"))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        wanted = self._requested(scope) or (self.sample_rate > 0 and random.random() < self.sample_rate)
+        if not wanted or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        # The id is picked up front so the response header can carry it
+        profile_id = self.store.new_id()
+        status: Optional[int] = None
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile_id.encode("ascii"))]
+            await send(message)
+
+        start = time.perf_counter()
+        if self.mode == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            profiler = StackSampler(threading.get_ident(), self.interval)
+            profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            if self.mode == "cprofile":
+                profiler.disable()
+            else:
+                profiler.stop()
+            self._busy.release()
+
+            info = {
+                "method": scope["method"],
+                "route": route_label(scope),
+                "path": scope["path"],
+                "status": status,
+                "duration_ms": round(duration * 1000, 3),
+                "created": time.time(),
+            }
+            dump = _dump_cprofile if self.mode == "cprofile" else StackSampler.dump
+            await run_in_threadpool(lambda: self.store.save(profile_id, self.mode, dump(profiler), info))
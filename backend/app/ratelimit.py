@@ -0,0 +1,252 @@
+
+import json
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Route groups share buckets; the first matching path prefix wins
+ROUTE_GROUPS: List[Tuple[str, Tuple[str, ...]]] = [
+    ("weather", ("/api/weather",)),
+    ("auth", ("/api/token", "/api/auth")),
+    ("supabase", ("/api/itineraries", "/api/profile")),
+    ("catalog", ("/api/places", "/api/restaurants", "/api/regions", "/api/locations", "/api/generate-itinerary")),
+]
+
+# Each scope maps to (capacity, refill rate in tokens per second)
+GROUP_LIMITS: Dict[str, Dict[str, Tuple[float, float]]] = {
+    # OpenWeatherMap's free tier allows 60 calls a minute for the whole key
+    "weather": {"ip": (10, 0.2), "user": (20, 0.5), "global": (60, 1.0)},
+    "auth": {"ip": (10, 0.2)},
+    "supabase": {"ip": (30, 1.0), "user": (60, 2.0)},
+    "catalog": {"ip": (120, 20.0)},
+}
+
+class TokenBucketStore:
+    """
+    In-memory token buckets keyed by string.
+
+    Buckets live in an OrderedDict kept in last-used order, so each request
+    costs O(1) and buckets that have sat idle for `idle_ttl` seconds are
+    evicted from the front a few at a time.
+    """
+
+    def __init__(self, idle_ttl: float = 600, max_buckets: int = 100000, clock=time.monotonic):
+        self.idle_ttl = idle_ttl
+        self.max_buckets = max_buckets
+        self._clock = clock
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def take(self, key: str, capacity: float, rate: float, cost: float = 1) -> float:
+        """
+        Take `cost` tokens from a bucket.
+
+        Returns 0 when the request is allowed, otherwise the number of
+        seconds until enough tokens will have refilled.
+        """
+        return self.take_all([(key, capacity, rate)], cost)
+
+    def take_all(self, limits: List[Tuple[str, float, float]], cost: float = 1) -> float:
+        """
+        Take `cost` tokens from each (key, capacity, rate) bucket, or from none.
+
+        Returns 0 when every bucket had enough tokens. Otherwise nothing is
+        charged, so a client over its own limit cannot drain a shared
+        bucket, and the longest wait until the short buckets refill is
+        returned.
+        """
+        with self._lock:
+            now = self._clock()
+            buckets = []
+            for key, capacity, rate in limits:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    bucket = self._buckets[key] = [capacity, now]
+                else:
+                    self._buckets.move_to_end(key)
+                    bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                    bucket[1] = now
+                buckets.append((bucket, rate))
+
+            self._evict(now)
+
+            wait = max([(cost - bucket[0]) / rate for bucket, rate in buckets if bucket[0] < cost], default=0)
+            if not wait:
+                for bucket, _ in buckets:
+                    bucket[0] -= cost
+            return wait
+
+    def _evict(self, now: float) -> None:
+        # Bounded work per call keeps take() O(1) amortized
+        for _ in range(2):
+            if not self._buckets:
+                return
+            key, (_, updated) = next(iter(self._buckets.items()))
+            if updated > now - self.idle_ttl and len(self._buckets) <= self.max_buckets:
+                return
+            del self._buckets[key]
+
+class SQLiteTokenBucketStore:
+    """TokenBucketStore backed by a SQLite file shared between workers."""
+
+    def __init__(self, path: str, idle_ttl: float = 600, clock=time.time):
+        self.path = path
+        self.idle_ttl = idle_ttl
+        self._clock = clock
+        self._local = threading.local()
+        self._calls = 0
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit_buckets ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL) WITHOUT ROWID"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM rate_limit_buckets").fetchone()[0]
+
+    def take(self, key: str, capacity: float, rate: float, cost: float = 1) -> float:
+        """Take `cost` tokens; returns 0 if allowed, else seconds to wait."""
+        return self.take_all([(key, capacity, rate)], cost)
+
+    def take_all(self, limits: List[Tuple[str, float, float]], cost: float = 1) -> float:
+        """Take `cost` tokens from every bucket or from none, in one transaction; see TokenBucketStore."""
+        conn = self._connect()
+        now = self._clock()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            buckets = []
+            for key, capacity, rate in limits:
+                row = conn.execute("SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?", (key,)).fetchone()
+                tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+                buckets.append((key, tokens, rate))
+            wait = max([(cost - tokens) / rate for _, tokens, rate in buckets if tokens < cost], default=0)
+            if not wait:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                    [(key, tokens - cost, now) for key, tokens, _ in buckets]
+                )
+            self._calls += 1
+            if self._calls % 1000 == 0:
+                conn.execute("DELETE FROM rate_limit_buckets WHERE updated < ?", (now - self.idle_ttl,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+def create_bucket_store(db_path: Optional[str] = None):
+    """Build a SQLite-backed bucket store when a path is given, else an in-memory one."""
+    if db_path:
+        return SQLiteTokenBucketStore(db_path)
+    return TokenBucketStore()
+
+def route_group(path: str) -> Optional[str]:
+    """Return the rate limit group for a request path, if any."""
+    for group, prefixes in ROUTE_GROUPS:
+        if path.startswith(prefixes):
+            return group
+    return None
+
+def client_ip(scope, trusted_proxies: int = 0) -> str:
+    """
+    Return the address of the client that sent a request.
+
+    Behind `trusted_proxies` reverse proxies, this is the X-Forwarded-For
+    hop the outermost of them appended, counted from the right; hops to its
+    left were sent by the client and can be anything. With no trusted
+    proxies the header is ignored.
+    """
+    peer = scope["client"][0] if scope.get("client") else "unknown"
+    if trusted_proxies <= 0:
+        return peer
+    forwarded_for = ",".join(
+        value.decode("latin-1") for name, value in scope["headers"] if name == b"x-forwarded-for"
+    )
+    hops = [hop.strip() for hop in forwarded_for.split(",") if hop.strip()]
+    return hops[-trusted_proxies] if len(hops) >= trusted_proxies else peer
+
+def check_limits(store, group: str, ip: str, user: Optional[str]) -> float:
+    """
+    Charge every bucket that applies if all of them allow the request, and
+    return the longest wait, or 0. `user` must be a verified user id.
+    """
+    limits = []
+    for scope, (capacity, rate) in GROUP_LIMITS.get(group, {}).items():
+        if scope == "ip":
+            key = f"ip:{ip}:{group}"
+        elif scope == "user":
+            if not user:
+                continue
+            key = f"user:{user}:{group}"
+        else:
+            key = f"global:{group}"
+        limits.append((key, capacity, rate))
+    return store.take_all(limits)
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware that answers 429 with Retry-After once a bucket is empty.
+
+    `identify` maps the Authorization header to a verified user id, or None
+    to limit the request by IP alone; `trusted_proxies` is the number of
+    reverse proxies whose X-Forwarded-For hops are believed.
+    """
+
+    def __init__(
+        self,
+        app,
+        store=None,
+        identify: Optional[Callable[[str], Optional[str]]] = None,
+        trusted_proxies: int = 0
+    ):
+        self.app = app
+        self.store = store if store is not None else TokenBucketStore()
+        self.identify = identify
+        self.trusted_proxies = trusted_proxies
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        group = route_group(scope["path"])
+        if group is None or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        ip = client_ip(scope, self.trusted_proxies)
+        user = None
+        if self.identify is not None:
+            headers = dict(scope["headers"])
+            user = self.identify(headers.get(b"authorization", b"").decode("latin-1"))
+
+        wait = check_limits(self.store, group, ip, user)
+        if not wait:
+            await self.app(scope, receive, send)
+            return
+
+        body = json.dumps({"detail": "Too many requests"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(math.ceil(wait)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
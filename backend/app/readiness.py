@@ -0,0 +1,120 @@
+
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+class _Dependency:
+    def __init__(self, name: str, warm: Callable[[], Any], check: Callable[[], Any], required: bool, window: int):
+        self.name = name
+        self.warm = warm
+        self.check = check
+        self.required = required
+        self.status = "pending"
+        self.error: Optional[str] = None
+        self.detail: Any = None
+        self.checked_at: Optional[str] = None
+        self.latencies: Deque[float] = deque(maxlen=window)
+
+    def run(self, action: Callable[[], Any]) -> Any:
+        started = time.perf_counter()
+        try:
+            result = action()
+            self.status, self.error = "ok", None
+        except Exception as e:
+            result = None
+            self.status, self.error = "error", f"{type(e).__name__}: {e}"
+        self.latencies.append(time.perf_counter() - started)
+        self.checked_at = datetime.now(timezone.utc).isoformat()
+        return result
+
+    def report(self) -> Dict[str, Any]:
+        latencies = [round(seconds * 1000, 2) for seconds in self.latencies]
+        return {
+            "status": self.status,
+            "required": self.required,
+            "latency_ms": latencies[-1] if latencies else None,
+            "recent_latency_ms": {
+                "avg": round(sum(latencies) / len(latencies), 2),
+                "max": max(latencies),
+            } if latencies else None,
+            "checked_at": self.checked_at,
+            "error": self.error,
+            "detail": self.detail,
+        }
+
+class Readiness:
+    """
+    The startup warm-up pipeline and the dependency status behind /api/ready.
+
+    Each dependency has a warm-up step, run once and in order by start() on
+    a background thread, and a cheaper check. The worker is ready once the
+    warm-up has finished and while every required dependency's last run
+    passed. refresh() re-runs the checks in the background at most every
+    `interval` seconds, so polling /api/ready reports current status and
+    recent latency without calling the dependencies on every poll.
+    """
+
+    def __init__(self, interval: float, window: int = 10):
+        self.interval = interval
+        self.window = window
+        self.warmed = False
+        self._dependencies: List[_Dependency] = []
+        self._checked_at = 0.0
+        self._running = threading.Lock()
+
+    def add(
+        self,
+        name: str,
+        warm: Callable[[], Any],
+        check: Optional[Callable[[], Any]] = None,
+        required: bool = True
+    ) -> None:
+        self._dependencies.append(_Dependency(name, warm, check or warm, required, self.window))
+
+    def _warm(self) -> None:
+        with self._running:
+            started = time.perf_counter()
+            for dependency in self._dependencies:
+                detail = dependency.run(dependency.warm)
+                if isinstance(detail, (dict, list, str, int, float)):
+                    dependency.detail = detail
+                message = f"Warm-up: {dependency.name} {dependency.status} in {dependency.latencies[-1] * 1000:.0f} ms"
+                print(f"{message}: {dependency.error}" if dependency.error else message)
+            self._checked_at = time.monotonic()
+            self.warmed = True
+            print(f"Warm-up finished in {time.perf_counter() - started:.2f} s")
+
+    def start(self) -> None:
+        """Run the warm-up pipeline on a background thread."""
+        threading.Thread(target=self._warm, name="warm-up", daemon=True).start()
+
+    def _check(self) -> None:
+        try:
+            for dependency in self._dependencies:
+                dependency.run(dependency.check)
+            self._checked_at = time.monotonic()
+        finally:
+            self._running.release()
+
+    def refresh(self) -> None:
+        """Re-check the dependencies in the background if the last run is older than the interval."""
+        if not self.warmed or time.monotonic() - self._checked_at < self.interval:
+            return
+        if self._running.acquire(blocking=False):
+            threading.Thread(target=self._check, name="readiness-check", daemon=True).start()
+
+    @property
+    def ready(self) -> bool:
+        return self.warmed and all(d.status == "ok" for d in self._dependencies if d.required)
+
+    def report(self) -> Dict[str, Any]:
+        if not self.warmed:
+            state = "warming"
+        else:
+            state = "ready" if self.ready else "unavailable"
+        return {
+            "status": state,
+            "dependencies": {d.name: d.report() for d in self._dependencies},
+        }
@@ -0,0 +1,178 @@
+
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Hashable, List, Optional, Tuple
+
+from .metrics import CIRCUIT_EVENTS
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+class UpstreamError(Exception):
+    """An upstream call failed in a way that counts against its circuit breaker."""
+
+    def __init__(self, service: str, message: str, retry_after: float = 0):
+        super().__init__(message)
+        self.service = service
+        self.retry_after = retry_after
+
+class CircuitOpenError(UpstreamError):
+    """The circuit is open, so the call was not attempted."""
+
+class CircuitBreaker:
+    """
+    Fail fast while an upstream service is failing.
+
+    Outcomes are counted in per-second buckets over the last `window`
+    seconds. Once at least `min_calls` calls were made in the window and
+    `failure_rate` of them failed, or took longer than `slow_call` seconds,
+    the circuit opens: calls raise CircuitOpenError at once instead of
+    waiting on the upstream. After `open_seconds` it goes half-open and lets
+    `half_open_calls` trial calls through; the circuit closes if they all
+    succeed and opens again as soon as one fails.
+
+    `is_failure` decides which exceptions count; others (e.g. a 401 for a
+    bad token) pass through without affecting the circuit. Counted failures
+    are raised as UpstreamError, chained to the original exception.
+    """
+
+    def __init__(
+        self,
+        service: str,
+        is_failure: Callable[[Exception], bool],
+        window: float = 30,
+        min_calls: int = 10,
+        failure_rate: float = 0.5,
+        slow_call: float = 5,
+        open_seconds: float = 15,
+        half_open_calls: int = 1,
+        clock=time.monotonic
+    ):
+        self.service = service
+        self.is_failure = is_failure
+        self.window = window
+        self.min_calls = max(1, min_calls)
+        self.failure_rate = failure_rate
+        self.slow_call = slow_call
+        self.open_seconds = open_seconds
+        self.half_open_calls = max(1, half_open_calls)
+        self.clock = clock
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._trials = 0
+        self._trial_successes = 0
+        # [second, calls, failures], oldest first
+        self._buckets: Deque[List[int]] = deque()
+        self._lock = threading.Lock()
+
+    def _transition(self, state: str, now: float) -> None:
+        self.state = state
+        if state == OPEN:
+            self._opened_at = now
+        if state == HALF_OPEN:
+            self._trials = self._trial_successes = 0
+        if state == CLOSED:
+            self._buckets.clear()
+        CIRCUIT_EVENTS.inc(self.service, state)
+
+    def _counts(self, now: float) -> Tuple[int, int]:
+        while self._buckets and self._buckets[0][0] <= now - self.window:
+            self._buckets.popleft()
+        return sum(b[1] for b in self._buckets), sum(b[2] for b in self._buckets)
+
+    def retry_after(self) -> float:
+        """Seconds until an open circuit lets a trial call through."""
+        if self.state != OPEN:
+            return 0
+        return max(0.0, self._opened_at + self.open_seconds - self.clock())
+
+    def _admit(self) -> bool:
+        now = self.clock()
+        with self._lock:
+            if self.state == OPEN and now - self._opened_at >= self.open_seconds:
+                self._transition(HALF_OPEN, now)
+            if self.state == OPEN:
+                return False
+            if self.state == HALF_OPEN:
+                if self._trials >= self.half_open_calls:
+                    return False
+                self._trials += 1
+            return True
+
+    def _record(self, failed: bool) -> None:
+        now = self.clock()
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if failed:
+                    self._transition(OPEN, now)
+                else:
+                    self._trial_successes += 1
+                    if self._trial_successes >= self.half_open_calls:
+                        self._transition(CLOSED, now)
+                return
+            if self.state == OPEN:
+                return
+            second = int(now)
+            if not self._buckets or self._buckets[-1][0] != second:
+                self._buckets.append([second, 0, 0])
+            self._buckets[-1][1] += 1
+            self._buckets[-1][2] += failed
+            calls, failures = self._counts(now)
+            if calls >= self.min_calls and failures >= calls * self.failure_rate:
+                self._transition(OPEN, now)
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        if not self._admit():
+            CIRCUIT_EVENTS.inc(self.service, "rejected")
+            raise CircuitOpenError(self.service, f"{self.service} is unavailable (circuit open)", self.retry_after())
+        started = self.clock()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if not self.is_failure(e):
+                self._record(self.clock() - started > self.slow_call)
+                raise
+            self._record(True)
+            raise UpstreamError(self.service, f"{self.service} request failed: {e}", self.open_seconds) from e
+        self._record(self.clock() - started > self.slow_call)
+        return result
+
+class StaleCache:
+    """
+    A bounded LRU of values with the time they were stored.
+
+    Readers choose how old a value may be, so the same entries serve as a
+    fresh cache for normal reads and as a last-known-good fallback while
+    the upstream is down.
+    """
+
+    def __init__(self, max_size: int, clock=time.monotonic):
+        self.max_size = max(1, max_size)
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, max_age: float) -> Optional[Any]:
+        """Return the value stored under `key` if it is at most `max_age` seconds old."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self.clock() - entry[0] > max_age:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (self.clock(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, predicate: Callable[[Hashable], bool]) -> None:
+        """Drop every entry whose key matches."""
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
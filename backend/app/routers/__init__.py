@@ -7,5 +7,6 @@ from . import itineraries
 from . import weather
 from . import places
 from . import profile
+from . import admin
 
-__all__ = ['auth', 'itineraries', 'weather', 'places', 'profile']
+__all__ = ['auth', 'itineraries', 'weather', 'places', 'profile', 'admin']
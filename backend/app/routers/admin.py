@@ -0,0 +1,162 @@
+
+import os
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse
+from typing import Any, Dict, Optional
+from ..auth import require_admin
+from ..catalog import (
+    Catalog, CatalogChangeError, CatalogValidationError, refresh_catalog, update_catalog
+)
+from ..memory import monitor
+from ..models import CatalogChanges
+from ..overlay import OverlayRecordSet
+from ..profiling import profile_store
+from ..shards import ShardedRecordSet
+from ..tracing import TracedRoute
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)], route_class=TracedRoute)
+
+def catalog_status(catalog: Catalog) -> Dict[str, Any]:
+    datasets, shards = {}, {}
+    for name in ("places", "restaurants"):
+        records = catalog.dataset(name)
+        datasets[name] = None if records is None else len(records.indices())
+        base = records.base if isinstance(records, OverlayRecordSet) else records
+        if isinstance(base, ShardedRecordSet):
+            shards[name] = {
+                "total": len(base.keys),
+                "loaded": base.loaded,
+                "loads": base.loads,
+                "evictions": base.evictions,
+            }
+    return {
+        "version": catalog.version,
+        "snapshot": catalog.snapshot.path if catalog.snapshot is not None else None,
+        "pinned": sorted(catalog.pinned),
+        "overlay_size": catalog.overlay_size,
+        "counts": datasets,
+        "shards": shards,
+    }
+
+@router.get("/catalog")
+async def get_catalog_status():
+    """
+    Describe the catalog this worker is serving.
+    """
+    return catalog_status(refresh_catalog())
+
+@router.post("/catalog/changes")
+def apply_catalog_changes(body: CatalogChanges):
+    """
+    Add, update or delete catalog records without rebuilding the catalog.
+
+    The changes are written to the JSON files and applied here at once;
+    other workers pick them up on their next file check.
+    """
+    changes = [change.dict() for change in body.changes]
+    try:
+        catalog = update_catalog(changes)
+    except CatalogValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=e.errors
+        )
+    except CatalogChangeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return {"applied": len(changes), **catalog_status(catalog)}
+
+@router.post("/catalog/sync")
+def sync_catalog():
+    """
+    Pick up edits made to the JSON files by hand without waiting for the next check.
+    """
+    return catalog_status(refresh_catalog())
+
+@router.get("/profiles")
+def list_profiles():
+    """
+    List the stored request profiles, newest first.
+    """
+    return profile_store.list()
+
+@router.get("/profiles/{profile_id}")
+def download_profile(profile_id: str):
+    """
+    Download a profile: a pstats file for cProfile dumps, collapsed stacks for sampled ones.
+    """
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    return FileResponse(
+        profile["path"],
+        media_type="application/octet-stream",
+        filename=os.path.basename(profile["path"])
+    )
+
+@router.get("/memory")
+def get_memory(sample: int = Query(200, ge=1, le=10000)):
+    """
+    Report the RSS, the item count and estimated size of each in-process
+    store and cache, and the state of tracemalloc.
+
+    Stores larger than `sample` items are measured on a sample and scaled up.
+    """
+    return monitor.report(sample)
+
+@router.post("/memory/tracemalloc")
+def start_tracemalloc(frames: int = Query(1, ge=1, le=100)):
+    """
+    Start tracing allocations, keeping `frames` frames of each one's stack.
+    """
+    monitor.start_tracing(frames)
+    return monitor.report()["tracemalloc"]
+
+@router.delete("/memory/tracemalloc")
+def stop_tracemalloc():
+    """
+    Stop tracing allocations and drop the snapshots taken so far.
+    """
+    monitor.stop_tracing()
+    return monitor.report()["tracemalloc"]
+
+@router.post("/memory/snapshots")
+def take_memory_snapshot():
+    """
+    Take a tracemalloc snapshot and list its largest allocation sites.
+    """
+    try:
+        return monitor.take_snapshot()
+    except RuntimeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+
+@router.get("/memory/snapshots/{base_id}/diff")
+def diff_memory_snapshots(
+    base_id: int,
+    target: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000)
+):
+    """
+    Compare a snapshot with a later one by allocation site; without a
+    target, a new snapshot is taken to compare with.
+    """
+    try:
+        return monitor.diff(base_id, target, limit)
+    except KeyError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Snapshot not found"
+        )
+    except RuntimeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
@@ -2,12 +2,15 @@
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
 from fastapi.security import OAuth2PasswordRequestForm
 from ..database import supabase
+from ..auth import get_current_user
+from ..resilience import UpstreamError
 from ..models import Token, UserCreate, UserResponse
+from ..tracing import TracedRoute
 from typing import Optional
 import random
 import string
 
-router = APIRouter(tags=["authentication"])
+router = APIRouter(tags=["authentication"], route_class=TracedRoute)
 
 def generate_verification_code():
     """Generate a random 6-digit verification code"""
@@ -30,6 +33,8 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
             "access_token": auth_response.session.access_token,
             "token_type": "bearer"
         }
+    except UpstreamError:
+        raise  # answered with 503 by the app
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -65,6 +70,8 @@ async def register_user(user_data: UserCreate, background_tasks: BackgroundTasks
             "name": user.user_metadata.get("name") if user.user_metadata else None,
             "created_at": user.created_at
         }
+    except UpstreamError:
+        raise  # answered with 503 by the app
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -97,6 +104,8 @@ async def verify_email(email: str, token: str):
             )
         
         return {"message": "Email verified successfully"}
+    except UpstreamError:
+        raise  # answered with 503 by the app
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
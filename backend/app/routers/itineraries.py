@@ -1,43 +1,109 @@
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List, Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from typing import Any, Callable, Dict, Hashable, List, Tuple
 from datetime import datetime
 import uuid
+from ..config import ITINERARY_CACHE_SIZE, ITINERARY_STALE_TTL
 from ..database import supabase
-from ..models import ItineraryCreate, ItineraryResponse, ItineraryDetail, ItineraryDay
-from ..auth import get_current_user
+from ..memory import monitor
+from ..metrics import CIRCUIT_EVENTS
+from ..models import ItineraryCreate, ItineraryResponse, ItineraryDetail, ItineraryDay, ItinerarySummary
+from ..auth import get_current_user, service_unavailable
+from ..resilience import StaleCache, UpstreamError
 from ..utils import generate_uuid
+from ..tracing import TracedRoute
 
-router = APIRouter(prefix="/itineraries", tags=["itineraries"])
+router = APIRouter(prefix="/itineraries", tags=["itineraries"], route_class=TracedRoute)
 
-@router.get("", response_model=List[ItineraryResponse])
-async def get_user_itineraries(current_user = Depends(get_current_user)):
-    # Use Supabase to fetch user itineraries
-    response = supabase.table("user_itineraries").select("*").eq("user_id", current_user.id).order("updated_at", desc=True).execute()
+# Each user's recent reads, keyed by (user_id, view, params), served while Supabase is unavailable
+_reads = StaleCache(ITINERARY_CACHE_SIZE)
+monitor.register("itinerary_reads", _reads)
+
+def read_with_fallback(key: Tuple[Hashable, ...], response: Response, read: Callable[[], Any]) -> Any:
+    """
+    Run `read` and remember its result under `key`.
     
-    if not response.data:
-        return []
+    While Supabase is failing, the remembered result (if at most
+    ITINERARY_STALE_TTL seconds old) is returned instead, marked with a
+    Warning header; without one the request fails with 503.
+    """
+    try:
+        result = read()
+    except UpstreamError as e:
+        cached = _reads.get(key, ITINERARY_STALE_TTL)
+        if cached is None:
+            raise service_unavailable("Itinerary service unavailable", e)
+        CIRCUIT_EVENTS.inc("supabase", "fallback")
+        response.headers["Warning"] = '110 - "Response is Stale"'
+        return cached
+    _reads.put(key, result)
+    return result
+
+def forget_reads(user_id: str) -> None:
+    """Drop a user's remembered reads after they change an itinerary."""
+    _reads.discard(lambda key: key[0] == user_id)
+
+@router.get("", response_model=List[ItineraryResponse])
+async def get_user_itineraries(response: Response, current_user = Depends(get_current_user)):
+    def read():
+        # Use Supabase to fetch user itineraries
+        result = supabase.table("user_itineraries").select("*").eq("user_id", current_user.id).order("updated_at", desc=True).execute()
+        return result.data or []
     
-    return response.data
+    return read_with_fallback((current_user.id, "list"), response, read)
 
-@router.get("/{itinerary_id}", response_model=ItineraryDetail)
-async def get_itinerary_by_id(itinerary_id: str, current_user = Depends(get_current_user)):
-    # Get itinerary details
-    itinerary_response = supabase.table("user_itineraries").select("*").eq("id", itinerary_id).eq("user_id", current_user.id).execute()
+def summarize_itinerary(itinerary: Dict[str, Any], activities: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Build the card summary for an itinerary from its activities."""
+    activities = sorted(activities, key=lambda a: (a.get("day") or 0, a.get("time") or ""))
     
-    if not itinerary_response.data or len(itinerary_response.data) == 0:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Itinerary not found"
-        )
+    categories = []
+    for activity in activities:
+        category = activity.get("category")
+        if category and category not in categories:
+            categories.append(category)
     
-    itinerary = itinerary_response.data[0]
+    return {
+        **itinerary,
+        "activity_count": len(activities),
+        "day_count": len({activity.get("day") for activity in activities}),
+        "first_image": next((a["image"] for a in activities if a.get("image")), None),
+        "categories": categories
+    }
+
+@router.get("/summary", response_model=List[ItinerarySummary])
+async def get_user_itinerary_summaries(
+    response: Response,
+    limit: int = Query(50, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    current_user = Depends(get_current_user)
+):
+    """
+    List the user's itineraries with the details needed for their cards.
     
-    # Get activities
-    activities_response = supabase.table("itinerary_activities").select("*").eq("itinerary_id", itinerary_id).order("day").order("time").execute()
-    activities = activities_response.data or []
+    Activities are embedded through the itinerary_activities foreign key, so a
+    page of itineraries costs a single round trip instead of one query per
+    itinerary.
+    """
+    def read():
+        result = supabase.table("user_itineraries") \
+            .select("*, itinerary_activities(day, time, image, category)") \
+            .eq("user_id", current_user.id) \
+            .order("updated_at", desc=True) \
+            .range(offset, offset + limit - 1) \
+            .execute()
+        
+        return [
+            summarize_itinerary(
+                {k: v for k, v in itinerary.items() if k != "itinerary_activities"},
+                itinerary.get("itinerary_activities") or []
+            )
+            for itinerary in result.data or []
+        ]
     
-    # Format data
+    return read_with_fallback((current_user.id, "summary", limit, offset), response, read)
+
+def group_activities_by_day(activities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Group activity rows into ordered days, as returned by the itinerary detail endpoint."""
     days = {}
     for activity in activities:
         if activity["day"] not in days:
@@ -57,11 +123,32 @@ async def get_itinerary_by_id(itinerary_id: str, current_user = Depends(get_curr
     
     formatted_days = list(days.values())
     formatted_days.sort(key=lambda x: x["day"])
+    return formatted_days
+
+@router.get("/{itinerary_id}", response_model=ItineraryDetail)
+async def get_itinerary_by_id(itinerary_id: str, response: Response, current_user = Depends(get_current_user)):
+    def read():
+        # Get itinerary details
+        itinerary_response = supabase.table("user_itineraries").select("*").eq("id", itinerary_id).eq("user_id", current_user.id).execute()
+        
+        if not itinerary_response.data or len(itinerary_response.data) == 0:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Itinerary not found"
+            )
+        
+        itinerary = itinerary_response.data[0]
+        
+        # Get activities
+        activities_response = supabase.table("itinerary_activities").select("*").eq("itinerary_id", itinerary_id).order("day").order("time").execute()
+        activities = activities_response.data or []
+        
+        return {
+            "details": itinerary,
+            "days": group_activities_by_day(activities)
+        }
     
-    return {
-        "details": itinerary,
-        "days": formatted_days
-    }
+    return read_with_fallback((current_user.id, "detail", itinerary_id), response, read)
 
 @router.post("", response_model=ItineraryResponse)
 async def create_itinerary(
@@ -111,6 +198,7 @@ async def create_itinerary(
     if activities:
         supabase.table("itinerary_activities").insert(activities).execute()
     
+    forget_reads(current_user.id)
     return itinerary_response.data[0]
 
 @router.delete("/{itinerary_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -130,6 +218,7 @@ async def delete_itinerary(itinerary_id: str, current_user = Depends(get_current
     # Delete itinerary
     supabase.table("user_itineraries").delete().eq("id", itinerary_id).execute()
     
+    forget_reads(current_user.id)
     return {"status": "success"}
 
 @router.put("/{itinerary_id}", response_model=ItineraryResponse)
@@ -191,4 +280,5 @@ async def update_itinerary(
     if activities:
         supabase.table("itinerary_activities").insert(activities).execute()
     
+    forget_reads(current_user.id)
     return itinerary_response.data[0]
@@ -1,14 +1,38 @@
 
-from fastapi import APIRouter, HTTPException, status
-from typing import Dict, Any, List, Optional
-from ..utils import load_json_data
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, Iterator, List, Optional
+from ..utils import load_json_data, stream_ndjson, stream_sse
+from ..catalog import Catalog, Records, dumps, get_catalog, json_response
 from ..database import supabase
 from ..auth import get_current_user
+from ..tracing import TracedRoute
 
-router = APIRouter(tags=["places"])
+router = APIRouter(tags=["places"], route_class=TracedRoute)
+
+# Fields the list endpoints can sort by (highest first)
+SORT_FIELDS = ("rating",)
+
+def get_places_catalog() -> Catalog:
+    """Return the catalog, failing with a 500 if the places file is missing."""
+    catalog = get_catalog()
+    if catalog.places is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Places data file not found"
+        )
+    return catalog
+
+def check_sort(sort: Optional[str]) -> None:
+    """Reject sort fields the catalog has no column for."""
+    if sort is not None and sort not in SORT_FIELDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported sort field. Choose from: {', '.join(SORT_FIELDS)}"
+        )
 
 @router.get("/places")
-async def get_places(region: Optional[str] = None, category: Optional[str] = None, limit: Optional[int] = None):
+async def get_places(request: Request, region: Optional[str] = None, category: Optional[str] = None, limit: Optional[int] = None, sort: Optional[str] = None):
     """
     Get a list of popular places and attractions.
     
@@ -16,54 +40,56 @@ async def get_places(region: Optional[str] = None, category: Optional[str] = Non
         region: Optional region filter for places within Maharashtra
         category: Optional category filter (e.g., "Historical Sites", "Beaches")
         limit: Optional limit on number of results
+        sort: Optional field to sort by, highest first (e.g., "rating")
     """
-    places_data = load_json_data("places.json")
-    if not places_data:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Places data file not found"
-        )
-    
-    places = places_data.get("places", [])
+    catalog = get_places_catalog()
+    check_sort(sort)
     
-    # Apply filters
-    if region:
-        places = [p for p in places if p.get("region", "") == region]
+    def build():
+        places = catalog.places
+        indices = places.indices()
         
-    if category:
-        places = [p for p in places if p.get("category", "").lower() == category.lower()]
-    
-    # Apply limit if specified
-    if limit and limit > 0:
-        places = places[:limit]
+        # Apply filters on the catalog columns
+        if region:
+            indices = places.where("region", region, indices=indices)
+            
+        if category:
+            indices = places.where("category", category, ignore_case=True, indices=indices)
+        
+        if sort:
+            indices = places.order_by(sort, indices, descending=True)
         
-    return places
+        # Apply limit if specified
+        if limit and limit > 0:
+            indices = indices[:limit]
+            
+        return places.select(indices)
+    
+    key = ("places", region, category.lower() if category else None, limit if limit and limit > 0 else None, sort)
+    # Free-text categories and arbitrary limits are cached like searches
+    return catalog.response(request, key, build, query=key[2] is not None or key[3] is not None)
 
 @router.get("/regions")
-async def get_regions():
+async def get_regions(request: Request):
     """
     Get a list of all regions in Maharashtra.
     """
-    places_data = load_json_data("places.json")
-    if not places_data:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Places data file not found"
-        )
-    
-    places = places_data.get("places", [])
+    catalog = get_places_catalog()
     
-    # Extract unique regions from places data
-    regions = set()
-    for place in places:
-        region = place.get("region")
-        if region:
-            regions.add(region)
+    def build():
+        # Extract unique regions from places data
+        regions = set()
+        for index in catalog.places.indices():
+            region = catalog.places.value(index, "region")
+            if region:
+                regions.add(region)
+        
+        return {"regions": sorted(list(regions))}
     
-    return {"regions": sorted(list(regions))}
+    return catalog.response(request, ("regions",), build)
 
 @router.get("/restaurants")
-async def get_restaurants(region: Optional[str] = None, cuisine: Optional[str] = None, price: Optional[str] = None):
+async def get_restaurants(request: Request, region: Optional[str] = None, cuisine: Optional[str] = None, price: Optional[str] = None, sort: Optional[str] = None):
     """
     Get a list of restaurants and eateries.
     
@@ -71,102 +97,165 @@ async def get_restaurants(region: Optional[str] = None, cuisine: Optional[str] =
         region: Optional region filter for restaurants within Maharashtra
         cuisine: Optional cuisine filter
         price: Optional price range filter (Budget-Friendly, Mid-Range, Luxury)
+        sort: Optional field to sort by, highest first (e.g., "rating")
     """
-    restaurants_data = load_json_data("restaurants.json")
-    if not restaurants_data:
+    catalog = get_catalog()
+    if catalog.restaurants is None:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Restaurants data file not found"
         )
+    check_sort(sort)
     
-    restaurants = restaurants_data.get("restaurants", [])
-    
-    # Apply filters
-    if region:
-        restaurants = [r for r in restaurants if r.get("region", "") == region]
-    
-    if cuisine:
-        restaurants = [r for r in restaurants if r.get("cuisine", "").lower() == cuisine.lower()]
-    
-    if price:
-        restaurants = [r for r in restaurants if r.get("price", "").lower() == price.lower()]
+    def build():
+        restaurants = catalog.restaurants
+        indices = restaurants.indices()
+        
+        # Apply filters on the catalog columns
+        if region:
+            indices = restaurants.where("region", region, indices=indices)
+        
+        if cuisine:
+            indices = restaurants.where("cuisine", cuisine, ignore_case=True, indices=indices)
+        
+        if price:
+            indices = restaurants.where("price", price, ignore_case=True, indices=indices)
         
-    return restaurants
+        if sort:
+            indices = restaurants.order_by(sort, indices, descending=True)
+            
+        return restaurants.select(indices)
+    
+    key = ("restaurants", region, cuisine.lower() if cuisine else None, price.lower() if price else None, sort)
+    # Free-text cuisines and prices are cached like searches
+    return catalog.response(request, key, build, query=key[2] is not None or key[3] is not None)
 
 @router.get("/places/nearby")
 async def get_nearby_places(lat: float, lng: float, radius: Optional[int] = 5000, region: Optional[str] = None):
     """
-    Get places near a specific location.
-    """
-    # For demo purposes, just return all places with a distance calculation added
-    places_data = load_json_data("places.json")
-    if not places_data:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Places data file not found"
-        )
+    Get the places within `radius` meters of a location, nearest first.
     
-    places = places_data.get("places", [])
+    Only places with known coordinates (their own or their location's in
+    locations.json) can be placed, so places without them are left out.
+    """
+    places = get_places_catalog().places
+    indices = places.indices()
     
     # Filter by region if specified
     if region:
-        places = [p for p in places if p.get("region", "") == region]
-    
-    # In a real implementation, you would calculate actual distances
-    # or use a geospatial database query
-    import random
-    for place in places:
-        place["distance"] = random.randint(100, radius)
+        indices = places.where("region", region, indices=indices)
     
-    # Filter places within radius
-    nearby = [p for p in places if p.get("distance", 0) <= radius]
-    return nearby
+    # The grid index only holds places with coordinates. Copy each place so
+    # the shared catalog records are never mutated.
+    distances = places.within(lat, lng, radius, indices)
+    nearby = [
+        {**places[index], "distance": round(distance)}
+        for index, distance in sorted(distances.items(), key=lambda item: item[1])
+    ]
+    return json_response(dumps(nearby))
 
-@router.post("/generate-itinerary")
-async def generate_itinerary(options: Dict[str, Any]):
+def iter_itinerary_days(template: Dict[str, Any], options: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
     """
-    Generate a custom itinerary based on user preferences.
-    """
-    # Load template from file
-    template = load_json_data("itinerary_template.json")
-    if not template:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Itinerary template file not found"
-        )
+    Yield the generated itinerary one day at a time.
     
+    Both the buffered and the streaming endpoints are driven by this generator,
+    so a day can be sent to the client as soon as it has been planned.
+    """
     # Customize the template based on options
     days = options.get("days", 3)
     pace = options.get("pace", "moderate")
     interests = options.get("interests", [])
     regions = options.get("regions", [])  # Added support for multiple regions
     
-    result = []
+    # Adjust number of activities based on pace
+    activities_per_day = 3  # Default for moderate pace
+    if pace == "relaxed":
+        activities_per_day = 2
+    elif pace == "intensive":
+        activities_per_day = 4
     
     # For a real implementation, you would have a more sophisticated
     # algorithm to generate the itinerary based on interests, pace, etc.
     for day in range(1, days + 1):
-        # Adjust number of activities based on pace
-        activities_per_day = 3  # Default for moderate pace
-        if pace == "relaxed":
-            activities_per_day = 2
-        elif pace == "intensive":
-            activities_per_day = 4
-        
         # In a real implementation, you would select activities 
         # based on interests, regions, and other factors
         day_activities = template.get("activities", [])[:activities_per_day]
         
-        day_data = {
+        yield {
             "day": day,
             "activities": day_activities
         }
-        result.append(day_data)
+
+def load_itinerary_template() -> Dict[str, Any]:
+    """Load the itinerary template or fail with a 500."""
+    template = load_json_data("itinerary_template.json")
+    if not template:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Itinerary template file not found"
+        )
+    return template
+
+@router.post("/generate-itinerary")
+async def generate_itinerary(options: Dict[str, Any]):
+    """
+    Generate a custom itinerary based on user preferences.
+    """
+    template = load_itinerary_template()
+    return list(iter_itinerary_days(template, options))
+
+@router.post("/generate-itinerary/stream")
+async def generate_itinerary_stream(options: Dict[str, Any], request: Request):
+    """
+    Generate a custom itinerary and stream it back day by day.
+    
+    Clients that send `Accept: text/event-stream` receive Server-Sent Events
+    (one `day` event per day followed by a `done` event); everyone else gets
+    newline-delimited JSON with one day per line.
+    """
+    template = load_itinerary_template()
+    days = iter_itinerary_days(template, options)
     
-    return result
+    if "text/event-stream" in request.headers.get("accept", ""):
+        body = stream_sse(days, event="day")
+        media_type = "text/event-stream"
+    else:
+        body = stream_ndjson(days)
+        media_type = "application/x-ndjson"
+    
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def search_indices(places: Records, query: str, category: Optional[str] = None, region: Optional[str] = None) -> List[int]:
+    """Return the indices of places whose name or description contains the (lowercase) query."""
+    indices = places.indices()
+    
+    # Apply category and region filters on the columns first so only
+    # the remaining records are decoded for the text match
+    if category is not None:
+        indices = places.where("category", category, ignore_case=True, indices=indices)
+    if region is not None:
+        indices = places.where("region", region, ignore_case=True, indices=indices)
+    
+    # Only records sharing words with the query can contain it
+    indices = places.candidates(query, indices)
+    
+    results = []
+    for index in indices:
+        place = places[index]
+        name = place.get("name", "").lower()
+        description = place.get("description", "").lower()
+        
+        # Filter by search term
+        if query in name or query in description:
+            results.append(index)
+    return results
 
 @router.get("/places/search")
-async def search_places(query: str, category: Optional[str] = None, region: Optional[str] = None):
+async def search_places(request: Request, query: str, category: Optional[str] = None, region: Optional[str] = None):
     """
     Search for places by name or description.
     
@@ -175,61 +264,43 @@ async def search_places(query: str, category: Optional[str] = None, region: Opti
         category: Optional category filter
         region: Optional region filter
     """
-    places_data = load_json_data("places.json")
-    if not places_data:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Places data file not found"
-        )
-    
-    places = places_data.get("places", [])
+    catalog = get_places_catalog()
     
     # Simple search implementation
     query = query.lower()
-    results = []
     
-    for place in places:
-        name = place.get("name", "").lower()
-        description = place.get("description", "").lower()
-        place_category = place.get("category", "").lower()
-        place_region = place.get("region", "").lower()
-        
-        # Filter by search term
-        if query in name or query in description:
-            # Apply category filter if specified
-            if category is None or (category and category.lower() == place_category):
-                # Apply region filter if specified
-                if region is None or (region and region.lower() == place_region):
-                    results.append(place)
+    def build():
+        places = catalog.places
+        return places.select(search_indices(places, query, category, region))
     
-    return results
+    key = ("search", query, category, region)
+    return catalog.response(request, key, build, query=True)
 
 @router.get("/locations")
-async def get_locations(region: Optional[str] = None):
+async def get_locations(request: Request, region: Optional[str] = None):
     """
     Get a list of all unique locations across Maharashtra.
     
     Args:
         region: Optional filter to get locations within a specific region
     """
-    places_data = load_json_data("places.json")
-    if not places_data:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Places data file not found"
-        )
-    
-    places = places_data.get("places", [])
+    catalog = get_places_catalog()
     
-    # Filter by region first if specified
-    if region:
-        places = [p for p in places if p.get("region", "") == region]
-    
-    # Extract unique locations
-    locations = set()
-    for place in places:
-        location = place.get("location")
-        if location:
-            locations.add(location)
+    def build():
+        places = catalog.places
+        indices = places.indices()
+        
+        # Filter by region first if specified
+        if region:
+            indices = places.where("region", region, indices=indices)
+        
+        # Extract unique locations
+        locations = set()
+        for index in indices:
+            location = places.value(index, "location")
+            if location:
+                locations.add(location)
+        
+        return {"locations": sorted(list(locations))}
     
-    return {"locations": sorted(list(locations))}
+    return catalog.response(request, ("locations", region), build)
@@ -4,9 +4,11 @@ from typing import Optional, Dict, Any
 from ..database import supabase
 from ..models import UserProfileUpdate, UserProfileResponse
 from ..auth import get_current_user
+from ..resilience import UpstreamError
 from ..utils import sanitize_input, is_valid_email
+from ..tracing import TracedRoute
 
-router = APIRouter(tags=["user_profile"])
+router = APIRouter(tags=["user_profile"], route_class=TracedRoute)
 
 @router.get("/profile", response_model=UserProfileResponse)
 async def get_user_profile(current_user = Depends(get_current_user)):
@@ -26,6 +28,8 @@ async def get_user_profile(current_user = Depends(get_current_user)):
             "bio": current_user.user_metadata.get("bio") if current_user.user_metadata else None,
             "avatar_url": current_user.user_metadata.get("avatar_url") if current_user.user_metadata else None
         }
+    except UpstreamError:
+        raise  # answered with 503 by the app
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -80,6 +84,8 @@ async def update_user_profile(profile_data: UserProfileUpdate, current_user = De
             "bio": response.user.user_metadata.get("bio") if response.user.user_metadata else None,
             "avatar_url": response.user.user_metadata.get("avatar_url") if response.user.user_metadata else None
         }
+    except UpstreamError:
+        raise  # answered with 503 by the app
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -116,6 +122,8 @@ async def get_user_stats(current_user = Depends(get_current_user)):
             "forum_posts": forum_posts_count,
             "hours_explored": hours_explored
         }
+    except UpstreamError:
+        raise  # answered with 503 by the app
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
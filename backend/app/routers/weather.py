@@ -1,32 +1,165 @@
 
 from fastapi import APIRouter, HTTPException, status, Depends
 import requests
-from typing import Optional
-from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from datetime import date, datetime, timedelta
 import json
-from ..config import WEATHER_API_KEY
-from ..auth import get_current_user
+from ..config import (
+    WEATHER_API_KEY, WEATHER_API_URL, WEATHER_TIMEOUT, WEATHER_CACHE_TTL, WEATHER_CACHE_SIZE, WEATHER_STALE_TTL,
+    WEATHER_WARM_CITIES, WEATHER_WARM_LOCATIONS, BREAKER_WINDOW, BREAKER_MIN_CALLS, BREAKER_FAILURE_RATE,
+    BREAKER_SLOW_CALL, BREAKER_OPEN_SECONDS, BREAKER_HALF_OPEN_CALLS
+)
+from ..catalog import get_catalog, top_locations
+from ..metrics import CIRCUIT_EVENTS, time_upstream
+from ..memory import monitor
+from ..resilience import CircuitBreaker, StaleCache, UpstreamError
+from ..auth import get_current_user, service_unavailable
+from ..tracing import TracedRoute
 
-router = APIRouter(tags=["weather"])
+router = APIRouter(tags=["weather"], route_class=TracedRoute)
+
+# One session per worker, so calls reuse pooled keep-alive connections
+session = requests.Session()
+
+_cache = StaleCache(WEATHER_CACHE_SIZE)
+monitor.register("weather_cache", _cache)
+
+def is_weather_failure(error: Exception) -> bool:
+    """True for errors that mean OpenWeatherMap is down; an unknown city (404) is not one."""
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    response = getattr(error, "response", None)
+    return isinstance(error, requests.exceptions.HTTPError) and response is not None and response.status_code >= 500
+
+breaker = CircuitBreaker(
+    "openweathermap",
+    is_weather_failure,
+    window=BREAKER_WINDOW,
+    min_calls=BREAKER_MIN_CALLS,
+    failure_rate=BREAKER_FAILURE_RATE,
+    slow_call=BREAKER_SLOW_CALL,
+    open_seconds=BREAKER_OPEN_SECONDS,
+    half_open_calls=BREAKER_HALF_OPEN_CALLS
+)
+
+def _get(endpoint: str, city: str) -> Dict[str, Any]:
+    params = {"q": city, "units": "metric", "appid": WEATHER_API_KEY}
+    with time_upstream("openweathermap", endpoint):
+        response = session.get(f"{WEATHER_API_URL}/{endpoint}", params=params, timeout=WEATHER_TIMEOUT)
+    response.raise_for_status()  # Raise exception for 4XX/5XX responses
+    return response.json()
+
+def fetch_weather(endpoint: str, city: str, refresh: bool = False) -> Dict[str, Any]:
+    """
+    Return OpenWeatherMap's `endpoint` ("weather" or "forecast") response for a city.
+    
+    Responses are cached per city for WEATHER_CACHE_TTL seconds and must not
+    be modified by callers. While OpenWeatherMap is failing, a cached
+    response up to WEATHER_STALE_TTL seconds old is returned instead; without
+    one, UpstreamError is raised. Other failures (e.g. an unknown city) raise
+    requests.exceptions.RequestException.
+    """
+    key = (endpoint, city.strip().lower())
+    if not refresh and WEATHER_CACHE_TTL > 0:
+        cached = _cache.get(key, WEATHER_CACHE_TTL)
+        if cached is not None:
+            return cached
+    
+    try:
+        data = breaker.call(_get, endpoint, city)
+    except UpstreamError:
+        stale = _cache.get(key, WEATHER_STALE_TTL)
+        if stale is None:
+            raise
+        CIRCUIT_EVENTS.inc("openweathermap", "fallback")
+        return stale
+    
+    if WEATHER_CACHE_TTL > 0 or WEATHER_STALE_TTL > 0:
+        _cache.put(key, data)
+    return data
+
+def warm_cities() -> List[str]:
+    """Return the cities whose weather is fetched ahead of requests."""
+    return WEATHER_WARM_CITIES or top_locations(get_catalog(), WEATHER_WARM_LOCATIONS)
+
+def prime_weather_cache(cities: Optional[List[str]] = None) -> List[str]:
+    """Fetch current weather and forecasts for `cities` (default: warm_cities()) and return those that succeeded."""
+    primed = []
+    error: Optional[Exception] = None
+    for city in warm_cities() if cities is None else cities:
+        try:
+            fetch_weather("weather", city, refresh=True)
+            fetch_weather("forecast", city, refresh=True)
+            primed.append(city)
+        except (requests.exceptions.RequestException, UpstreamError) as e:
+            error = e
+    if error is not None and not primed:
+        raise error
+    return primed
 
 @router.get("/weather")
 async def get_weather(city: str):
     """
     Get current weather information for a city.
     """
-    api_key = WEATHER_API_KEY
-    url = f"https://api.openweathermap.org/data/2.5/weather?q={city}&units=metric&appid={api_key}"
-    
     try:
-        response = requests.get(url)
-        response.raise_for_status()  # Raise exception for 4XX/5XX responses
-        return response.json()
+        return fetch_weather("weather", city)
+    except UpstreamError as e:
+        raise service_unavailable("Weather service unavailable", e)
     except requests.exceptions.RequestException as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to fetch weather data: {str(e)}"
         )
 
+def aggregate_forecast(items: List[Dict[str, Any]], days: int, current_date: date) -> List[Dict[str, Any]]:
+    """Fold 3-hourly forecast entries into one summary per day, for `days` days from `current_date`."""
+    # Process the 3-hour forecast data into daily forecasts
+    daily_forecasts = {}
+    
+    for item in items:
+        timestamp = datetime.fromtimestamp(item['dt'])
+        day = timestamp.date()
+    
+        # Only include forecast for requested number of days
+        if (day - current_date).days >= days:
+            continue
+    
+        if day not in daily_forecasts:
+            daily_forecasts[day] = {
+                'date': day.strftime('%Y-%m-%d'),
+                'temp_min': float('inf'),
+                'temp_max': float('-inf'),
+                'humidity': [],
+                'weather_descriptions': [],
+                'icon': None
+            }
+    
+        # Update min/max temperature
+        daily_forecasts[day]['temp_min'] = min(daily_forecasts[day]['temp_min'], item['main']['temp_min'])
+        daily_forecasts[day]['temp_max'] = max(daily_forecasts[day]['temp_max'], item['main']['temp_max'])
+    
+        # Add humidity
+        daily_forecasts[day]['humidity'].append(item['main']['humidity'])
+    
+        # Add weather description
+        description = item['weather'][0]['description']
+        if description not in daily_forecasts[day]['weather_descriptions']:
+            daily_forecasts[day]['weather_descriptions'].append(description)
+    
+        # Use noon weather icon as the daily icon
+        if timestamp.hour >= 12 and timestamp.hour < 15 and not daily_forecasts[day]['icon']:
+            daily_forecasts[day]['icon'] = item['weather'][0]['icon']
+    
+    # Calculate average humidity and format the result
+    result = []
+    for day, forecast in sorted(daily_forecasts.items()):
+        if forecast['humidity']:
+            forecast['humidity'] = sum(forecast['humidity']) // len(forecast['humidity'])
+        result.append(forecast)
+    
+    return result
+
 @router.get("/weather/forecast")
 async def get_weather_forecast(city: str, days: Optional[int] = 5):
     """
@@ -38,61 +171,13 @@ async def get_weather_forecast(city: str, days: Optional[int] = 5):
             detail="Days parameter must be between 1 and 7"
         )
     
-    api_key = WEATHER_API_KEY
-    url = f"https://api.openweathermap.org/data/2.5/forecast?q={city}&units=metric&appid={api_key}"
-    
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        
-        # Process the 3-hour forecast data into daily forecasts
-        daily_forecasts = {}
-        current_date = datetime.now().date()
+        data = fetch_weather("forecast", city)
         
-        for item in data.get('list', []):
-            timestamp = datetime.fromtimestamp(item['dt'])
-            date = timestamp.date()
-            
-            # Only include forecast for requested number of days
-            if (date - current_date).days >= days:
-                continue
-                
-            if date not in daily_forecasts:
-                daily_forecasts[date] = {
-                    'date': date.strftime('%Y-%m-%d'),
-                    'temp_min': float('inf'),
-                    'temp_max': float('-inf'),
-                    'humidity': [],
-                    'weather_descriptions': [],
-                    'icon': None
-                }
-            
-            # Update min/max temperature
-            daily_forecasts[date]['temp_min'] = min(daily_forecasts[date]['temp_min'], item['main']['temp_min'])
-            daily_forecasts[date]['temp_max'] = max(daily_forecasts[date]['temp_max'], item['main']['temp_max'])
-            
-            # Add humidity
-            daily_forecasts[date]['humidity'].append(item['main']['humidity'])
-            
-            # Add weather description
-            description = item['weather'][0]['description']
-            if description not in daily_forecasts[date]['weather_descriptions']:
-                daily_forecasts[date]['weather_descriptions'].append(description)
-            
-            # Use noon weather icon as the daily icon
-            if timestamp.hour >= 12 and timestamp.hour < 15 and not daily_forecasts[date]['icon']:
-                daily_forecasts[date]['icon'] = item['weather'][0]['icon']
-        
-        # Calculate average humidity and format the result
-        result = []
-        for date, forecast in sorted(daily_forecasts.items()):
-            if forecast['humidity']:
-                forecast['humidity'] = sum(forecast['humidity']) // len(forecast['humidity'])
-            result.append(forecast)
-        
-        return result
+        return aggregate_forecast(data.get('list', []), days, datetime.now().date())
         
+    except UpstreamError as e:
+        raise service_unavailable("Weather service unavailable", e)
     except requests.exceptions.RequestException as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -104,14 +189,9 @@ async def get_weather_recommendation(city: str):
     """
     Get travel recommendations based on current weather.
     """
-    # First get the current weather
-    api_key = WEATHER_API_KEY
-    url = f"https://api.openweathermap.org/data/2.5/weather?q={city}&units=metric&appid={api_key}"
-    
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        weather_data = response.json()
+        # First get the current weather
+        weather_data = fetch_weather("weather", city)
         
         # Extract relevant weather information
         temp = weather_data['main']['temp']
@@ -172,6 +252,8 @@ async def get_weather_recommendation(city: str):
         
         return recommendations
         
+    except UpstreamError as e:
+        raise service_unavailable("Weather service unavailable", e)
     except requests.exceptions.RequestException as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
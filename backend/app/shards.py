@@ -0,0 +1,336 @@
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+
+from .indexes import Point, bounding_box
+from .snapshot import (
+    DatasetWriter, RecordSet, Section, Selection, decode_record, encode_record, load_records, narrow, new_section
+)
+
+Bounds = List[float]  # [min lat, min lng, max lat, max lng]
+
+def _shard_key(value: Any) -> Optional[str]:
+    return value if isinstance(value, str) else None
+
+class ShardedDatasetWriter:
+    """
+    Encode a dataset as one DatasetWriter per distinct value of `field`.
+
+    Records keep their position in the dataset: the directory maps each
+    one to its shard and each shard lists the positions it holds. With
+    `grouped`, records must arrive grouped by the field and each shard is
+    finished as soon as the next one starts, so only one shard's buffers
+    are held while importing.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        field: str,
+        writer: Callable[[str], DatasetWriter],
+        spool_dir: Optional[str] = None,
+        grouped: bool = False
+    ):
+        self.name = name
+        self.field = field
+        self.count = 0
+        self.spool_dir = spool_dir
+        self.grouped = grouped
+        self._writer = writer
+        self._shards: Dict[Optional[str], int] = {}
+        self._writers: List[Optional[DatasetWriter]] = []
+        self._counts: List[int] = []
+        self._bounds: List[Optional[Bounds]] = []
+        self._positions: List[Section] = []
+        self._finished: Dict[str, Section] = {}
+        self._shard_of = new_section("I", spool_dir)
+        self._shard_index = new_section("I", spool_dir)
+        self._current: Optional[int] = None
+
+    def _start_shard(self, key: Optional[str]) -> int:
+        shard = self._shards[key] = len(self._writers)
+        self._writers.append(self._writer(f"{self.name}@{shard}"))
+        self._counts.append(0)
+        self._bounds.append(None)
+        self._positions.append(new_section("I", self.spool_dir))
+        return shard
+
+    def _finish_shard(self, shard: int) -> None:
+        writer = self._writers[shard]
+        self._finished.update(writer.sections())
+        self._finished[f"{writer.name}.positions"] = self._positions[shard]
+        self._writers[shard] = None
+
+    def add(self, record: Dict[str, Any], point: Optional[Point] = None) -> None:
+        """Append one record (and its coordinates, if known) to its shard."""
+        key = _shard_key(record.get(self.field))
+        shard = self._shards.get(key)
+        if shard is None:
+            if self.grouped and self._current is not None:
+                self._finish_shard(self._current)
+            shard = self._start_shard(key)
+        elif self.grouped and shard != self._current:
+            raise ValueError(f"{self.name} records are not grouped by '{self.field}'")
+        self._current = shard
+
+        self._shard_of.append(shard)
+        self._shard_index.append(self._counts[shard])
+        self._positions[shard].append(self.count)
+        self._writers[shard].add(record, point)
+        self._counts[shard] += 1
+
+        if point is not None:
+            bounds = self._bounds[shard]
+            if bounds is None:
+                self._bounds[shard] = [point[0], point[1], point[0], point[1]]
+            else:
+                bounds[0], bounds[1] = min(bounds[0], point[0]), min(bounds[1], point[1])
+                bounds[2], bounds[3] = max(bounds[2], point[0]), max(bounds[3], point[1])
+        self.count += 1
+
+    def sections(self) -> Dict[str, Section]:
+        """Finish every shard and return the dataset's sections."""
+        for shard, writer in enumerate(self._writers):
+            if writer is not None:
+                self._finish_shard(shard)
+
+        directory = {
+            "field": self.field,
+            "shards": [
+                {"key": key, "count": self._counts[shard], "bounds": self._bounds[shard]}
+                for key, shard in self._shards.items()
+            ],
+        }
+        shard_of = self._shard_of
+        sections: Dict[str, Section] = {
+            f"{self.name}.shards": encode_record(directory),
+            f"{self.name}.shard_of": narrow(shard_of, self.spool_dir) if len(self._shards) <= 0x10000 else shard_of,
+            f"{self.name}.shard_index": self._shard_index,
+        }
+        sections.update(self._finished)
+        return sections
+
+def _overlaps(bounds: Optional[Bounds], box: Tuple[float, float, float, float]) -> bool:
+    if bounds is None:
+        return False
+    return bounds[0] <= box[2] and box[0] <= bounds[2] and bounds[1] <= box[3] and box[1] <= bounds[3]
+
+class ShardedRecordSet:
+    """
+    A dataset split into shards by one field, each loaded on first use.
+
+    Records keep their dataset-wide indices and order: a per-record
+    directory maps every index to its shard, so a query filtered on the
+    shard field (e.g. one region) only loads that shard's columns and
+    indexes and only faults in its part of the snapshot. At most
+    `max_loaded` shards stay loaded; when another is needed the least
+    recently used one is dropped and its pages released.
+
+    Presents the same interface as RecordSet to the route handlers.
+    """
+
+    def __init__(
+        self,
+        sections: Mapping[str, Any],
+        name: str,
+        max_loaded: int,
+        release: Optional[Callable[[Iterable[str]], None]] = None
+    ):
+        directory = decode_record(sections[f"{name}.shards"])
+        self.name = name
+        self.field = directory["field"]
+        self.keys: List[Optional[str]] = [shard["key"] for shard in directory["shards"]]
+        self.bounds: List[Optional[Bounds]] = [shard["bounds"] for shard in directory["shards"]]
+        self.shard_of = sections[f"{name}.shard_of"]
+        self.shard_index = sections[f"{name}.shard_index"]
+        self.max_loaded = max(1, max_loaded)
+        self.loads = 0
+        self.evictions = 0
+        self._sections = sections
+        self._release = release
+        self._loaded: "OrderedDict[int, Tuple[RecordSet, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._ids: Optional[Dict[Any, int]] = None
+
+    @property
+    def loaded(self) -> int:
+        """Number of shards currently loaded."""
+        return len(self._loaded)
+
+    def _shard_sections(self, shard: int) -> List[str]:
+        prefix = f"{self.name}@{shard}."
+        return [name for name in self._sections if name.startswith(prefix)]
+
+    def _shard(self, shard: int) -> Tuple[RecordSet, Any]:
+        """Return a shard's RecordSet and the dataset index of each of its records."""
+        with self._lock:
+            loaded = self._loaded.get(shard)
+            if loaded is not None:
+                self._loaded.move_to_end(shard)
+                return loaded
+
+            name = f"{self.name}@{shard}"
+            loaded = self._loaded[shard] = (load_records(self._sections, name), self._sections[f"{name}.positions"])
+            self.loads += 1
+            while len(self._loaded) > self.max_loaded:
+                evicted, _ = self._loaded.popitem(last=False)
+                self.evictions += 1
+                if self._release is not None:
+                    self._release(self._shard_sections(evicted))
+            return loaded
+
+    def _group(self, indices: Iterable[int]) -> Dict[int, List[int]]:
+        groups: Dict[int, List[int]] = {}
+        shard_of = self.shard_of
+        for i in indices:
+            groups.setdefault(shard_of[i], []).append(i)
+        return groups
+
+    def _is_all(self, indices: Optional[Sequence[int]]) -> bool:
+        return indices is None or (isinstance(indices, range) and indices == range(len(self)))
+
+    def __len__(self) -> int:
+        return len(self.shard_of)
+
+    def indices(self) -> Sequence[int]:
+        return range(len(self))
+
+    def index_of(self, record_id: str) -> Optional[int]:
+        if self._ids is None:
+            # Loads every shard once; only edits need it
+            ids = {}
+            for shard in range(len(self.keys)):
+                records, positions = self._shard(shard)
+                for local, record in enumerate(records):
+                    ids[record.get("id")] = positions[local]
+            self._ids = ids
+        return self._ids.get(record_id)
+
+    def record_ids(self) -> Iterable[Any]:
+        self.index_of(None)
+        return self._ids.keys()
+
+    def raw(self, index: int) -> memoryview:
+        records, _ = self._shard(self.shard_of[index])
+        return records.raw(self.shard_index[index])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("record index out of range")
+        records, _ = self._shard(self.shard_of[index])
+        return records[self.shard_index[index]]
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def encoded(self) -> bytes:
+        return self.encode_subset(range(len(self)))
+
+    def encode_subset(self, indices: Iterable[int]) -> bytes:
+        # Gather shard by shard so each is loaded once, then emit in order
+        indices = list(indices)
+        raw = {}
+        for shard, group in self._group(indices).items():
+            records, _ = self._shard(shard)
+            for i in group:
+                raw[i] = records.raw(self.shard_index[i])
+        return b"[" + b",".join(raw[i] for i in indices) + b"]"
+
+    def value(self, index: int, field: str) -> Any:
+        if field == self.field:
+            return self.keys[self.shard_of[index]]
+        records, _ = self._shard(self.shard_of[index])
+        return records.value(self.shard_index[index], field)
+
+    def number(self, index: int, field: str) -> float:
+        records, _ = self._shard(self.shard_of[index])
+        return records.number(self.shard_index[index], field)
+
+    def where(self, field: str, value: str, ignore_case: bool = False, indices: Optional[Sequence[int]] = None) -> List[int]:
+        if field == self.field:
+            # Answered from the directory without loading any shard
+            wanted = value.lower() if ignore_case else value
+            shards = {
+                shard for shard, key in enumerate(self.keys)
+                if key is not None and (key.lower() if ignore_case else key) == wanted
+            }
+            if self._is_all(indices) and len(shards) == 1:
+                (shard,) = shards
+                return list(self._sections[f"{self.name}@{shard}.positions"])
+            shard_of = self.shard_of
+            return [i for i in (indices if indices is not None else range(len(self))) if shard_of[i] in shards]
+
+        if indices is None:
+            indices = range(len(self))
+        matches = set()
+        for shard, group in self._group(indices).items():
+            records, positions = self._shard(shard)
+            local = [self.shard_index[i] for i in group]
+            matches.update(positions[j] for j in records.where(field, value, ignore_case, local))
+        return [i for i in indices if i in matches]
+
+    def order_by(self, field: str, indices: Optional[Sequence[int]] = None, descending: bool = False) -> List[int]:
+        if indices is None:
+            indices = range(len(self))
+
+        missing = float("inf") if not descending else float("-inf")
+        keys = {}
+        for shard, group in self._group(indices).items():
+            records, _ = self._shard(shard)
+            for i in group:
+                number = records.number(self.shard_index[i], field)
+                keys[i] = missing if number != number else number
+        return sorted(indices, key=keys.__getitem__, reverse=descending)
+
+    def candidates(self, query: str, indices: Optional[Sequence[int]] = None) -> Sequence[int]:
+        if indices is None:
+            indices = range(len(self))
+        matches = set()
+        for shard, group in self._group(indices).items():
+            records, positions = self._shard(shard)
+            local = [self.shard_index[i] for i in group]
+            matches.update(positions[j] for j in records.candidates(query, local))
+        return [i for i in indices if i in matches]
+
+    def point(self, index: int) -> Optional[Point]:
+        shard = self.shard_of[index]
+        if self.bounds[shard] is None:
+            return None
+        records, _ = self._shard(shard)
+        return records.point(self.shard_index[index])
+
+    def within(self, lat: float, lng: float, radius: float, indices: Optional[Sequence[int]] = None) -> Dict[int, float]:
+        # Shards whose points all lie outside the circle's box are skipped
+        box = bounding_box(lat, lng, radius)
+        shards = range(len(self.keys)) if self._is_all(indices) else self._group(indices)
+        found = {}
+        for shard in shards:
+            if not _overlaps(self.bounds[shard], box):
+                continue
+            records, positions = self._shard(shard)
+            for j, distance in records.within(lat, lng, radius).items():
+                found[positions[j]] = distance
+        if not self._is_all(indices):
+            wanted = set(indices)
+            found = {i: distance for i, distance in found.items() if i in wanted}
+        return found
+
+    def select(self, indices: Sequence[int]) -> Selection:
+        return Selection(self, indices)
+
+def load_dataset(
+    sections: Mapping[str, Any],
+    name: str,
+    max_loaded: int,
+    release: Optional[Callable[[Iterable[str]], None]] = None
+) -> Optional[Union[RecordSet, ShardedRecordSet]]:
+    """Return dataset `name` from the sections, sharded or not, or None if it is absent."""
+    if f"{name}.shards" in sections:
+        return ShardedRecordSet(sections, name, max_loaded, release)
+    return load_records(sections, name)
@@ -0,0 +1,641 @@
+
+import json
+import math
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Set, Tuple, Union
+
+from .indexes import (
+    GRID_CELL_DEGREES, DistanceMatrix, GeoIndex, Point, PostingsBuilder, TextIndex, encode_distance_matrix, grid_key,
+    tokenize
+)
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the standard library
+    orjson = None
+
+# File layout:
+#   magic (8 bytes) | header length (uint32) | JSON header | sections
+# Every section starts on an 8-byte boundary so typed arrays can be cast
+# directly from the mapping without copying.
+#
+# A dataset `name` is stored as:
+#   name.json                  records as one JSON array
+#   name.offsets               uint32 start of each record (plus the end)
+#   name.column.<field>.values JSON list of the distinct values of a field
+#   name.column.<field>.codes  per-record index into that list
+#   name.number.<field>        float32 per record, NaN when missing
+#   name.text.*                inverted index over the searchable text
+#   name.geo.*                 grid index over records with coordinates
+# or, when sharded by a field (see shards.py), as one such dataset per
+# shard, `name@<n>`, plus a directory:
+#   name.shards                JSON list of the shards and their keys
+#   name.shard_of              per-record shard number
+#   name.shard_index           per-record index within its shard
+#   name@<n>.positions         uint32 dataset index of each shard record
+# and named locations as:
+#   locations.names            JSON list of location names
+#   locations.distances        float32 distance matrix, row-major
+MAGIC = b"NAVICAT\x00"
+FORMAT_VERSION = 4
+ALIGNMENT = 8
+# Values buffered in memory before a spooled section is flushed to disk
+SPOOL_CHUNK_ITEMS = 65536
+
+def encode_record(record: Dict[str, Any]) -> bytes:
+    """Encode one record as compact JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(record)
+    return json.dumps(record, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def decode_record(raw: Union[bytes, memoryview]) -> Dict[str, Any]:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(bytes(raw))
+
+class Column:
+    """
+    Dictionary-encoded string column.
+
+    Each distinct value is stored once in `values` and every record holds a
+    small integer code into it; code 0 stands for a missing value.
+    """
+
+    def __init__(self, values: List[Any], codes: Union[array, memoryview]):
+        self.values = values
+        self.codes = codes
+        self._folded = [v.lower() if isinstance(v, str) else v for v in values]
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, index: int) -> Any:
+        return self.values[self.codes[index]]
+
+    def codes_for(self, value: str, ignore_case: bool = False) -> Set[int]:
+        """Return the codes whose value equals `value`."""
+        if ignore_case:
+            value = value.lower()
+            return {code for code, folded in enumerate(self._folded) if code and folded == value}
+        return {code for code, stored in enumerate(self.values) if code and stored == value}
+
+class RecordSet:
+    """
+    Read-only sequence of JSON records stored back to back in one buffer.
+
+    The buffer holds the whole dataset as a JSON array and `offsets[i]` is
+    where record i starts, so the full list, any single record or any subset
+    can be emitted by slicing and joining bytes. Records are only decoded
+    into dicts when something asks for one.
+
+    Fields stored as columns are filtered and sorted without decoding any
+    record: categorical strings through their codes and numbers through a
+    float32 array. Text search and radius queries are narrowed through the
+    optional text and geo indexes.
+    """
+
+    def __init__(
+        self,
+        blob: Union[bytes, memoryview],
+        offsets: Union[array, memoryview],
+        columns: Optional[Dict[str, Column]] = None,
+        numbers: Optional[Dict[str, Union[array, memoryview]]] = None,
+        text_index: Optional[TextIndex] = None,
+        geo_index: Optional[GeoIndex] = None
+    ):
+        self.blob = blob
+        self.offsets = offsets
+        self.columns = columns or {}
+        self.numbers = numbers or {}
+        self.text_index = text_index
+        self.geo_index = geo_index
+        self._ids: Optional[Dict[Any, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def indices(self) -> Sequence[int]:
+        """Return the indices of all records."""
+        return range(len(self))
+
+    def index_of(self, record_id: str) -> Optional[int]:
+        """Return the index of the record with the given id, or None."""
+        if self._ids is None:
+            # Decoded once per record set; only edits need it
+            self._ids = {record.get("id"): index for index, record in enumerate(self)}
+        return self._ids.get(record_id)
+
+    def record_ids(self) -> Iterable[Any]:
+        """Return the ids of all records."""
+        self.index_of(None)
+        return self._ids.keys()
+
+    def raw(self, index: int) -> memoryview:
+        """Return the encoded bytes of one record."""
+        # Each record is followed by a "," or the closing "]"
+        return memoryview(self.blob)[self.offsets[index]:self.offsets[index + 1] - 1]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("record index out of range")
+        return decode_record(self.raw(index))
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for index in range(len(self)):
+            yield decode_record(self.raw(index))
+
+    def encoded(self) -> bytes:
+        """Return the whole dataset as a JSON array."""
+        return bytes(self.blob)
+
+    def encode_subset(self, indices: Iterable[int]) -> bytes:
+        """Return the given records as a JSON array without re-serializing them."""
+        return b"[" + b",".join(self.raw(i) for i in indices) + b"]"
+
+    def value(self, index: int, field: str) -> Any:
+        """Return one field of one record, from its column when there is one."""
+        if field in self.columns:
+            return self.columns[field][index]
+        return self[index].get(field)
+
+    def where(self, field: str, value: str, ignore_case: bool = False, indices: Optional[Sequence[int]] = None) -> List[int]:
+        """Return the indices (within `indices`, if given) of records whose `field` equals `value`."""
+        if indices is None:
+            indices = range(len(self))
+
+        column = self.columns.get(field)
+        if column is None:
+            if ignore_case:
+                value = value.lower()
+            matches = []
+            for i in indices:
+                stored = self[i].get(field, "")
+                if ignore_case and isinstance(stored, str):
+                    stored = stored.lower()
+                if stored == value:
+                    matches.append(i)
+            return matches
+
+        wanted = column.codes_for(value, ignore_case)
+        if not wanted:
+            return []
+        codes = column.codes
+        if len(wanted) == 1:
+            (code,) = wanted
+            return [i for i in indices if codes[i] == code]
+        return [i for i in indices if codes[i] in wanted]
+
+    def number(self, index: int, field: str) -> float:
+        """Return a numeric field of one record, NaN when it is missing."""
+        numbers = self.numbers.get(field)
+        if numbers is not None:
+            return numbers[index]
+        return to_number(self.value(index, field))
+
+    def order_by(self, field: str, indices: Optional[Sequence[int]] = None, descending: bool = False) -> List[int]:
+        """Return `indices` sorted by a field, records missing it last."""
+        if indices is None:
+            indices = range(len(self))
+
+        missing = float("inf") if not descending else float("-inf")
+        numbers = self.numbers.get(field)
+        if numbers is not None:
+            def key(i: int) -> float:
+                number = numbers[i]
+                return missing if number != number else number
+        else:
+            def key(i: int) -> float:
+                number = self.value(i, field)
+                return number if isinstance(number, (int, float)) else missing
+        return sorted(indices, key=key, reverse=descending)
+
+    def candidates(self, query: str, indices: Optional[Sequence[int]] = None) -> Sequence[int]:
+        """Return the indices (within `indices`, if given) of records whose text may contain `query`."""
+        if indices is None:
+            indices = range(len(self))
+        candidates = self.text_index.candidates(query) if self.text_index is not None else None
+        if candidates is None:
+            return indices
+        return [i for i in indices if i in candidates]
+
+    def point(self, index: int) -> Optional[Point]:
+        """Return a record's (lat, lng), or None if it has no coordinates."""
+        return self.geo_index.point(index) if self.geo_index is not None else None
+
+    def within(self, lat: float, lng: float, radius: float, indices: Optional[Sequence[int]] = None) -> Dict[int, float]:
+        """Return {index: distance in meters} for records (within `indices`) that lie within `radius` meters."""
+        if self.geo_index is None:
+            return {}
+        found = self.geo_index.within(lat, lng, radius)
+        if indices is not None:
+            wanted = set(indices)
+            found = {i: distance for i, distance in found.items() if i in wanted}
+        return found
+
+    def select(self, indices: Sequence[int]) -> "Selection":
+        """Return a lazy view of the given records."""
+        return Selection(self, indices)
+
+class Selection:
+    """
+    A subset of a RecordSet.
+
+    Encoding a selection joins the stored bytes of its records, so filtered
+    views are never decoded into dicts and re-serialized.
+    """
+
+    def __init__(self, records: RecordSet, indices: Sequence[int]):
+        self.records = records
+        self.indices = indices
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return Selection(self.records, self.indices[index])
+        return self.records[self.indices[index]]
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for index in self.indices:
+            yield self.records[index]
+
+    def encoded(self) -> bytes:
+        """Return the selected records as a JSON array."""
+        return self.records.encode_subset(self.indices)
+
+class SpooledSection:
+    """
+    A snapshot section written incrementally to a temporary file.
+
+    Typed values are buffered in a small array and flushed in chunks, so a
+    section of any size takes a fixed amount of memory to build.
+    """
+
+    def __init__(self, typecode: str = "B", spool_dir: Optional[str] = None):
+        self.typecode = typecode
+        self.nbytes = 0
+        fd, self._path = tempfile.mkstemp(dir=spool_dir, prefix="section-")
+        os.close(fd)
+        self._buffer = bytearray() if typecode == "B" else array(typecode)
+        self._itemsize = 1 if typecode == "B" else self._buffer.itemsize
+
+    def __len__(self) -> int:
+        return (self.nbytes + len(self._buffer) * self._itemsize) // self._itemsize
+
+    def append(self, value: Any) -> None:
+        self._buffer.append(value)
+        if len(self._buffer) >= SPOOL_CHUNK_ITEMS:
+            self.flush()
+
+    def extend(self, values: Iterable[Any]) -> None:
+        self._buffer.extend(values)
+        if len(self._buffer) >= SPOOL_CHUNK_ITEMS:
+            self.flush()
+
+    def flush(self) -> None:
+        # The file is only open while it is written or read, so a dataset
+        # split into many shards does not hold a descriptor per section
+        if self._buffer:
+            with open(self._path, "ab") as f:
+                f.write(self._buffer)
+            self.nbytes += len(self._buffer) * self._itemsize
+            del self._buffer[:]
+
+    def chunks(self, size: int = 1 << 20) -> Iterator[bytes]:
+        """Yield the section's bytes from the start, `size` bytes at a time."""
+        self.flush()
+        with open(self._path, "rb") as f:
+            for chunk in iter(lambda: f.read(size), b""):
+                yield chunk
+
+    def close(self) -> None:
+        if os.path.exists(self._path):
+            os.unlink(self._path)
+
+Section = Union[bytes, bytearray, array, SpooledSection]
+
+class DatasetWriter:
+    """
+    Encode a dataset into snapshot sections one record at a time.
+
+    With a `spool_dir`, sections and index postings are staged on disk as
+    records arrive, so memory does not grow with the number of records;
+    only the distinct column values and the index keys are held. Without
+    one everything is built in memory, which suits the small JSON files.
+
+    `columns` are dictionary-encoded, `numbers` stored as float32, the
+    `text_fields` indexed for search and, with `points`, records given a
+    point are indexed for radius queries.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        columns: Iterable[str] = (),
+        numbers: Iterable[str] = (),
+        text_fields: Iterable[str] = (),
+        points: bool = False,
+        spool_dir: Optional[str] = None
+    ):
+        self.name = name
+        self.count = 0
+        self.spool_dir = spool_dir
+        self._json = self._section("B")
+        self._json.extend(b"[")
+        self._position = 1
+        self._offsets = self._section("I")
+        self._columns = {field: ({None: 0}, self._section("I")) for field in columns}
+        self._numbers = {field: self._section("f") for field in numbers}
+        self._text_fields = tuple(text_fields)
+        self._terms = PostingsBuilder(spool_dir) if self._text_fields else None
+        self._points = self._section("f") if points else None
+        self._cells = PostingsBuilder(spool_dir) if points else None
+
+    def _section(self, typecode: str) -> Section:
+        return new_section(typecode, self.spool_dir)
+
+    def add(self, record: Dict[str, Any], point: Optional[Point] = None) -> None:
+        """Append one record (and its coordinates, if known)."""
+        index = self.count
+        raw = encode_record(record)
+        if index:
+            self._json.extend(b",")
+            self._position += 1
+        self._offsets.append(self._position)
+        self._json.extend(raw)
+        self._position += len(raw)
+
+        for field, (table, codes) in self._columns.items():
+            value = _categorical(record.get(field))
+            code = table.get(value)
+            if code is None:
+                code = table[value] = len(table)
+            codes.append(code)
+
+        for field, numbers in self._numbers.items():
+            numbers.append(to_number(record.get(field)))
+
+        if self._terms is not None:
+            text = " ".join(str(record.get(field) or "") for field in self._text_fields)
+            for token in set(tokenize(text)):
+                self._terms.add(token, index)
+
+        if self._points is not None:
+            if point is None:
+                self._points.extend((math.nan, math.nan))
+            else:
+                self._points.extend(point)
+                self._cells.add(grid_key(point), index)
+
+        self.count += 1
+
+    def _postings(self, builder: PostingsBuilder) -> Tuple[List[Any], Section, Section]:
+        keys = []
+        starts = self._section("I")
+        postings = self._section("I")
+        starts.append(0)
+        total = 0
+        for key, records in builder.groups():
+            keys.append(key)
+            postings.extend(records)
+            total += len(records)
+            starts.append(total)
+        builder.close()
+        return keys, starts, postings
+
+    def sections(self) -> Dict[str, Section]:
+        """Finish the dataset and return its sections."""
+        name = self.name
+        self._json.extend(b"]")
+        self._offsets.append(self._position + 1)
+        sections: Dict[str, Section] = {f"{name}.json": self._json, f"{name}.offsets": self._offsets}
+
+        for field, (table, codes) in self._columns.items():
+            sections[f"{name}.column.{field}.values"] = encode_record(list(table))
+            sections[f"{name}.column.{field}.codes"] = narrow(codes, self.spool_dir) if len(table) <= 0x10000 else codes
+
+        for field, numbers in self._numbers.items():
+            sections[f"{name}.number.{field}"] = numbers
+
+        if self._terms is not None:
+            terms, starts, postings = self._postings(self._terms)
+            sections[f"{name}.text.terms"] = encode_record(terms)
+            sections[f"{name}.text.starts"] = starts
+            sections[f"{name}.text.postings"] = postings
+
+        if self._points is not None:
+            keys, starts, postings = self._postings(self._cells)
+            sections[f"{name}.geo.points"] = self._points
+            sections[f"{name}.geo.keys"] = array("q", keys)
+            sections[f"{name}.geo.starts"] = starts
+            sections[f"{name}.geo.postings"] = postings
+            sections[f"{name}.geo.cell"] = array("d", [GRID_CELL_DEGREES])
+        return sections
+
+def new_section(typecode: str, spool_dir: Optional[str] = None) -> Section:
+    """Return an empty section, spooled to disk when a `spool_dir` is given."""
+    if spool_dir is not None:
+        return SpooledSection(typecode, spool_dir)
+    return bytearray() if typecode == "B" else array(typecode)
+
+def narrow(codes: Section, spool_dir: Optional[str] = None) -> Section:
+    """Convert a uint32 section whose values fit in 16 bits to uint16."""
+    if isinstance(codes, array):
+        return array("H", codes)
+    narrowed = SpooledSection("H", spool_dir)
+    for chunk in codes.chunks():
+        wide = array("I")
+        wide.frombytes(chunk)
+        narrowed.extend(wide.tolist())
+    codes.close()
+    return narrowed
+
+def _categorical(value: Any) -> Any:
+    # Only hashable scalars can be dictionary-encoded
+    return value if isinstance(value, (str, int, float, bool)) else None
+
+def to_number(value: Any) -> float:
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else math.nan
+
+def encode_locations(coordinates: Dict[str, Point]) -> Dict[str, Section]:
+    """Encode the distance matrix between named locations."""
+    names, distances = encode_distance_matrix(coordinates)
+    return {"locations.names": names, "locations.distances": distances}
+
+def load_records(sections: Mapping[str, Any], name: str) -> Optional[RecordSet]:
+    """Assemble the RecordSet for dataset `name` from its sections, or None if it is absent."""
+    if f"{name}.json" not in sections:
+        return None
+
+    columns: Dict[str, Column] = {}
+    numbers: Dict[str, Union[array, memoryview]] = {}
+    column_prefix, number_prefix = f"{name}.column.", f"{name}.number."
+    for section in sections:
+        if section.startswith(column_prefix) and section.endswith(".values"):
+            field = section[len(column_prefix):-len(".values")]
+            columns[field] = Column(decode_record(sections[section]), sections[f"{column_prefix}{field}.codes"])
+        elif section.startswith(number_prefix):
+            numbers[section[len(number_prefix):]] = sections[section]
+
+    text_index = None
+    if f"{name}.text.terms" in sections:
+        text_index = TextIndex(
+            decode_record(sections[f"{name}.text.terms"]),
+            sections[f"{name}.text.starts"],
+            sections[f"{name}.text.postings"]
+        )
+
+    geo_index = None
+    if f"{name}.geo.points" in sections:
+        geo_index = GeoIndex(
+            sections[f"{name}.geo.points"],
+            sections[f"{name}.geo.keys"],
+            sections[f"{name}.geo.starts"],
+            sections[f"{name}.geo.postings"],
+            sections[f"{name}.geo.cell"][0]
+        )
+
+    return RecordSet(sections[f"{name}.json"], sections[f"{name}.offsets"], columns, numbers, text_index, geo_index)
+
+def load_locations(sections: Mapping[str, Any]) -> Optional[DistanceMatrix]:
+    """Return the location distance matrix from the sections, or None if it is absent."""
+    if "locations.names" not in sections:
+        return None
+    return DistanceMatrix(decode_record(sections["locations.names"]), sections["locations.distances"])
+
+def _section_layout(data: Section) -> Tuple[str, int]:
+    if isinstance(data, SpooledSection):
+        data.flush()
+        return data.typecode, data.nbytes
+    if isinstance(data, array):
+        return data.typecode, len(data) * data.itemsize
+    return "B", len(data)
+
+def _section_chunks(data: Section) -> Iterator[bytes]:
+    if isinstance(data, SpooledSection):
+        yield from data.chunks()
+    elif isinstance(data, array):
+        yield data.tobytes()
+    else:
+        yield data
+
+def write_snapshot(path: str, sections: Dict[str, Section], metadata: Dict[str, Any]) -> None:
+    """
+    Atomically write a snapshot file.
+
+    Sections are raw bytes, typed arrays or spooled sections, which are
+    copied in chunks; the file is written next to `path` and renamed into
+    place, so processes holding a mapping of the previous snapshot keep
+    reading a consistent file.
+    """
+    table = {}
+    offset = 0
+    for name, data in sections.items():
+        typecode, length = _section_layout(data)
+        table[name] = [offset, length, typecode]
+        offset += length + (-length % ALIGNMENT)
+
+    header = json.dumps({"format": FORMAT_VERSION, "metadata": metadata, "sections": table}).encode("utf-8")
+    preamble = MAGIC + struct.pack("<I", len(header)) + header
+    preamble += b"\x00" * (-len(preamble) % ALIGNMENT)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".catalog-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(preamble)
+            for name, data in sections.items():
+                for chunk in _section_chunks(data):
+                    f.write(chunk)
+                f.write(b"\x00" * (-table[name][1] % ALIGNMENT))
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+class Snapshot:
+    """
+    A snapshot file mapped read-only into memory.
+
+    Sections are exposed as zero-copy memoryviews, so every process that
+    opens the same file shares its pages through the OS page cache. The
+    mapping is released when the last view of it is garbage collected.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self.stat = os.fstat(f.fileno())
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        view = memoryview(self._mmap)
+        if bytes(view[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path} is not a catalog snapshot")
+        (header_length,) = struct.unpack_from("<I", view, len(MAGIC))
+        header_start = len(MAGIC) + 4
+        header = json.loads(bytes(view[header_start:header_start + header_length]))
+        if header.get("format") != FORMAT_VERSION:
+            raise ValueError(f"{path} has unsupported snapshot format {header.get('format')}")
+
+        data_start = header_start + header_length
+        data_start += -data_start % ALIGNMENT
+
+        self.metadata: Dict[str, Any] = header["metadata"]
+        self._sections: Dict[str, memoryview] = {}
+        self._spans: Dict[str, Tuple[int, int]] = {}
+        for name, (offset, length, typecode) in header["sections"].items():
+            section = view[data_start + offset:data_start + offset + length]
+            self._sections[name] = section.cast(typecode) if typecode != "B" else section
+            self._spans[name] = (data_start + offset, length)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._sections
+
+    @property
+    def sections(self) -> Mapping[str, memoryview]:
+        return self._sections
+
+    def section(self, name: str) -> memoryview:
+        """Return a section as a memoryview (typed for array sections)."""
+        return self._sections[name]
+
+    def release(self, names: Iterable[str]) -> None:
+        """
+        Drop this process's resident pages for the given sections.
+
+        The pages are read back from the page cache (or disk) on next
+        access, so this only trades memory for a later fault.
+        """
+        spans = [self._spans[name] for name in names if name in self._spans]
+        if not spans or not hasattr(mmap, "MADV_DONTNEED"):
+            return
+        start = min(start for start, _ in spans)
+        end = max(start + length for start, length in spans)
+        start -= start % mmap.PAGESIZE
+        end = min(end + (-end % mmap.PAGESIZE), len(self._mmap))
+        if end > start:
+            self._mmap.madvise(mmap.MADV_DONTNEED, start, end - start)
+
+    def locations(self) -> Optional[DistanceMatrix]:
+        """Return the location distance matrix, or None if it is absent."""
+        return load_locations(self._sections)
+
+def open_snapshot(path: str) -> Optional[Snapshot]:
+    """Open a snapshot, returning None if it is missing or unreadable."""
+    try:
+        return Snapshot(path)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,178 @@
+
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+class Trace:
+    """The spans of one request, with start offsets relative to the request's start."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+
+    def add(self, name: str, start: float, end: float, **attrs) -> None:
+        # list.append is atomic, so spans from threadpool dependencies are safe
+        self.spans.append({
+            "name": name,
+            "start_ms": round((start - self.started) * 1000, 2),
+            "duration_ms": round((end - start) * 1000, 2),
+            **attrs,
+        })
+
+    def last_end(self, name: str) -> Optional[float]:
+        """Return the perf_counter time the last span called `name` ended."""
+        for recorded in reversed(self.spans):
+            if recorded["name"] == name:
+                return self.started + (recorded["start_ms"] + recorded["duration_ms"]) / 1000
+        return None
+
+# Context variables follow the request into awaited code and into the
+# threadpool that runs sync dependencies and endpoints
+_current: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[None]:
+    """Record the enclosed block as a span of the current request's trace, if there is one."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        trace.add(name, start, time.perf_counter(), **attrs)
+
+def _traced_endpoint(endpoint: Callable) -> Callable:
+    # functools.wraps keeps the signature FastAPI reads the parameters from
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def traced(*args, **kwargs):
+            with span("endpoint"):
+                return await endpoint(*args, **kwargs)
+    else:
+        @functools.wraps(endpoint)
+        def traced(*args, **kwargs):
+            with span("endpoint"):
+                return endpoint(*args, **kwargs)
+    return traced
+
+class TracedRoute(APIRoute):
+    """
+    An APIRoute whose requests record spans for reading and parsing the JSON
+    body, the endpoint itself and serializing its result.
+
+    The body is parsed ahead of FastAPI, which then reuses the parsed value
+    that Starlette caches on the request.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, _traced_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self) -> Callable[[Request], Any]:
+        handler = super().get_route_handler()
+
+        async def traced_handler(request: Request) -> Response:
+            trace = _current.get()
+            if trace is None:
+                return await handler(request)
+            if request.headers.get("content-type", "").startswith("application/json"):
+                with span("read_body"):
+                    body = await request.body()
+                if body:
+                    try:
+                        with span("parse_json", bytes=len(body)):
+                            await request.json()
+                    except ValueError:
+                        pass  # FastAPI parses it again and reports the error
+            response = await handler(request)
+            endpoint_end = trace.last_end("endpoint")
+            if endpoint_end is not None:
+                trace.add("serialize", endpoint_end, time.perf_counter())
+            return response
+
+        return traced_handler
+
+class SlowRequestLog:
+    """A rotating file of JSON lines, opened on the first write."""
+
+    def __init__(self, path: str, max_bytes: int, backups: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._logger: Optional[logging.Logger] = None
+        self._lock = threading.Lock()
+
+    def _open(self) -> logging.Logger:
+        with self._lock:
+            if self._logger is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                handler = RotatingFileHandler(self.path, maxBytes=self.max_bytes, backupCount=self.backups, encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                logger = logging.getLogger(f"slow_requests.{self.path}")
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                logger.addHandler(handler)
+                self._logger = logger
+        return self._logger
+
+    def write(self, record: Dict[str, Any]) -> None:
+        (self._logger or self._open()).info(json.dumps(record, default=str))
+
+class TracingMiddleware:
+    """ASGI middleware that traces each request and logs those slower than `threshold_ms`."""
+
+    def __init__(self, app, log: SlowRequestLog, threshold_ms: float):
+        self.app = app
+        self.log = log
+        self.threshold_ms = threshold_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace()
+        token = _current.set(trace)
+        status: Optional[int] = None
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            duration_ms = (time.perf_counter() - trace.started) * 1000
+            if duration_ms >= self.threshold_ms:
+                from .metrics import route_label
+                self.log.write({
+                    "time": datetime.now(timezone.utc).isoformat(),
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": route_label(scope),
+                    "status": status or 500,
+                    "duration_ms": round(duration_ms, 2),
+                    "spans": trace.spans,
+                })
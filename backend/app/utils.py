@@ -4,23 +4,41 @@ import os
 import uuid
 import re
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Iterator, Optional
 from .config import DATA_DIR
 
+def resolve_data_path(filename: str) -> Optional[str]:
+    """Return the path of a data file, checking the alternate data directory too."""
+    file_path = os.path.join(DATA_DIR, filename)
+    if os.path.exists(file_path):
+        return file_path
+    # Try alternate path
+    backup_path = os.path.join(os.path.dirname(os.path.dirname(DATA_DIR)), "data", filename)
+    if os.path.exists(backup_path):
+        return backup_path
+    return None
+
 def load_json_data(filename: str) -> Dict[str, Any]:
     """Load JSON data from a file."""
+    file_path = resolve_data_path(filename)
+    if file_path is None:
+        return {}
     try:
-        file_path = os.path.join(DATA_DIR, filename)
         with open(file_path, "r", encoding="utf-8") as f:
             return json.load(f)
     except FileNotFoundError:
-        # Try alternate path
-        backup_path = os.path.join(os.path.dirname(os.path.dirname(DATA_DIR)), "data", filename)
-        try:
-            with open(backup_path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return {}
+        return {}
+
+def stream_ndjson(items: Iterable[Any]) -> Iterator[str]:
+    """Encode each item as one line of newline-delimited JSON."""
+    for item in items:
+        yield json.dumps(item) + "\n"
+
+def stream_sse(items: Iterable[Any], event: str = "message") -> Iterator[str]:
+    """Encode each item as a Server-Sent Event, ending with a `done` event."""
+    for item in items:
+        yield f"event: {event}\ndata: {json.dumps(item)}\n\n"
+    yield "event: done\ndata: {}\n\n"
 
 def generate_uuid() -> str:
     """Generate a new UUID string."""
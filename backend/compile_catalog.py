@@ -0,0 +1,35 @@
+"""
+Compile the catalog JSON files into a binary snapshot.
+
+    python compile_catalog.py [--output PATH]
+
+The JSON files are validated first and nothing is written if any record is
+invalid. Run this at image build time and set CATALOG_SNAPSHOT_AUTOBUILD=false
+so new containers only have to memory-map the finished file.
+"""
+
+import argparse
+import sys
+
+from app.catalog import CatalogValidationError, compile_catalog
+from app.config import CATALOG_SNAPSHOT_PATH
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compile the catalog JSON files into a binary snapshot.")
+    parser.add_argument("--output", default=CATALOG_SNAPSHOT_PATH, help="snapshot path (default: %(default)s)")
+    args = parser.parse_args()
+
+    try:
+        metadata = compile_catalog(args.output)
+    except CatalogValidationError as e:
+        for error in e.errors:
+            print(error, file=sys.stderr)
+        print(f"Catalog not compiled: {str(e)}", file=sys.stderr)
+        return 1
+
+    counts = ", ".join(f"{count} {name}" for name, count in metadata["counts"].items())
+    print(f"Wrote {args.output} ({counts})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
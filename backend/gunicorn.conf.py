@@ -0,0 +1,26 @@
+
+# Gunicorn settings for running the FastAPI app with uvicorn workers:
+#   gunicorn -c gunicorn.conf.py main:application
+
+import os
+import tempfile
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Each worker counts its own requests; they add them up through files here,
+# so a scrape of /api/metrics reaches one worker but reports the server
+os.environ.setdefault(
+    "METRICS_DIR", os.path.join(tempfile.gettempdir(), f"travel-planner-metrics-{os.getenv('PORT', '8000')}")
+)
+
+def on_starting(server):
+    # Start the metrics from zero, as a restarted server should
+    from app.metrics import clear_metrics_dir
+    clear_metrics_dir(os.environ["METRICS_DIR"])
+
+    # Build the catalog snapshot once in the master; workers forked after
+    # this only memory-map the finished file and share its pages
+    from app.catalog import ensure_snapshot
+    ensure_snapshot()
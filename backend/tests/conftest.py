@@ -0,0 +1,6 @@
+
+import os
+import sys
+
+# Tests import the backend as `app`, as main.py and gunicorn do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
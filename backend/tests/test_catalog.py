@@ -0,0 +1,24 @@
+
+from app.catalog import Catalog
+from app.config import CATALOG_ENCODED_CACHE_SIZE
+
+def test_list_views_are_kept_in_lru_order():
+    catalog = Catalog(None, None, "test")
+    builds = []
+    view = lambda key: catalog.encoded(key, lambda: builds.append(key) or [])
+    view("all")
+    for i in range(CATALOG_ENCODED_CACHE_SIZE - 1):
+        view(("places", f"region-{i}"))
+        view("all")
+    view(("places", "one-more"))
+    view("all")
+    assert builds.count("all") == 1
+
+def test_queries_cannot_evict_list_views():
+    catalog = Catalog(None, None, "test")
+    builds = []
+    catalog.encoded("all", lambda: builds.append("all") or [])
+    for i in range(CATALOG_ENCODED_CACHE_SIZE + 1):
+        catalog.encoded(("search", str(i)), lambda: [], query=True)
+    catalog.encoded("all", lambda: builds.append("all") or [])
+    assert builds == ["all"]
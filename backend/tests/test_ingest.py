@@ -0,0 +1,47 @@
+
+import json
+
+import pytest
+
+from app.ingest import IngestRejectedError, ingest_places
+
+def place(number: int) -> dict:
+    return {
+        "id": f"v{number}",
+        "name": f"Vendor Place {number}",
+        "category": "Beaches",
+        "description": "A quiet beach.",
+        "image": "https://example.com/beach.jpg",
+        "rating": 4.2,
+        "location": "Alibaug",
+        "region": "Raigad",
+    }
+
+def write_rows(path, rows) -> str:
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows))
+    return str(path)
+
+def test_valid_rows_are_written(tmp_path):
+    source = write_rows(tmp_path / "places.ndjson", [place(i) for i in range(20)] + [{"name": ""}])
+    output = tmp_path / "catalog.snapshot"
+    report = ingest_places([source], str(output), workers=1)
+    assert (report.imported, report.invalid) == (20, 1)
+    assert output.exists()
+
+def test_nothing_valid_leaves_the_snapshot_alone(tmp_path):
+    source = write_rows(tmp_path / "places.ndjson", [{"name": ""}, {"x": 1}])
+    output = tmp_path / "catalog.snapshot"
+    output.write_bytes(b"current")
+    with pytest.raises(IngestRejectedError) as raised:
+        ingest_places([source], str(output), workers=1)
+    assert raised.value.report.invalid == 2
+    assert output.read_bytes() == b"current"
+
+def test_too_many_invalid_rows_are_rejected(tmp_path):
+    rows = [place(i) for i in range(6)] + [{"name": ""}] * 4
+    source = write_rows(tmp_path / "places.ndjson", rows)
+    output = tmp_path / "catalog.snapshot"
+    with pytest.raises(IngestRejectedError):
+        ingest_places([source], str(output), workers=1, max_invalid=0.25)
+    assert not output.exists()
+    assert ingest_places([source], str(output), workers=1, max_invalid=0.5).imported == 6
@@ -0,0 +1,39 @@
+
+import threading
+
+from app.memory import estimate_size
+
+class Flaky(dict):
+    """A dict whose first copy fails as if another thread resized it."""
+
+    failures = 1
+
+    def items(self):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("dictionary changed size during iteration")
+        return super().items()
+
+def test_copy_that_races_with_a_change_is_retried():
+    store = Flaky({str(n): "x" * 100 for n in range(10)})
+    assert estimate_size(store) > estimate_size(Flaky())
+
+def test_store_can_change_while_it_is_measured():
+    store = {n: [n] for n in range(5000)}
+    done = threading.Event()
+
+    def churn():
+        n = 5000
+        while not done.is_set():
+            store[n] = [n]
+            store.pop(n - 5000, None)
+            n += 1
+
+    thread = threading.Thread(target=churn)
+    thread.start()
+    try:
+        for _ in range(20):
+            assert estimate_size(store, sample=5000) > 0
+    finally:
+        done.set()
+        thread.join()
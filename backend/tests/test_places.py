@@ -0,0 +1,22 @@
+
+import asyncio
+import json
+
+from app.routers.places import get_nearby_places
+
+# Vashi in data/locations.json
+VASHI = (19.0754, 73.0071)
+
+def nearby(radius: int) -> list:
+    response = asyncio.run(get_nearby_places(*VASHI, radius=radius))
+    return json.loads(response.body)
+
+def test_only_located_places_are_returned_nearest_first():
+    places = nearby(50000)
+    assert places
+    assert all(place["location"] in ("Belapur", "Kharghar", "Kopar Khairane", "Nerul", "Seawoods", "Vashi") for place in places)
+    distances = [place["distance"] for place in places]
+    assert distances == sorted(distances) and distances[-1] <= 50000
+
+def test_small_radius_leaves_out_places_without_coordinates():
+    assert all(place["location"] == "Vashi" for place in nearby(500))
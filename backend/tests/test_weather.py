@@ -0,0 +1,8 @@
+
+from app.catalog import get_catalog, top_regions
+from app.routers.weather import warm_cities
+
+def test_warm_up_uses_place_locations_not_regions():
+    # Regions such as "Western Ghats" are not places OpenWeatherMap can look up
+    assert "Western Ghats" in top_regions(get_catalog(), 3)
+    assert warm_cities() == ["Aurangabad", "Pune", "Lonavala"]
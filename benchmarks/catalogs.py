@@ -0,0 +1,155 @@
+"""
+Generate synthetic catalogs for the benchmarks.
+
+    python -m benchmarks.catalogs [--sizes 1000 10000 100000] [--output DIR]
+
+Each catalog of N places (plus N/5 restaurants) is written twice under
+DIR/<N>/: fastapi/ holds the {"places": [...]} files read by backend/app
+and flask/ the plain lists read by app.py. Generation is seeded, so the same
+size always produces the same records.
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+from typing import Any, Dict, List, Tuple
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(__file__), "catalogs")
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "backend", "data", "itinerary_template.json")
+
+REGIONS = (
+    "Navi Mumbai", "Thane", "Mumbai Suburban", "Mumbai City", "Pune", "Raigad",
+    "Nashik", "Palghar", "Lonavala", "Alibaug", "Kalyan", "Panvel",
+)
+CATEGORIES = (
+    "Parks & Gardens", "Shopping", "Religious", "Sports", "Museums", "Beaches",
+    "Lakes", "Historical", "Entertainment", "Nature", "Markets", "Viewpoints",
+)
+CUISINES = ("Seafood", "Maharashtrian", "North Indian", "South Indian", "Chinese", "Cafe", "Street Food", "Continental")
+PRICES = ("$", "$$", "$$$")
+ADJECTIVES = (
+    "Royal", "Green", "Old", "Grand", "Hidden", "Central", "Silver", "Sunset",
+    "Lotus", "Golden", "Riverside", "Heritage", "Coastal", "Misty", "Bright",
+)
+NOUNS = (
+    "Garden", "Market", "Temple", "Lake", "Fort", "Promenade", "Gallery", "Plaza",
+    "Point", "Bazaar", "Beach", "Hill", "Stadium", "Museum", "Creek",
+)
+PHRASES = (
+    "popular with families on weekends", "known for its evening views",
+    "a favourite spot for morning walks", "busy during the festival season",
+    "with plenty of street food nearby", "quiet on weekday afternoons",
+    "best visited after the monsoon", "close to the railway station",
+    "with guided tours every hour", "home to a small open-air cafe",
+)
+LOCATIONS_PER_REGION = 8
+# Every third record carries its own coordinates; the rest use their location's
+OWN_COORDINATES_EVERY = 3
+
+Location = Tuple[str, str, Dict[str, float]]  # name, region, {"lat", "lng"}
+
+def generate_locations(rng: random.Random) -> List[Location]:
+    """Return named locations spread around each region's centre."""
+    locations = []
+    for position, region in enumerate(REGIONS):
+        centre = (18.5 + (position % 4) * 0.3, 72.8 + (position // 4) * 0.35)
+        for n in range(LOCATIONS_PER_REGION):
+            point = {
+                "lat": round(centre[0] + rng.uniform(-0.08, 0.08), 5),
+                "lng": round(centre[1] + rng.uniform(-0.08, 0.08), 5),
+            }
+            locations.append((f"{region} {NOUNS[n % len(NOUNS)]} Ward {n + 1}", region, point))
+    return locations
+
+def _record(rng: random.Random, number: int, prefix: str, locations: List[Location]) -> Dict[str, Any]:
+    location, region, point = rng.choice(locations)
+    record_id = f"{prefix}{number}"
+    name = f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {record_id}"
+    record = {
+        "id": record_id,
+        "name": name,
+        "description": f"{name} in {location}, {rng.choice(PHRASES)} and {rng.choice(PHRASES)}.",
+        "image": f"https://images.example.com/{record_id}.jpg",
+        "rating": round(rng.uniform(3.0, 5.0), 1),
+        "location": location,
+        "region": region,
+    }
+    if number % OWN_COORDINATES_EVERY == 0:
+        record["coordinates"] = {
+            "lat": round(point["lat"] + rng.uniform(-0.01, 0.01), 5),
+            "lng": round(point["lng"] + rng.uniform(-0.01, 0.01), 5),
+        }
+    return record
+
+def generate_catalog(size: int, seed: int = 0) -> Dict[str, Any]:
+    """Return places, restaurants and locations for a catalog of `size` places."""
+    rng = random.Random(seed * 1_000_003 + size)
+    locations = generate_locations(rng)
+
+    places = []
+    for n in range(1, size + 1):
+        place = _record(rng, n, "p", locations)
+        place["category"] = rng.choice(CATEGORIES)
+        place["duration"] = rng.choice(("1-2 hours", "2-3 hours", "Half day"))
+        place["featured"] = n % 50 == 0
+        places.append(place)
+
+    restaurants = []
+    for n in range(1, max(1, size // 5) + 1):
+        restaurant = _record(rng, n, "r", locations)
+        restaurant["cuisine"] = rng.choice(CUISINES)
+        restaurant["price"] = rng.choice(PRICES)
+        restaurants.append(restaurant)
+
+    return {
+        "places": places,
+        "restaurants": restaurants,
+        "locations": {name: point for name, _, point in locations},
+    }
+
+def _write_json(path: str, data: Any) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+
+def write_catalog(directory: str, size: int, seed: int = 0) -> Dict[str, str]:
+    """Write a synthetic catalog for both backends and return their data directories."""
+    catalog = generate_catalog(size, seed)
+    paths = {"fastapi": os.path.join(directory, "fastapi"), "flask": os.path.join(directory, "flask")}
+    for path in paths.values():
+        os.makedirs(path, exist_ok=True)
+        shutil.copyfile(TEMPLATE_PATH, os.path.join(path, "itinerary_template.json"))
+
+    _write_json(os.path.join(paths["fastapi"], "places.json"), {"places": catalog["places"]})
+    _write_json(os.path.join(paths["fastapi"], "restaurants.json"), {"restaurants": catalog["restaurants"]})
+    _write_json(os.path.join(paths["fastapi"], "locations.json"), {"locations": catalog["locations"]})
+    _write_json(os.path.join(paths["flask"], "places.json"), catalog["places"])
+    _write_json(os.path.join(paths["flask"], "restaurants.json"), catalog["restaurants"])
+    return paths
+
+def ensure_catalog(output: str, size: int, seed: int = 0) -> Dict[str, str]:
+    """Return the data directories of a catalog, generating it if it is missing."""
+    directory = os.path.join(output, str(size))
+    paths = {"fastapi": os.path.join(directory, "fastapi"), "flask": os.path.join(directory, "flask")}
+    if all(os.path.exists(os.path.join(path, "places.json")) for path in paths.values()):
+        return paths
+    return write_catalog(directory, size, seed)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Generate synthetic catalogs for the benchmarks.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="places per catalog")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="output directory (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        directory = os.path.join(args.output, str(size))
+        write_catalog(directory, size, args.seed)
+        print(f"Wrote {directory} ({size} places, {max(1, size // 5)} restaurants)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
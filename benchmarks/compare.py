@@ -0,0 +1,73 @@
+"""
+Compare two benchmark result files.
+
+    python -m benchmarks.compare BASELINE CURRENT [--tolerance 0.10]
+
+Runs are matched by backend, catalog size, scenario and concurrency. A run
+regresses when its throughput drops, or its p95 latency grows, by more than
+the tolerance; the exit status is 1 if any run regressed.
+"""
+
+import argparse
+import json
+import sys
+from typing import Any, Dict, List, Tuple
+
+RunKey = Tuple[str, int, str, int]
+
+def _key(result: Dict[str, Any]) -> RunKey:
+    return (result["backend"], result["catalog_size"], result["scenario"], result["concurrency"])
+
+def _change(before: float, after: float) -> float:
+    return (after - before) / before if before else 0.0
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    """Return one row per run present in both files, flagging regressions."""
+    previous = {_key(result): result for result in baseline.get("results", [])}
+    rows = []
+    for result in current.get("results", []):
+        before = previous.get(_key(result))
+        if before is None:
+            continue
+        throughput = _change(before["throughput"], result["throughput"])
+        p95 = _change(before["p95_ms"], result["p95_ms"])
+        rows.append({
+            "key": _key(result),
+            "throughput": (before["throughput"], result["throughput"], throughput),
+            "p95_ms": (before["p95_ms"], result["p95_ms"], p95),
+            "regressed": throughput < -tolerance or p95 > tolerance,
+        })
+    return rows
+
+def print_comparison(rows: List[Dict[str, Any]]) -> None:
+    if not rows:
+        print("No runs in common with the baseline")
+        return
+    for row in rows:
+        backend, size, scenario, concurrency = row["key"]
+        throughput_before, throughput_after, throughput = row["throughput"]
+        p95_before, p95_after, p95 = row["p95_ms"]
+        flag = "REGRESSED" if row["regressed"] else "ok"
+        print(
+            f"{backend:<8} {size:>7} {scenario:<15} c={concurrency:<4}"
+            f" {throughput_before:>9.1f} -> {throughput_after:>9.1f} req/s ({throughput:+.1%})"
+            f"  p95 {p95_before:>8.2f} -> {p95_after:>8.2f} ms ({p95:+.1%})  {flag}"
+        )
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed slowdown (default: %(default)s)")
+    args = parser.parse_args()
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, "r", encoding="utf-8") as f:
+        current = json.load(f)
+    rows = compare_results(baseline, current, args.tolerance)
+    print_comparison(rows)
+    return 1 if any(row["regressed"] for row in rows) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+Check that both backends import quickly and without side effects.
+
+    python -m benchmarks.import_time [--budget-ms 1000] [--repeat 5]
+
+Each app is imported in a fresh interpreter under `python -X importtime`,
+--repeat times, and the fastest cumulative import time of its top-level
+module is compared with the budget. Importing must also not do any work
+that belongs to startup: the FastAPI app must not import (or connect to)
+Supabase, and the Flask app must not write its data files. The exit status
+is 1 if either app is over budget or has a side effect.
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+from .run import ROOT
+
+DEFAULT_BUDGET_MS = 1000.0
+
+# Modules that must only be imported once the app is running
+DEFERRED_MODULES = {"fastapi": ("supabase",), "flask": ()}
+
+IMPORT_LINE = re.compile(r"^import time:\s+\d+\s+\|\s+(\d+)\s+\|\s*(\S+)\s*$")
+
+def _import_app(backend: str, data_dir: str) -> Tuple[Optional[float], List[str], str]:
+    """Import one app in a fresh interpreter; return its import time in ms, the deferred modules loaded and stderr."""
+    module = "app.main" if backend == "fastapi" else "app"
+    deferred = DEFERRED_MODULES[backend]
+    code = f"import sys, {module}; print(','.join(m for m in {deferred!r} if m in sys.modules))"
+    env = {
+        **os.environ,
+        "DATA_DIR": data_dir,
+        "CATALOG_SNAPSHOT_PATH": os.path.join(data_dir, "catalog.snapshot"),
+        "SUPABASE_URL": "http://127.0.0.1:9",
+    }
+    cwd = os.path.join(ROOT, "backend") if backend == "fastapi" else ROOT
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], cwd=cwd, env=env, capture_output=True, text=True
+    )
+    cumulative = None
+    for line in completed.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match and match.group(2) == module:
+            cumulative = int(match.group(1)) / 1000
+    # The apps may print while importing, so the modules are on the last line
+    lines = completed.stdout.splitlines() if completed.returncode == 0 else []
+    loaded = [name for name in lines[-1].split(",") if name] if lines else []
+    return cumulative, loaded, completed.stderr
+
+def check_backend(backend: str, budget_ms: float, repeat: int) -> Dict[str, object]:
+    """Import a backend `repeat` times and report its best time and any side effects."""
+    problems = []
+    times = []
+    with tempfile.TemporaryDirectory() as workdir:
+        data_dir = os.path.join(workdir, "data")
+        for _ in range(repeat):
+            elapsed, loaded, stderr = _import_app(backend, data_dir)
+            if elapsed is None:
+                problems.append(f"import failed:\n{stderr}")
+                break
+            times.append(elapsed)
+            for name in loaded:
+                problems.append(f"imported {name} at import time")
+        if os.path.exists(data_dir):
+            problems.append(f"wrote {', '.join(sorted(os.listdir(data_dir))) or 'the data directory'} at import time")
+
+    best = min(times) if times else None
+    if best is not None and best > budget_ms:
+        problems.append(f"import took {best:.0f} ms, over the {budget_ms:.0f} ms budget")
+    return {"backend": backend, "import_ms": best, "problems": sorted(set(problems))}
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check both backends' import time and import-time side effects.")
+    parser.add_argument("--backends", nargs="+", choices=sorted(DEFERRED_MODULES), default=["flask", "fastapi"])
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="import time budget (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=5, help="imports per backend; the fastest counts")
+    args = parser.parse_args()
+
+    failed = False
+    for backend in args.backends:
+        result = check_backend(backend, args.budget_ms, args.repeat)
+        import_ms = f"{result['import_ms']:.0f} ms" if result["import_ms"] is not None else "failed"
+        print(f"{backend:<8} {import_ms:>8}  {'FAILED' if result['problems'] else 'ok'}")
+        for problem in result["problems"]:
+            print(f"  - {problem}")
+        failed = failed or bool(result["problems"])
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,316 @@
+"""
+Micro-benchmarks for the FastAPI backend's hot kernels.
+
+    python -m benchmarks.kernels [--sizes 1000 10000 100000] [--kernels search nearby ...]
+                                 [--output kernels.json] [--compare BASELINE] [--threshold 0.20]
+
+Each kernel is timed the way pytest-benchmark times a function: the number
+of calls per round is calibrated until a round takes at least --min-time,
+then rounds are repeated (at least --min-rounds, or for --max-time seconds)
+with the garbage collector off, and min/median/mean/stddev/IQR per call
+are reported. The catalog kernels run once per catalog size, each size in a
+fresh subprocess because backend/app reads DATA_DIR when it is imported;
+the forecast, day grouping and generation kernels run at their own scales.
+
+Comparisons use the fastest round, which noise from other processes can
+only slow down. A kernel regresses when its fastest round grows by more
+than the threshold and by more than the spread (IQR) of the rounds in
+either run, and the exit status is then 1.
+
+tests/test_kernels.py runs every kernel once under pytest.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Tuple
+
+from .catalogs import DEFAULT_OUTPUT as CATALOG_DIR, DEFAULT_SIZES, REGIONS, ensure_catalog
+from .run import RESULTS_DIR, ROOT, git_commit
+
+BACKEND_DIR = os.path.join(ROOT, "backend")
+TEMPLATE_PATH = os.path.join(BACKEND_DIR, "data", "itinerary_template.json")
+
+# Kernels run against each synthetic catalog
+CATALOG_KERNELS = ("catalog_compile", "catalog_load", "filter", "search", "nearby", "distance", "distance_matrix")
+# Kernels with their own scales: forecast entries, activity rows and itinerary days
+SCALED_KERNELS = {
+    "forecast": (40, 400, 4000),
+    "group_days": (12, 120, 1200),
+    "generate": (3, 30, 300),
+}
+KERNELS = CATALOG_KERNELS + tuple(SCALED_KERNELS)
+
+Kernel = Callable[[], Any]
+
+def _import_backend() -> None:
+    """Make backend/app importable without reaching a real Supabase project."""
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    # The client is created (and probed) on import; point it at a closed port
+    os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+    os.environ.setdefault("SUPABASE_KEY", "benchmark-key")
+
+def measure(kernel: Kernel, min_time: float, max_time: float, min_rounds: int) -> Dict[str, Any]:
+    """Time `kernel` in calibrated rounds and return per-call statistics in microseconds."""
+    kernel()  # warm caches and lazily loaded shards
+    iterations = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            kernel()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+        iterations *= 10 if elapsed < min_time / 10 else 2
+
+    rounds = max(min_rounds, int(max_time / elapsed))
+    timings = []
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(rounds):
+            started = time.perf_counter()
+            for _ in range(iterations):
+                kernel()
+            timings.append((time.perf_counter() - started) / iterations * 1e6)
+    finally:
+        if enabled:
+            gc.enable()
+
+    median = statistics.median(timings)
+    quartiles = statistics.quantiles(timings, n=4) if rounds > 1 else (median, median, median)
+    return {
+        "iterations": iterations,
+        "rounds": rounds,
+        "min_us": min(timings),
+        "median_us": median,
+        "mean_us": statistics.fmean(timings),
+        "stddev_us": statistics.stdev(timings) if rounds > 1 else 0.0,
+        "iqr_us": quartiles[2] - quartiles[0],
+        "ops": 1e6 / median if median else 0.0,
+    }
+
+def catalog_kernels(selected: List[str], workdir: str) -> Dict[str, Kernel]:
+    """Return the catalog kernels, bound to the catalog in DATA_DIR."""
+    _import_backend()
+    from app.catalog import build_snapshot, load_catalog, load_location_coordinates
+    from app.indexes import encode_distance_matrix
+    from app.routers.places import search_indices
+
+    catalog = load_catalog()
+    places, locations = catalog.places, catalog.locations
+    region = REGIONS[0]
+    centre = next(places.point(i) for i in places.indices() if places.point(i) is not None)
+    coordinates = load_location_coordinates()
+    names = sorted(coordinates)
+    pairs = [(names[i % len(names)], names[(i * 7 + 3) % len(names)]) for i in range(100)]
+
+    def filter_kernel():
+        indices = places.where("region", region, indices=places.indices())
+        indices = places.where("category", "museums", ignore_case=True, indices=indices)
+        return places.order_by("rating", indices, descending=True)
+
+    def distance_kernel():
+        return [locations.distance(origin, destination) for origin, destination in pairs]
+
+    kernels = {
+        "catalog_compile": lambda: build_snapshot(os.path.join(workdir, "compile.snapshot")),
+        "catalog_load": load_catalog,
+        "filter": filter_kernel,
+        "search": lambda: search_indices(places, "garden", region=region.lower()),
+        "nearby": lambda: places.within(centre[0], centre[1], 5000, places.indices()),
+        "distance": distance_kernel,
+        "distance_matrix": lambda: encode_distance_matrix(coordinates),
+    }
+    return {name: kernels[name] for name in selected}
+
+def forecast_entries(count: int, start: datetime) -> List[Dict[str, Any]]:
+    """Return `count` three-hourly OpenWeatherMap forecast entries from `start`."""
+    entries = []
+    for step in range(count):
+        temp = 24 + step % 9
+        entries.append({
+            "dt": int((start + timedelta(hours=3 * step)).timestamp()),
+            "main": {"temp_min": temp - 2, "temp_max": temp + 2, "humidity": 50 + step % 40},
+            "weather": [{"description": ("clear sky", "light rain", "scattered clouds")[step % 3], "icon": "01d"}],
+        })
+    return entries
+
+def activity_rows(count: int) -> List[Dict[str, Any]]:
+    """Return `count` itinerary_activities rows, four per day, as Supabase orders them."""
+    rows = []
+    for n in range(count):
+        rows.append({
+            "id": f"a{n}", "itinerary_id": "bench", "day": n // 4 + 1, "time": f"{8 + n % 4 * 3}:00",
+            "title": f"Activity {n}", "location": "Vashi", "description": None if n % 5 == 0 else "A stop",
+            "image": f"https://images.example.com/a{n}.jpg", "category": "Sports",
+        })
+    return rows
+
+def scaled_kernel(name: str, scale: int) -> Kernel:
+    """Return a kernel that does not depend on the catalog, at the given scale."""
+    _import_backend()
+    if name == "forecast":
+        from app.routers.weather import aggregate_forecast
+        start = datetime.combine(date(2024, 1, 1), datetime.min.time())
+        entries = forecast_entries(scale, start)
+        days = scale * 3 // 24 + 1
+        return lambda: aggregate_forecast(entries, days, start.date())
+    if name == "group_days":
+        from app.routers.itineraries import group_activities_by_day
+        rows = activity_rows(scale)
+        return lambda: group_activities_by_day(rows)
+    from app.routers.places import iter_itinerary_days
+    with open(TEMPLATE_PATH, "r", encoding="utf-8") as f:
+        template = json.load(f)
+    options = {"days": scale, "pace": "intensive"}
+    return lambda: list(iter_itinerary_days(template, options))
+
+def run_worker(size: int, names: List[str], timing: Tuple[float, float, int]) -> List[Dict[str, Any]]:
+    """Benchmark the catalog kernels in this process (started by run_catalog_kernels)."""
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, kernel in catalog_kernels(names, workdir).items():
+            results.append({"kernel": name, "size": size, **measure(kernel, *timing)})
+    return results
+
+def run_catalog_kernels(data_dir: str, size: int, names: List[str], timing: Tuple[float, float, int]) -> List[Dict[str, Any]]:
+    """Benchmark the catalog kernels on one catalog in a fresh subprocess."""
+    env = {
+        **os.environ,
+        "DATA_DIR": data_dir,
+        "CATALOG_SNAPSHOT_PATH": os.path.join(data_dir, "catalog.snapshot"),
+        "SUPABASE_URL": "http://127.0.0.1:9",
+    }
+    min_time, max_time, min_rounds = timing
+    command = [
+        sys.executable, "-m", "benchmarks.kernels", "--worker", str(size), "--kernels", *names,
+        "--min-time", str(min_time), "--max-time", str(max_time), "--min-rounds", str(min_rounds),
+    ]
+    completed = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Kernel worker for {size} places failed:\n{completed.stderr}")
+    # The backend prints while importing, so the results are the last line
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def spread(result: Dict[str, Any]) -> float:
+    """Return the spread of a result's rounds; reports saved before IQR was recorded fall back to stddev."""
+    return result.get("iqr_us", result.get("stddev_us", 0.0))
+
+def compare_kernels(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """
+    Return one row per kernel and size present in both reports, flagging
+    regressions: the fastest round slowed down by more than `threshold`
+    and by more than the spread measured in either run.
+    """
+    previous = {(result["kernel"], result["size"]): result for result in baseline.get("results", [])}
+    rows = []
+    for result in current.get("results", []):
+        before = previous.get((result["kernel"], result["size"]))
+        if before is None:
+            continue
+        slower = result["min_us"] - before["min_us"]
+        change = slower / before["min_us"] if before["min_us"] else 0.0
+        noise = max(spread(before), spread(result))
+        rows.append({
+            "key": (result["kernel"], result["size"]),
+            "min_us": (before["min_us"], result["min_us"], change),
+            "spread_us": noise,
+            "regressed": change > threshold and slower > noise,
+        })
+    return rows
+
+def print_result(result: Dict[str, Any]) -> None:
+    print(
+        f"{result['kernel']:<16} {result['size']:>7}  median {result['median_us']:>12.2f} us"
+        f"  min {result['min_us']:>12.2f} us  stddev {result['stddev_us']:>10.2f} us  IQR {result['iqr_us']:>10.2f} us"
+        f"  ({result['rounds']} x {result['iterations']})"
+    )
+
+def print_kernel_comparison(rows: List[Dict[str, Any]]) -> None:
+    if not rows:
+        print("No kernels in common with the baseline")
+        return
+    for row in rows:
+        kernel, size = row["key"]
+        before, after, change = row["min_us"]
+        flag = "REGRESSED" if row["regressed"] else "ok"
+        print(
+            f"{kernel:<16} {size:>7}  min {before:>12.2f} -> {after:>12.2f} us ({change:+.1%},"
+            f" spread {row['spread_us']:.2f} us)  {flag}"
+        )
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmark the FastAPI backend's hot kernels.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="catalog sizes (places)")
+    parser.add_argument("--kernels", nargs="+", choices=KERNELS, default=list(KERNELS))
+    parser.add_argument("--min-time", type=float, default=0.01, help="minimum seconds per round")
+    parser.add_argument("--max-time", type=float, default=1.0, help="seconds of rounds per kernel, past --min-rounds")
+    parser.add_argument("--min-rounds", type=int, default=5)
+    parser.add_argument("--catalogs", default=CATALOG_DIR, help="synthetic catalog directory (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="results file (default: benchmarks/results/kernels-<commit>.json)")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare with a saved kernels results file")
+    parser.add_argument("--threshold", type=float, default=0.20, help="allowed slowdown of the fastest round when comparing")
+    parser.add_argument("--worker", type=int, metavar="SIZE", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    timing = (args.min_time, args.max_time, args.min_rounds)
+
+    if args.worker is not None:
+        names = [name for name in args.kernels if name in CATALOG_KERNELS]
+        print(json.dumps(run_worker(args.worker, names, timing)))
+        return 0
+
+    results = []
+    catalog_names = [name for name in args.kernels if name in CATALOG_KERNELS]
+    if catalog_names:
+        for size in args.sizes:
+            data_dir = ensure_catalog(args.catalogs, size, args.seed)["fastapi"]
+            for result in run_catalog_kernels(data_dir, size, catalog_names, timing):
+                print_result(result)
+                results.append(result)
+    for name in args.kernels:
+        for scale in SCALED_KERNELS.get(name, ()):
+            result = {"kernel": name, "size": scale, **measure(scaled_kernel(name, scale), *timing)}
+            print_result(result)
+            results.append(result)
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "created": datetime.now().astimezone().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "min_time": args.min_time,
+            "max_time": args.max_time,
+            "min_rounds": args.min_rounds,
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"kernels-{(commit or 'run')[:12]}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare_kernels(baseline, report, args.threshold)
+        print_kernel_comparison(rows)
+        return 1 if any(row["regressed"] for row in rows) else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
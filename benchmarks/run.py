@@ -0,0 +1,402 @@
+"""
+Load-test the Flask app and the FastAPI backend against local stubs.
+
+    python -m benchmarks.run [--backends flask fastapi] [--sizes 1000 10000 100000]
+                             [--scenarios catalog search ...] [--concurrency 1 8 32]
+                             [--duration 10] [--output results.json] [--compare baseline.json]
+
+For every catalog size, each backend is started as a subprocess with a
+synthetic catalog (see benchmarks.catalogs), the Supabase stub and the
+OpenWeatherMap stub (see benchmarks.stubs). Every scenario is then driven by
+closed-loop clients at each concurrency level: after a warm-up, each client
+repeats the scenario's requests until the duration is up. Throughput and
+p50/p95/p99 latency are reported per scenario and per endpoint and saved as
+JSON; pass --compare to check the run against an earlier baseline.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+from .catalogs import DEFAULT_OUTPUT as CATALOG_DIR, DEFAULT_SIZES, REGIONS, NOUNS, ensure_catalog
+from .compare import compare_results, print_comparison
+from .stubs import SupabaseStub, TOKEN_PREFIX, WeatherStub
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+BACKENDS = ("flask", "fastapi")
+READY_PATH = "/api/metrics"
+CITIES = ("Vashi", "Nerul", "Belapur", "Kharghar", "Thane", "Pune")
+BENCH_EMAIL = "bench@bench.local"
+BENCH_PASSWORD = "bench-password"
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+class Server:
+    """A backend running as a subprocess, with its output kept for inspection."""
+
+    def __init__(
+        self, backend: str, data_dir: str, supabase_url: str, weather_url: str, server: str, workers: int, threads: int,
+        admission: bool = False
+    ):
+        self.backend = backend
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.output: List[str] = []
+        self._lock = threading.Lock()
+
+        env = {
+            **os.environ,
+            "PYTHONUNBUFFERED": "1",
+            "DATA_DIR": data_dir,
+            "CATALOG_SNAPSHOT_PATH": os.path.join(data_dir, "catalog.snapshot"),
+            "SUPABASE_URL": supabase_url,
+            "WEATHER_API_URL": f"{weather_url}/data/2.5",
+            "RATE_LIMIT_ENABLED": "false",
+            "ADMISSION_ENABLED": "true" if admission else "false",
+            "JWT_SECRET_KEY": "benchmark-secret",
+            "PORT": str(self.port),
+        }
+        if backend == "flask":
+            # One process: the Flask app keeps its users in memory
+            cwd = ROOT
+            if server == "gunicorn":
+                command = [
+                    sys.executable, "-m", "gunicorn", "--bind", f"127.0.0.1:{self.port}",
+                    "--workers", "1", "--threads", str(threads), "--log-level", "warning", "wsgi:app",
+                ]
+            else:
+                command = [
+                    sys.executable, "-c",
+                    f"from app import app; app.run(host='127.0.0.1', port={self.port}, threaded=True)",
+                ]
+        else:
+            cwd = os.path.join(ROOT, "backend")
+            if server == "gunicorn":
+                env["WEB_CONCURRENCY"] = str(workers)
+                command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--log-level", "warning", "main:application"]
+            else:
+                command = [
+                    sys.executable, "-m", "uvicorn", "app.main:app",
+                    "--host", "127.0.0.1", "--port", str(self.port), "--log-level", "warning",
+                ]
+
+        self.process = subprocess.Popen(
+            command, cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+        )
+        threading.Thread(target=self._read_output, daemon=True).start()
+
+    def _read_output(self) -> None:
+        for line in self.process.stdout:
+            with self._lock:
+                self.output.append(line.rstrip("\n"))
+
+    def find_output(self, pattern: str, timeout: float = 10.0) -> Optional[re.Match]:
+        """Wait for a line of server output matching `pattern`."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                for line in reversed(self.output):
+                    match = re.search(pattern, line)
+                    if match:
+                        return match
+            time.sleep(0.05)
+        return None
+
+    def wait_ready(self, timeout: float) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                break
+            try:
+                if requests.get(self.url + READY_PATH, timeout=1).status_code < 500:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.2)
+        self.stop()
+        tail = "\n".join(self.output[-20:])
+        raise RuntimeError(f"{self.backend} did not start on {self.url}:\n{tail}")
+
+    def stop(self) -> None:
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+
+def authenticate(server: Server) -> Dict[str, str]:
+    """Return the headers of a signed-in benchmark user."""
+    if server.backend == "fastapi":
+        # The Supabase stub accepts any bench-<name> token
+        return {"Authorization": f"Bearer {TOKEN_PREFIX}user"}
+
+    # The Flask app signs users up with an emailed code, which it prints
+    response = requests.post(server.url + "/api/auth/register", json={
+        "email": BENCH_EMAIL, "password": BENCH_PASSWORD, "name": "Benchmark"
+    })
+    response.raise_for_status()
+    match = server.find_output(rf"Verification code for {re.escape(BENCH_EMAIL)}: (\d+)")
+    if match is None:
+        raise RuntimeError("flask did not print a verification code")
+    requests.post(server.url + "/api/auth/verify", json={"email": BENCH_EMAIL, "code": match.group(1)}).raise_for_status()
+    response = requests.post(server.url + "/api/token", data={"username": BENCH_EMAIL, "password": BENCH_PASSWORD})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+class Client:
+    """One benchmark client: a keep-alive session that times every request by endpoint label."""
+
+    def __init__(self, server: Server, headers: Dict[str, str], rng: random.Random):
+        self.backend = server.backend
+        self.url = server.url
+        self.rng = rng
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        self.recording = False
+        # label -> latencies in seconds, and label -> failed request count
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def request(self, label: str, method: str, path: str, **kwargs) -> Optional[requests.Response]:
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, self.url + path, timeout=30, **kwargs)
+            response.content  # read the whole body, streamed or not
+            failed = response.status_code >= 400
+        except requests.RequestException:
+            response, failed = None, True
+        if self.recording:
+            self.latencies.setdefault(label, []).append(time.perf_counter() - start)
+            if failed:
+                self.errors[label] = self.errors.get(label, 0) + 1
+        return None if failed else response
+
+def _itinerary_body(client: Client, title: str) -> Dict[str, Any]:
+    details = {"title": title, "days": 2, "pace": "moderate", "interests": ["Nature", "Food"], "include_food": True}
+    days = [
+        {"day": day, "activities": [
+            {"time": f"{9 + slot * 3:02d}:00", "title": f"Stop {day}.{slot}", "location": client.rng.choice(CITIES),
+             "description": "Benchmark activity", "category": client.rng.choice(("Nature", "Food", "Shopping"))}
+            for slot in range(3)
+        ]}
+        for day in (1, 2)
+    ]
+    if client.backend == "fastapi":
+        return {"itinerary_data": details, "days": days}
+    return {**details, "days": days}
+
+def scenario_catalog(client: Client) -> None:
+    client.request("places", "GET", "/api/places")
+    client.request("restaurants", "GET", "/api/restaurants")
+    client.request("places_filtered", "GET", "/api/places", params={
+        "region": client.rng.choice(REGIONS), "sort": "rating", "limit": 20
+    })
+
+def scenario_search(client: Client) -> None:
+    client.request("search", "GET", "/api/places/search", params={"query": client.rng.choice(NOUNS).lower()})
+
+def scenario_nearby(client: Client) -> None:
+    position = client.rng.randrange(len(REGIONS))
+    lat = 18.5 + (position % 4) * 0.3 + client.rng.uniform(-0.05, 0.05)
+    lng = 72.8 + (position // 4) * 0.35 + client.rng.uniform(-0.05, 0.05)
+    client.request("nearby", "GET", "/api/places/nearby", params={"lat": lat, "lng": lng, "radius": 5000})
+
+def scenario_generate(client: Client) -> None:
+    client.request("generate", "POST", "/api/generate-itinerary", json={
+        "days": client.rng.randint(1, 7),
+        "pace": client.rng.choice(("relaxed", "moderate", "intensive")),
+        "interests": ["Nature", "Food"],
+    })
+
+def scenario_itinerary_crud(client: Client) -> None:
+    response = client.request("itinerary_create", "POST", "/api/itineraries", json=_itinerary_body(client, "Benchmark trip"))
+    if response is None:
+        return
+    itinerary_id = response.json()["id"]
+    client.request("itinerary_get", "GET", f"/api/itineraries/{itinerary_id}")
+    client.request("itinerary_update", "PUT", f"/api/itineraries/{itinerary_id}", json=_itinerary_body(client, "Updated trip"))
+    client.request("itinerary_summary", "GET", "/api/itineraries/summary")
+    client.request("itinerary_delete", "DELETE", f"/api/itineraries/{itinerary_id}")
+
+def scenario_weather(client: Client) -> None:
+    city = client.rng.choice(CITIES)
+    client.request("weather", "GET", "/api/weather", params={"city": city})
+    client.request("forecast", "GET", "/api/weather/forecast", params={"city": city})
+    client.request("recommendation", "GET", "/api/weather/recommendation", params={"city": city})
+
+SCENARIOS: Dict[str, Callable[[Client], None]] = {
+    "catalog": scenario_catalog,
+    "search": scenario_search,
+    "nearby": scenario_nearby,
+    "generate": scenario_generate,
+    "itinerary_crud": scenario_itinerary_crud,
+    "weather": scenario_weather,
+}
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "throughput": round(len(ordered) / elapsed, 2) if elapsed > 0 else 0.0,
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+    }
+
+def run_load(server: Server, headers: Dict[str, str], scenario: str, concurrency: int, duration: float, warmup: float, seed: int) -> Dict[str, Any]:
+    """Drive one scenario with `concurrency` closed-loop clients and summarize what they measured."""
+    clients = [Client(server, headers, random.Random(seed * 7919 + n)) for n in range(concurrency)]
+    run = SCENARIOS[scenario]
+    started = time.monotonic()
+    measure_from = started + warmup
+    stop_at = measure_from + duration
+
+    def loop(client: Client) -> None:
+        while True:
+            now = time.monotonic()
+            if now >= stop_at:
+                return
+            client.recording = now >= measure_from
+            run(client)
+
+    threads = [threading.Thread(target=loop, args=(client,), daemon=True) for client in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Scenario iterations started before the deadline finish after it
+    elapsed = max(time.monotonic(), stop_at) - measure_from
+
+    endpoints: Dict[str, Any] = {}
+    every, failed = [], 0
+    for label in sorted({label for client in clients for label in client.latencies}):
+        latencies = [latency for client in clients for latency in client.latencies.get(label, [])]
+        errors = sum(client.errors.get(label, 0) for client in clients)
+        endpoints[label] = summarize(latencies, errors, elapsed)
+        every.extend(latencies)
+        failed += errors
+    return {**summarize(every, failed, elapsed), "endpoints": endpoints}
+
+def print_result(result: Dict[str, Any]) -> None:
+    print(
+        f"{result['backend']:<8} {result['catalog_size']:>7} {result['scenario']:<15} c={result['concurrency']:<4}"
+        f" {result['throughput']:>9.1f} req/s  p50 {result['p50_ms']:>8.2f}  p95 {result['p95_ms']:>8.2f}"
+        f"  p99 {result['p99_ms']:>8.2f} ms  errors {result['errors']}"
+    )
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load-test both backends against local Supabase and OpenWeatherMap stubs.")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="catalog sizes (places)")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32], help="concurrent clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per run")
+    parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds before each run")
+    parser.add_argument("--server", choices=("gunicorn", "dev"), default="gunicorn",
+                        help="gunicorn as in production, or the single-process uvicorn/werkzeug servers")
+    parser.add_argument("--workers", type=int, default=2, help="FastAPI gunicorn workers")
+    parser.add_argument("--upstream-delay", type=float, default=0.0, help="seconds the stubs add to each response")
+    parser.add_argument("--admission", action="store_true", help="keep admission control and load shedding on")
+    parser.add_argument("--startup-timeout", type=float, default=300.0, help="seconds to wait for a backend to start")
+    parser.add_argument("--catalogs", default=CATALOG_DIR, help="synthetic catalog directory (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare with a saved results file")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed slowdown when comparing")
+    args = parser.parse_args()
+
+    supabase = SupabaseStub(delay=args.upstream_delay).start()
+    weather = WeatherStub(delay=args.upstream_delay).start()
+    commit = git_commit()
+    results = []
+    try:
+        for size in args.sizes:
+            data_dirs = ensure_catalog(args.catalogs, size, args.seed)
+            for backend in args.backends:
+                server = Server(backend, data_dirs[backend], supabase.url, weather.url, args.server, args.workers, max(args.concurrency), args.admission)
+                try:
+                    server.wait_ready(args.startup_timeout)
+                    headers = authenticate(server)
+                    for scenario in args.scenarios:
+                        for concurrency in args.concurrency:
+                            measured = run_load(server, headers, scenario, concurrency, args.duration, args.warmup, args.seed)
+                            result = {
+                                "backend": backend, "catalog_size": size, "scenario": scenario,
+                                "concurrency": concurrency, **measured,
+                            }
+                            print_result(result)
+                            results.append(result)
+                finally:
+                    server.stop()
+    finally:
+        supabase.stop()
+        weather.stop()
+
+    report = {
+        "meta": {
+            "commit": commit,
+            "created": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "server": args.server,
+            "workers": args.workers,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "upstream_delay": args.upstream_delay,
+            "admission": args.admission,
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{(commit or 'run')[:12]}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare_results(baseline, report, args.tolerance)
+        print_comparison(rows)
+        return 1 if any(row["regressed"] for row in rows) else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
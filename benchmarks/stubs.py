@@ -0,0 +1,303 @@
+"""
+Local stand-ins for Supabase and OpenWeatherMap used by the benchmarks.
+
+SupabaseStub answers the PostgREST (/rest/v1) and GoTrue (/auth/v1/user)
+calls the FastAPI backend makes, keeping tables in memory. Any bearer token
+of the form "bench-<name>" is a valid user. WeatherStub serves deterministic
+/weather and /forecast payloads. Both can add a fixed delay to every response
+to stand in for network latency.
+
+    python -m benchmarks.stubs [--supabase-port 54321] [--weather-port 54322]
+"""
+
+import argparse
+import json
+import re
+import sys
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+# Embedded resources: (parent table, child table) -> child column referencing parent.id
+FOREIGN_KEYS = {("user_itineraries", "itinerary_activities"): "itinerary_id"}
+# Columns filled in on insert when missing, as the database defaults would
+TIMESTAMP_COLUMNS = {"user_itineraries": ("created_at", "updated_at")}
+
+TOKEN_PREFIX = "bench-"
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_StubServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self) -> Any:
+        return json.loads(self.body) if self.body else None
+
+    def _send(self, status: int, payload: Any = None, headers: Optional[Dict[str, str]] = None) -> None:
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _dispatch(self, method: str) -> None:
+        url = urlsplit(self.path)
+        # Always drain the body so the next request on the connection parses
+        self.body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        try:
+            self.server.stub.handle(self, method, url.path, parse_qsl(url.query, keep_blank_values=True))
+        except Exception as e:  # report stub bugs to the client instead of hanging it
+            self._send(500, {"message": f"stub error: {e}"})
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PATCH(self):
+        self._dispatch("PATCH")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, stub: Any, port: int, delay: float):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.stub = stub
+        self.delay = delay
+
+class _Stub:
+    def __init__(self, port: int = 0, delay: float = 0.0):
+        self._server = _StubServer(self, port, delay)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "_Stub":
+        self._thread = threading.Thread(target=self._server.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+def _parse_select(select: str) -> Tuple[List[str], Dict[str, List[str]]]:
+    """Split a PostgREST select into plain columns and embedded resources."""
+    columns, embedded = [], {}
+    for match in re.finditer(r"\s*([\w*]+)\s*(?:\(([^)]*)\))?\s*(?:,|$)", select):
+        name, inner = match.group(1), match.group(2)
+        if inner is not None:
+            embedded[name] = [column.strip() for column in inner.split(",") if column.strip()]
+        elif name:
+            columns.append(name)
+    return columns or ["*"], embedded
+
+def _project(row: Dict[str, Any], columns: List[str]) -> Dict[str, Any]:
+    if "*" in columns:
+        return dict(row)
+    return {column: row.get(column) for column in columns}
+
+def _matches(row: Dict[str, Any], filters: List[Tuple[str, str, str]]) -> bool:
+    for column, operator, value in filters:
+        stored = "" if row.get(column) is None else str(row.get(column))
+        if operator == "eq" and stored != value:
+            return False
+        if operator == "neq" and stored == value:
+            return False
+        if operator == "in" and stored not in [v.strip().strip('"') for v in value.strip("()").split(",")]:
+            return False
+    return True
+
+def _sort_key(value: Any) -> Tuple[int, Any]:
+    # NULLs sort last, as in PostgreSQL's ascending order
+    return (1, "") if value is None else (0, value)
+
+class SupabaseStub(_Stub):
+    """In-memory PostgREST and GoTrue endpoints."""
+
+    def __init__(self, port: int = 0, delay: float = 0.0):
+        super().__init__(port, delay)
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def user(self, token: str) -> Optional[Dict[str, Any]]:
+        if not token.startswith(TOKEN_PREFIX):
+            return None
+        name = token[len(TOKEN_PREFIX):]
+        return {
+            "id": str(uuid.UUID(int=zlib.crc32(name.encode("utf-8")))),
+            "aud": "authenticated",
+            "role": "authenticated",
+            "email": f"{name}@bench.local",
+            "app_metadata": {"provider": "email"},
+            "user_metadata": {"name": name},
+            "created_at": "2024-01-01T00:00:00+00:00",
+        }
+
+    def handle(self, request: _Handler, method: str, path: str, params: List[Tuple[str, str]]) -> None:
+        if path == "/auth/v1/user" and method == "GET":
+            token = request.headers.get("Authorization", "")[len("Bearer "):]
+            user = self.user(token)
+            if user is None:
+                request._send(401, {"code": 401, "msg": "invalid JWT"})
+            else:
+                request._send(200, user)
+            return
+        if not path.startswith("/rest/v1/"):
+            request._send(404, {"message": f"no stub for {method} {path}"})
+            return
+
+        table = path[len("/rest/v1/"):]
+        select, order, filters = "*", [], []
+        limit: Optional[int] = None
+        offset = 0
+        for name, value in params:
+            if name == "select":
+                select = value
+            elif name == "order":
+                order.extend(part for part in value.split(",") if part)
+            elif name == "limit":
+                limit = int(value)
+            elif name == "offset":
+                offset = int(value)
+            elif name not in ("columns", "on_conflict"):
+                operator, _, operand = value.partition(".")
+                filters.append((name, operator, operand))
+
+        with self._lock:
+            rows = self.tables.setdefault(table, [])
+            if method == "POST":
+                body = request._body()
+                inserted = []
+                for row in body if isinstance(body, list) else [body]:
+                    row = dict(row)
+                    row.setdefault("id", str(uuid.uuid4()))
+                    for column in TIMESTAMP_COLUMNS.get(table, ()):
+                        row.setdefault(column, _now())
+                    rows.append(row)
+                    inserted.append(row)
+                result, status = [dict(row) for row in inserted], 201
+            elif method == "PATCH":
+                changes = request._body() or {}
+                result = []
+                for row in rows:
+                    if _matches(row, filters):
+                        row.update(changes)
+                        result.append(dict(row))
+                status = 200
+            elif method == "DELETE":
+                result = [dict(row) for row in rows if _matches(row, filters)]
+                self.tables[table] = [row for row in rows if not _matches(row, filters)]
+                status = 200
+            else:
+                result = self._select(table, rows, select, filters, order, limit, offset)
+                status = 200
+
+        request._send(status, result, {"Content-Range": f"{offset}-{offset + max(len(result) - 1, 0)}/*"})
+
+    def _select(self, table, rows, select, filters, order, limit, offset) -> List[Dict[str, Any]]:
+        columns, embedded = _parse_select(select)
+        matched = [row for row in rows if _matches(row, filters)]
+        # Apply the orderings last to first so the first one takes precedence
+        for part in reversed(order):
+            column, _, direction = part.partition(".")
+            matched.sort(key=lambda row: _sort_key(row.get(column)), reverse=direction.startswith("desc"))
+        matched = matched[offset:offset + limit if limit is not None else None]
+
+        result = []
+        for row in matched:
+            projected = _project(row, columns)
+            for child, child_columns in embedded.items():
+                key = FOREIGN_KEYS.get((table, child))
+                children = self.tables.get(child, []) if key is not None else []
+                projected[child] = [_project(c, child_columns) for c in children if c.get(key) == row.get("id")]
+            result.append(projected)
+        return result
+
+WEATHER_CONDITIONS = (
+    (800, "Clear", "clear sky", "01d"),
+    (802, "Clouds", "scattered clouds", "03d"),
+    (500, "Rain", "light rain", "10d"),
+    (211, "Thunderstorm", "thunderstorm", "11d"),
+)
+
+class WeatherStub(_Stub):
+    """Deterministic OpenWeatherMap /weather and /forecast responses."""
+
+    def _conditions(self, city: str, step: int = 0) -> Dict[str, Any]:
+        seed = zlib.crc32(city.lower().encode("utf-8")) + step
+        weather_id, main, description, icon = WEATHER_CONDITIONS[seed % len(WEATHER_CONDITIONS)]
+        temp = 22 + seed % 13
+        return {
+            "weather": [{"id": weather_id, "main": main, "description": description, "icon": icon}],
+            "main": {
+                "temp": temp, "feels_like": temp + 1, "temp_min": temp - 2, "temp_max": temp + 2,
+                "pressure": 1010, "humidity": 50 + seed % 40,
+            },
+            "wind": {"speed": 2 + seed % 6, "deg": seed % 360},
+        }
+
+    def handle(self, request: _Handler, method: str, path: str, params: List[Tuple[str, str]]) -> None:
+        city = dict(params).get("q", "")
+        endpoint = path.rstrip("/").rsplit("/", 1)[-1]
+        if method != "GET" or not city or endpoint not in ("weather", "forecast"):
+            request._send(404, {"cod": "404", "message": "city not found"})
+            return
+
+        now = int(time.time())
+        if endpoint == "weather":
+            request._send(200, {"name": city, "dt": now, "cod": 200, **self._conditions(city)})
+            return
+        # Five days of three-hourly entries, as the real API returns
+        start = now - now % 10800
+        entries = []
+        for step in range(40):
+            dt = start + step * 10800
+            entries.append({
+                "dt": dt,
+                "dt_txt": datetime.fromtimestamp(dt, timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+                **self._conditions(city, step),
+            })
+        request._send(200, {"cod": "200", "cnt": len(entries), "list": entries, "city": {"name": city}})
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run the Supabase and OpenWeatherMap stubs.")
+    parser.add_argument("--supabase-port", type=int, default=54321)
+    parser.add_argument("--weather-port", type=int, default=54322)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds added to every response")
+    args = parser.parse_args()
+
+    supabase = SupabaseStub(args.supabase_port, args.delay).start()
+    weather = WeatherStub(args.weather_port, args.delay).start()
+    print(f"Supabase stub on {supabase.url}, OpenWeatherMap stub on {weather.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
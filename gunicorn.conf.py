@@ -0,0 +1,28 @@
+import os
+import tempfile
+
+# Admission control (services/admission.py) works across a worker's request
+# threads, so workers must be threaded: the default sync worker serves one
+# request at a time and nothing could ever queue or be shed. Queued requests
+# hold their thread while they wait, so by default half the threads run
+# requests and the other half are left for the route class queues.
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '32'))
+os.environ.setdefault('ADMISSION_CAPACITY', str(max(1, threads // 2)))
+
+# Each worker counts its own requests; they add them up through files here,
+# so a scrape of /api/metrics reaches one worker but reports the server
+os.environ.setdefault(
+    'METRICS_DIR', os.path.join(tempfile.gettempdir(), f"travel-planner-metrics-{os.getenv('PORT', '8000')}")
+)
+
+def on_starting(server):
+    # Start the metrics from zero, as a restarted server should
+    from services.metrics import clear_metrics_dir
+    clear_metrics_dir(os.environ['METRICS_DIR'])
+
+def worker_exit(server, worker):
+    # Record the worker's final counts so the totals keep them
+    from app import shared_metrics
+    if shared_metrics is not None:
+        shared_metrics.stop()
@@ -0,0 +1,3 @@
+
+# Services package
+# Framework-agnostic helpers used by the Flask app in app.py
@@ -0,0 +1,177 @@
+
+import threading
+import time
+from collections import deque, namedtuple
+
+from services.metrics import ADMISSION_EVENTS, ADMISSION_WAIT
+
+# priority: 0 is the most important; limit: requests of the class running at
+# once; queue: requests waiting for a slot; max_wait: seconds a request may
+# wait before it is shed; target: acceptable standing queue delay in seconds
+RouteClass = namedtuple('RouteClass', 'priority limit queue max_wait target')
+
+# Per process. Logins and writes are never shed for lower-priority work, and
+# their queue delay decides when catalog reads, weather and generation are
+ROUTE_CLASSES = {
+    'write': RouteClass(priority=0, limit=32, queue=64, max_wait=2.0, target=0.1),
+    'read': RouteClass(priority=1, limit=16, queue=32, max_wait=1.0, target=0.1),
+    'catalog': RouteClass(priority=1, limit=32, queue=64, max_wait=0.5, target=0.05),
+    'upstream': RouteClass(priority=2, limit=8, queue=16, max_wait=0.5, target=0.1),
+    'generate': RouteClass(priority=2, limit=4, queue=8, max_wait=0.5, target=0.1),
+}
+
+# The first matching path prefix wins; 'database' paths are split into
+# 'read' and 'write' by method
+ROUTE_CLASS_PREFIXES = [
+    ('upstream', ('/api/weather',)),
+    ('generate', ('/api/generate-itinerary',)),
+    ('catalog', ('/api/places', '/api/restaurants')),
+    ('database', ('/api/token', '/api/auth', '/api/itineraries', '/api/profile')),
+]
+
+
+def route_class(method, path):
+    """Return the admission class for a request, or None if it is not admission controlled."""
+    if method == 'OPTIONS':
+        return None
+    for name, prefixes in ROUTE_CLASS_PREFIXES:
+        if path.startswith(prefixes):
+            if name == 'database':
+                return 'read' if method in ('GET', 'HEAD') else 'write'
+            return name
+    return None
+
+
+class _QueueDelay:
+    """
+    The standing queue delay of a class, as in CoDel: the smallest delay
+    seen over the last full interval. A burst that drains quickly leaves it
+    at 0; it only stays high while the queue never empties.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.standing = 0.0
+        self._started = 0.0
+        self._smallest = None
+
+    def _roll(self, now):
+        if now - self._started < self.interval:
+            return
+        # No samples, or none for a whole interval, means nothing was queued
+        recent = now - self._started < 2 * self.interval
+        self.standing = self._smallest if self._smallest is not None and recent else 0.0
+        self._started = now
+        self._smallest = None
+
+    def record(self, delay, now):
+        self._roll(now)
+        self._smallest = delay if self._smallest is None else min(self._smallest, delay)
+
+    def current(self, now):
+        self._roll(now)
+        return self.standing
+
+
+class _Waiter:
+    def __init__(self, enqueued):
+        self.enqueued = enqueued
+        self.admitted = False
+        self.event = threading.Event()
+
+
+class AdmissionController:
+    """
+    Bounded concurrency and queueing per route class, shared by the
+    process's request threads.
+
+    A request starts at once if its class and the process (`capacity`) have
+    a free slot, otherwise its thread waits in the class's queue for up to
+    the class's max_wait. Waiting requests are started in priority order as
+    slots free up. Load is shed early, before it can wait out the timeout:
+    - while a class's standing queue delay is over its target, its requests
+      no longer queue and only start if a slot is free;
+    - while any higher-priority class is over its target, lower-priority
+      requests are refused outright.
+    acquire() returns the Retry-After seconds for a refused request.
+    """
+
+    def __init__(self, classes=ROUTE_CLASSES, capacity=64, interval=1.0, retry_after=2, clock=time.monotonic):
+        self.classes = classes
+        self.capacity = capacity
+        self.retry_after = retry_after
+        self.clock = clock
+        self.total = 0
+        self.inflight = {name: 0 for name in classes}
+        self._queues = {name: deque() for name in classes}
+        self._delays = {name: _QueueDelay(interval) for name in classes}
+        self._lock = threading.Lock()
+
+    def _has_slot(self, name):
+        return self.total < self.capacity and self.inflight[name] < self.classes[name].limit
+
+    def _start(self, name, delay, now):
+        self.total += 1
+        self.inflight[name] += 1
+        self._delays[name].record(delay, now)
+        ADMISSION_WAIT.observe(delay, name)
+
+    def _congested(self, name, now):
+        return self._delays[name].current(now) > self.classes[name].target
+
+    def _outranked(self, name, now):
+        priority = self.classes[name].priority
+        return any(
+            route.priority < priority and self._congested(other, now)
+            for other, route in self.classes.items()
+        )
+
+    def _shed(self, name, reason):
+        ADMISSION_EVENTS.inc(name, reason)
+        return self.retry_after
+
+    def acquire(self, name):
+        """Wait for a slot; returns None once admitted, or the Retry-After seconds if the request is shed."""
+        route = self.classes[name]
+        with self._lock:
+            now = self.clock()
+            if self._outranked(name, now):
+                return self._shed(name, 'shed_priority')
+            if self._has_slot(name) and not self._queues[name]:
+                self._start(name, 0.0, now)
+                ADMISSION_EVENTS.inc(name, 'admitted')
+                return None
+            if self._congested(name, now) or len(self._queues[name]) >= route.queue:
+                return self._shed(name, 'shed_queue')
+            waiter = _Waiter(now)
+            self._queues[name].append(waiter)
+
+        waiter.event.wait(route.max_wait)
+        with self._lock:
+            # A slot may have been handed over just as the wait timed out
+            if waiter.admitted:
+                ADMISSION_EVENTS.inc(name, 'queued')
+                return None
+            self._queues[name].remove(waiter)
+            self._delays[name].record(route.max_wait, self.clock())
+            return self._shed(name, 'shed_timeout')
+
+    def release(self, name):
+        """Free a slot and start the most important waiting request, if any."""
+        with self._lock:
+            self.total -= 1
+            self.inflight[name] -= 1
+            now = self.clock()
+            while self.total < self.capacity:
+                ready = [
+                    (self.classes[other].priority, queue[0].enqueued, other)
+                    for other, queue in self._queues.items()
+                    if queue and self.inflight[other] < self.classes[other].limit
+                ]
+                if not ready:
+                    return
+                _, enqueued, other = min(ready)
+                waiter = self._queues[other].popleft()
+                self._start(other, now - enqueued, now)
+                waiter.admitted = True
+                waiter.event.set()
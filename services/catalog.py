@@ -0,0 +1,124 @@
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from services.compression import compress
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the standard library
+    orjson = None
+
+
+def dumps(obj):
+    """Encode an object as compact JSON bytes, using orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+class _DataFile:
+    def __init__(self, version, data):
+        self.version = version
+        self.data = data
+        self.encoded = OrderedDict()
+        self.queries = OrderedDict()
+
+
+class CatalogCache:
+    """
+    Keep JSON data files in memory and cache encoded views of them.
+
+    Each file is re-read only when its modification time or size changes,
+    and that check itself runs at most every `check_interval` seconds.
+    Encoded views are keyed by (file version, view key), so list endpoints
+    can return stored bytes without serializing anything per request.
+    Compressed variants are cached alongside and built once per version.
+    Both are LRUs; views keyed by client-supplied text such as a search
+    query go in a smaller LRU of their own, so a stream of distinct queries
+    cannot evict the list views.
+    """
+
+    def __init__(self, data_dir, check_interval=2.0, max_encoded=512, max_queries=64):
+        self.data_dir = data_dir
+        self.check_interval = check_interval
+        self.max_encoded = max_encoded
+        self.max_queries = max_queries
+        self._files = {}
+        self._checked_at = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._files)
+
+    def _version(self, path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _get(self, filename):
+        now = time.monotonic()
+        entry = self._files.get(filename)
+        if entry is not None and now - self._checked_at.get(filename, 0) < self.check_interval:
+            return entry
+
+        with self._lock:
+            path = os.path.join(self.data_dir, filename)
+            version = self._version(path)
+            entry = self._files.get(filename)
+            if entry is None or entry.version != version:
+                data = None
+                if version is not None:
+                    with open(path, 'r', encoding='utf-8') as file:
+                        data = json.load(file)
+                entry = self._files[filename] = _DataFile(version, data)
+            self._checked_at[filename] = now
+            return entry
+
+    def load(self, filename):
+        """Return the parsed contents of a data file, or None if it is missing."""
+        return self._get(filename).data
+
+    def version(self, filename):
+        """Return the (mtime, size) version of a data file, or None if it is missing."""
+        return self._get(filename).version
+
+    def _cached(self, cache, max_size, key, build):
+        with self._lock:
+            payload = cache.get(key)
+            if payload is not None:
+                cache.move_to_end(key)
+                return payload
+
+        payload = build()
+        with self._lock:
+            cache[key] = payload
+            while len(cache) > max_size:
+                cache.popitem(last=False)
+        return payload
+
+    def encoded(self, filename, key, build, encoding=None, query=False):
+        """
+        Return encoded JSON for a view of a data file, building it on first use.
+
+        `build` receives the parsed file contents. With an `encoding`, the
+        compressed variant of the same view is returned instead. Pass
+        `query=True` when the key holds text sent by the client.
+        """
+        entry = self._get(filename)
+        if query:
+            cache, max_size = entry.queries, self.max_queries
+        else:
+            cache, max_size = entry.encoded, self.max_encoded
+        payload = self._cached(cache, max_size, (key, None), lambda: dumps(build(entry.data)))
+        if encoding is None:
+            return payload
+        # Only the bounded list views are worth the slowest setting; query
+        # views are compressed at the default level, so distinct queries
+        # cannot each buy a maximum-effort compression
+        return self._cached(cache, max_size, (key, encoding), lambda: compress(payload, encoding, best=not query))
@@ -0,0 +1,55 @@
+
+import gzip
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript', 'image/svg+xml')
+
+
+def negotiate_encoding(accept_encoding):
+    """
+    Pick the supported encoding with the highest q-value in an Accept-Encoding
+    header, preferring br on a tie; codings with q=0 are refused.
+    """
+    accepted = {}
+    for part in (accept_encoding or '').lower().split(','):
+        name, *params = part.split(';')
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name.strip()] = quality
+
+    wildcard = accepted.get('*', 0.0)
+    chosen, chosen_quality = None, 0.0
+    for encoding in ('br', 'gzip'):
+        if encoding == 'br' and brotli is None:
+            continue
+        quality = accepted.get(encoding, wildcard)
+        if quality > chosen_quality:
+            chosen, chosen_quality = encoding, quality
+    return chosen
+
+
+def compress(payload, encoding, best=False):
+    """
+    Compress a body with the given encoding.
+
+    `best` selects the slowest, smallest setting and is meant for bodies that
+    are compressed once and then cached.
+    """
+    if encoding == 'br':
+        return brotli.compress(payload, quality=11 if best else 5)
+    return gzip.compress(payload, compresslevel=9 if best else 6, mtime=0)
+
+
+def is_compressible(mimetype):
+    """Return True for text-like content types worth compressing."""
+    return bool(mimetype) and mimetype.startswith(COMPRESSIBLE_TYPES)
@@ -0,0 +1,274 @@
+
+import glob
+import json
+import os
+import secrets
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+from services.tracing import span
+
+# Latency histogram bucket bounds in seconds (Prometheus "le" labels)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _merge(into, series_by_labels):
+    for labels, series in series_by_labels.items():
+        total = into.get(labels)
+        if total is None:
+            into[labels] = list(series)
+        else:
+            for position, value in enumerate(series):
+                total[position] += value
+
+
+class Metric:
+    """
+    A labelled counter or histogram.
+
+    Every thread updates its own dict of series, so recording a value takes
+    no lock; the (rare) scrape merges the per-thread dicts. A series is a
+    list of per-bucket counts followed by the sum and the count.
+    """
+
+    def __init__(self, name, help_text, labels, kind, buckets=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.kind = kind
+        self.buckets = tuple(buckets)
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}
+        self._lock = threading.Lock()
+
+    def _series(self, labels):
+        shard = getattr(self._local, 'series', None)
+        if shard is None:
+            shard = self._local.series = {}
+            with self._lock:
+                self._retire()
+                self._shards.append((weakref.ref(threading.current_thread()), shard))
+        series = shard.get(labels)
+        if series is None:
+            series = shard[labels] = [0] * (len(self.buckets) + 2)
+        return series
+
+    def _retire(self):
+        # Fold in the series of threads that have exited; the development
+        # server starts a thread per request
+        live = []
+        for thread, shard in self._shards:
+            if thread() is not None and thread().is_alive():
+                live.append((thread, shard))
+            else:
+                _merge(self._retired, shard)
+        self._shards = live
+
+    def inc(self, *labels, amount=1):
+        series = self._series(labels)
+        series[-2] += amount
+        series[-1] += 1
+
+    def observe(self, value, *labels):
+        series = self._series(labels)
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[position] += 1
+                break
+        series[-2] += value
+        series[-1] += 1
+
+    def collect(self):
+        """Merge every thread's series."""
+        with self._lock:
+            self._retire()
+            merged = {labels: list(series) for labels, series in self._retired.items()}
+            shards = [shard for _, shard in self._shards]
+        for shard in shards:
+            # dict.copy() is atomic under the GIL, so a thread recording
+            # concurrently cannot break the iteration
+            _merge(merged, shard.copy())
+        return merged
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _label_text(names, values, extra=''):
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _number(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Registry:
+    """The metrics of one process, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, help_text, labels=()):
+        metric = Metric(name, help_text, labels, 'counter')
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        metric = Metric(name, help_text, labels, 'histogram', buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collect(self):
+        """Merge every metric's series, keyed by metric name."""
+        return {metric.name: metric.collect() for metric in self._metrics}
+
+    def render(self, collected=None):
+        """Render this process's series, or `collected` (as returned by collect()) if given."""
+        if collected is None:
+            collected = self.collect()
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for labels, series in sorted(collected.get(metric.name, {}).items()):
+                if metric.kind == 'counter':
+                    lines.append(f'{metric.name}{_label_text(metric.labels, labels)} {_number(series[-2])}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets, series):
+                    cumulative += count
+                    le = _label_text(metric.labels, labels, f'le="{_number(bound)}"')
+                    lines.append(f'{metric.name}_bucket{le} {_number(cumulative)}')
+                le = _label_text(metric.labels, labels, 'le="+Inf"')
+                lines.append(f'{metric.name}_bucket{le} {_number(series[-1])}')
+                lines.append(f'{metric.name}_sum{_label_text(metric.labels, labels)} {_number(series[-2])}')
+                lines.append(f'{metric.name}_count{_label_text(metric.labels, labels)} {_number(series[-1])}')
+        return '\n'.join(lines) + '\n'
+
+
+class SharedMetrics:
+    """
+    Adds up a registry's series across the worker processes of one server.
+
+    A scrape through the shared port reaches whichever worker accepts it,
+    so every worker writes its series to a file of its own in `directory`,
+    every `interval` seconds and before it answers a scrape, and a scrape
+    renders the sum of all files. Files of workers that have exited are
+    kept so totals never go backwards; gunicorn.conf.py clears the
+    directory when the server starts.
+    """
+
+    def __init__(self, registry, directory, interval=5.0):
+        self.registry = registry
+        self.directory = directory
+        self.interval = interval
+        self._pid = None
+        self._path = ''
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def write(self):
+        """Write this process's series to its file."""
+        with self._lock:
+            if self._pid != os.getpid():
+                # A fresh name per process: a recycled pid must not overwrite a dead worker's totals
+                self._pid = os.getpid()
+                self._path = os.path.join(self.directory, f'{self._pid}-{secrets.token_hex(4)}.json')
+            os.makedirs(self.directory, exist_ok=True)
+            data = {
+                name: [[list(labels), series] for labels, series in series_by_labels.items()]
+                for name, series_by_labels in self.registry.collect().items()
+            }
+            tmp_path = f'{self._path}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self._path)
+
+    def collect(self):
+        """Sum the series in every worker's file."""
+        collected = {}
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, entries in data.items():
+                _merge(collected.setdefault(name, {}), {tuple(labels): series for labels, series in entries})
+        return collected
+
+    def render(self):
+        self.write()
+        return self.registry.render(self.collect())
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError as e:
+                print(f'Metrics: could not write {self._path}: {e}')
+
+    def start(self):
+        """Write this worker's series every `interval` seconds on a background thread."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='metrics-writer', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the writer, recording this worker's final totals."""
+        self._stop.set()
+        self._thread = None
+        self.write()
+
+
+def clear_metrics_dir(directory):
+    """Remove the files of a previous run; call it before the workers start."""
+    for path in glob.glob(os.path.join(directory, '*.json*')):
+        os.remove(path)
+
+
+registry = Registry()
+
+REQUESTS = registry.counter(
+    'http_requests_total', 'HTTP requests by route and status code', ('method', 'route', 'status')
+)
+REQUEST_LATENCY = registry.histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route', ('method', 'route')
+)
+UPSTREAM_LATENCY = registry.histogram(
+    'upstream_request_duration_seconds',
+    'Latency of calls to upstream services such as OpenWeatherMap',
+    ('service', 'operation', 'outcome')
+)
+ADMISSION_EVENTS = registry.counter(
+    'admission_requests_total',
+    'Admission decisions by route class: admitted, queued, shed_priority, shed_queue or shed_timeout',
+    ('route_class', 'outcome')
+)
+ADMISSION_WAIT = registry.histogram(
+    'admission_queue_seconds', 'Time admitted requests waited for a slot', ('route_class',)
+)
+
+
+@contextmanager
+def time_upstream(service, operation):
+    """Time a call to an upstream service, labelled by whether it raised, and trace it as a span."""
+    start = time.perf_counter()
+    outcome = 'error'
+    try:
+        with span(service, operation=operation):
+            yield
+        outcome = 'ok'
+    finally:
+        UPSTREAM_LATENCY.observe(time.perf_counter() - start, service, operation, outcome)
@@ -0,0 +1,119 @@
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing pool or a client's share of it is exhausted."""
+
+
+class PasswordHasher:
+    """
+    Run password hashing and verification on a bounded thread pool.
+
+    The KDF is deliberately slow, so it must not be allowed to occupy every
+    request worker. At most `max_workers` hashes run at once, at most
+    `max_pending` may wait for a slot, and a single client may only hold
+    `per_client` of those slots; anything beyond that raises
+    PasswordHasherBusy immediately instead of queueing. A hash that does
+    not finish within `timeout` seconds raises PasswordHasherBusy too.
+    """
+
+    def __init__(self, method, max_workers=4, max_pending=16, per_client=2, timeout=10.0):
+        self.method = method
+        self.per_client = per_client
+        self.timeout = timeout
+        self._executor = None
+        self._max_workers = max_workers
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._prefix = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self._max_workers,
+                        thread_name_prefix='password-hasher'
+                    )
+        return self._executor
+
+    def _acquire(self, client):
+        with self._lock:
+            in_flight = self._clients.get(client, 0)
+            if client is not None and in_flight >= self.per_client:
+                raise PasswordHasherBusy(f'Too many concurrent requests from {client}')
+            self._clients[client] = in_flight + 1
+
+        if not self._slots.acquire(blocking=False):
+            self._release_client(client)
+            raise PasswordHasherBusy('Password hashing pool is saturated')
+
+    def _release_client(self, client):
+        with self._lock:
+            in_flight = self._clients.get(client, 1) - 1
+            if in_flight <= 0:
+                self._clients.pop(client, None)
+            else:
+                self._clients[client] = in_flight
+
+    def _release(self, client):
+        self._slots.release()
+        self._release_client(client)
+
+    def _run(self, client, fn, *args):
+        self._acquire(client)
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._release(client)
+            raise
+        future.add_done_callback(lambda _: self._release(client))
+        return future
+
+    def _result(self, future):
+        # A KDF that outlasts the timeout means the pool is overloaded; the
+        # hash keeps its slot until it finishes, but the caller gives up
+        try:
+            return future.result(self.timeout)
+        except FutureTimeoutError:
+            raise PasswordHasherBusy('Password hashing timed out')
+
+    def hash(self, password, client=None):
+        """Hash a password with the configured method."""
+        return self._result(self._run(client, generate_password_hash, password, self.method))
+
+    def verify(self, password_hash, password, client=None):
+        """Check a password against a stored hash."""
+        if not password_hash:
+            return False
+        return self._result(self._run(client, check_password_hash, password_hash, password))
+
+    def needs_rehash(self, password_hash):
+        """Return True when a stored hash was made with different parameters."""
+        if self._prefix is None:
+            # werkzeug expands short methods such as "scrypt" into their full
+            # parameter list, so compare against what it actually produces
+            try:
+                sample = self._result(self._run(None, generate_password_hash, '', self.method))
+            except PasswordHasherBusy:
+                return False
+            self._prefix = sample.split('$', 1)[0]
+        return password_hash.split('$', 1)[0] != self._prefix
+
+    def rehash_in_background(self, password, on_done, client=None):
+        """
+        Compute a fresh hash without blocking the caller.
+
+        `on_done` receives the new hash. Upgrades are opportunistic: if the
+        pool is busy the upgrade is skipped and retried on the next login.
+        """
+        try:
+            future = self._run(client, generate_password_hash, password, self.method)
+        except PasswordHasherBusy:
+            return False
+        future.add_done_callback(lambda f: f.exception() is None and on_done(f.result()))
+        return True
@@ -0,0 +1,160 @@
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from datetime import datetime, timezone
+
+from flask import Response
+from werkzeug.wsgi import wrap_file
+
+from services.compression import brotli, negotiate_encoding
+
+# Vite writes fingerprinted bundles such as assets/index-B3kRz1aQ.js
+HASHED_ASSET = re.compile(r'^assets/.+[.-][A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$')
+
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE = 'no-cache'
+
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+
+
+class StaticAsset:
+    __slots__ = ('path', 'size', 'mtime', 'etag', 'mimetype', 'cache_control', 'variants')
+
+    def __init__(self, path, size, mtime, etag, mimetype, cache_control):
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.etag = etag
+        self.mimetype = mimetype
+        self.cache_control = cache_control
+        # encoding -> (path, size) of a precompressed sibling
+        self.variants = {}
+
+
+class StaticAssets:
+    """
+    Index of the built frontend in `root`, scanned once on first use.
+
+    Requests are answered from the index without touching the filesystem
+    metadata again: fingerprinted files under assets/ are marked immutable,
+    precompressed .br/.gz siblings are served when the client accepts them,
+    and index.html (with compressed variants) is held in memory.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._assets = None
+        self._index = None
+        self._index_etag = None
+        self._lock = threading.Lock()
+
+    def _scan(self):
+        assets = {}
+        for directory, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                rel_path = os.path.relpath(path, self.root).replace(os.sep, '/')
+                if rel_path.endswith(('.br', '.gz')):
+                    continue
+
+                stat = os.stat(path)
+                immutable = bool(HASHED_ASSET.match(rel_path))
+                asset = StaticAsset(
+                    path,
+                    stat.st_size,
+                    datetime.fromtimestamp(stat.st_mtime, timezone.utc),
+                    f'{stat.st_mtime_ns:x}-{stat.st_size:x}',
+                    mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                    IMMUTABLE_CACHE if immutable else REVALIDATE_CACHE
+                )
+                for encoding, suffix in PRECOMPRESSED:
+                    if encoding == 'br' and brotli is None:
+                        continue
+                    if os.path.isfile(path + suffix):
+                        asset.variants[encoding] = (path + suffix, os.stat(path + suffix).st_size)
+                assets[rel_path] = asset
+
+        # index.html bodies keyed by content encoding (None for identity)
+        index = None
+        if 'index.html' in assets:
+            with open(assets['index.html'].path, 'rb') as file:
+                body = file.read()
+            index = {None: body, 'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                index['br'] = brotli.compress(body, quality=11)
+        return assets, index
+
+    def _load(self):
+        assets, index = self._scan()
+        # Publish the index before the asset map, which is what readers check
+        self._index = index
+        self._index_etag = hashlib.sha1(index[None]).hexdigest() if index else None
+        self._assets = assets
+
+    def _ensure_scanned(self):
+        if self._assets is None:
+            with self._lock:
+                if self._assets is None:
+                    self._load()
+
+    def rescan(self):
+        """Rebuild the index after a new frontend build has been deployed."""
+        with self._lock:
+            self._load()
+
+    def get(self, rel_path):
+        """Return the indexed asset for a URL path, or None."""
+        self._ensure_scanned()
+        return self._assets.get(rel_path)
+
+    def send(self, asset, request):
+        """Build a response for an asset, preferring a precompressed sibling."""
+        path, size, encoding = asset.path, asset.size, None
+        if asset.variants:
+            encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+            if encoding in asset.variants:
+                path, size = asset.variants[encoding]
+            else:
+                encoding = None
+
+        response = Response(mimetype=asset.mimetype, direct_passthrough=True)
+        response.set_etag(asset.etag + (f'-{encoding}' if encoding else ''))
+        response.last_modified = asset.mtime
+        response.headers['Cache-Control'] = asset.cache_control
+        if asset.variants:
+            response.vary.add('Accept-Encoding')
+
+        if request.if_none_match.contains(response.get_etag()[0]):
+            response.status_code = 304
+            return response
+
+        response.response = wrap_file(request.environ, open(path, 'rb'))
+        response.content_length = size
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        return response
+
+    def send_index(self, request):
+        """Serve index.html from memory, or None if there is no build."""
+        self._ensure_scanned()
+        if self._index is None:
+            return None
+
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+        response = Response(mimetype='text/html')
+        response.set_etag(self._index_etag + (f'-{encoding}' if encoding else ''))
+        response.headers['Cache-Control'] = REVALIDATE_CACHE
+        response.vary.add('Accept-Encoding')
+
+        if request.if_none_match.contains(response.get_etag()[0]):
+            response.status_code = 304
+            return response
+
+        response.set_data(self._index[encoding])
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,168 @@
+
+import heapq
+import sqlite3
+import threading
+import time
+import uuid
+
+
+def new_token_id():
+    """Return a random identifier for a refresh token or token family."""
+    return uuid.uuid4().hex
+
+
+class RevocationList:
+    """
+    In-memory record of revoked refresh tokens and token families.
+
+    Identifiers are stored as 16 raw bytes rather than hex strings, and each
+    entry is kept only until the token it refers to would have expired
+    anyway; a min-heap on expiry lets sweep() drop them in order.
+    """
+
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._tokens = {}
+        self._families = {}
+        self._heap = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._tokens) + len(self._families)
+
+    def _add(self, index, kind, key, expires_at):
+        with self._lock:
+            key = bytes.fromhex(key)
+            if index.get(key, 0) < expires_at:
+                index[key] = expires_at
+                heapq.heappush(self._heap, (expires_at, kind, key))
+
+    def revoke(self, token_id, expires_at):
+        """Revoke a single refresh token until it expires."""
+        self._add(self._tokens, 't', token_id, expires_at)
+
+    def revoke_family(self, family_id, expires_at):
+        """Revoke every token descended from the same login."""
+        self._add(self._families, 'f', family_id, expires_at)
+
+    def is_revoked(self, token_id, family_id):
+        """Return True if the token or its family has been revoked."""
+        with self._lock:
+            return bytes.fromhex(token_id) in self._tokens or bytes.fromhex(family_id) in self._families
+
+    def consume(self, token_id, family_id, expires_at):
+        """
+        Revoke a refresh token as it is used, in one step.
+
+        Returns False if the token or its family was already revoked, so of
+        two requests racing with the same token only one can rotate it.
+        """
+        token_key, family_key = bytes.fromhex(token_id), bytes.fromhex(family_id)
+        with self._lock:
+            if token_key in self._tokens or family_key in self._families:
+                return False
+            self._tokens[token_key] = expires_at
+            heapq.heappush(self._heap, (expires_at, 't', token_key))
+            return True
+
+    def sweep(self):
+        """Drop entries whose tokens have expired and return how many were removed."""
+        with self._lock:
+            now = self._clock()
+            removed = 0
+            while self._heap and self._heap[0][0] <= now:
+                expires_at, kind, key = heapq.heappop(self._heap)
+                index = self._tokens if kind == 't' else self._families
+                if index.get(key) == expires_at:
+                    del index[key]
+                    removed += 1
+            return removed
+
+
+class SQLiteRevocationList:
+    """RevocationList backed by a SQLite file shared between workers."""
+
+    def __init__(self, path, clock=time.time):
+        self.path = path
+        self._clock = clock
+        self._local = threading.local()
+
+        conn = self._connect()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS revoked_tokens ('
+            'kind TEXT NOT NULL, id BLOB NOT NULL, expires_at REAL NOT NULL, '
+            'PRIMARY KEY (kind, id)) WITHOUT ROWID'
+        )
+        conn.execute(
+            'CREATE INDEX IF NOT EXISTS revoked_tokens_expires_at ON revoked_tokens (expires_at)'
+        )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM revoked_tokens').fetchone()[0]
+
+    def _add(self, kind, key, expires_at):
+        self._connect().execute(
+            'INSERT INTO revoked_tokens (kind, id, expires_at) VALUES (?, ?, ?) '
+            'ON CONFLICT (kind, id) DO UPDATE SET expires_at = MAX(expires_at, excluded.expires_at)',
+            (kind, bytes.fromhex(key), expires_at)
+        )
+
+    def revoke(self, token_id, expires_at):
+        """Revoke a single refresh token until it expires."""
+        self._add('t', token_id, expires_at)
+
+    def revoke_family(self, family_id, expires_at):
+        """Revoke every token descended from the same login."""
+        self._add('f', family_id, expires_at)
+
+    def is_revoked(self, token_id, family_id):
+        """Return True if the token or its family has been revoked."""
+        row = self._connect().execute(
+            "SELECT 1 FROM revoked_tokens WHERE (kind = 't' AND id = ?) OR (kind = 'f' AND id = ?) LIMIT 1",
+            (bytes.fromhex(token_id), bytes.fromhex(family_id))
+        ).fetchone()
+        return row is not None
+
+    def consume(self, token_id, family_id, expires_at):
+        """
+        Revoke a refresh token as it is used, in one step.
+
+        Returns False if the token or its family was already revoked; the
+        insert of an already revoked token conflicts, so of two workers
+        racing with the same token only one can rotate it.
+        """
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            family_revoked = conn.execute(
+                "SELECT 1 FROM revoked_tokens WHERE kind = 'f' AND id = ?", (bytes.fromhex(family_id),)
+            ).fetchone() is not None
+            inserted = not family_revoked and conn.execute(
+                "INSERT INTO revoked_tokens (kind, id, expires_at) VALUES ('t', ?, ?) ON CONFLICT (kind, id) DO NOTHING",
+                (bytes.fromhex(token_id), expires_at)
+            ).rowcount == 1
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return inserted
+
+    def sweep(self):
+        """Drop entries whose tokens have expired and return how many were removed."""
+        cursor = self._connect().execute('DELETE FROM revoked_tokens WHERE expires_at <= ?', (self._clock(),))
+        return cursor.rowcount
+
+
+def create_revocation_list(db_path=None):
+    """Build a SQLite-backed revocation list when a path is given, else an in-memory one."""
+    if db_path:
+        return SQLiteRevocationList(db_path)
+    return RevocationList()
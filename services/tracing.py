@@ -0,0 +1,105 @@
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from logging.handlers import RotatingFileHandler
+
+from flask.json.provider import DefaultJSONProvider
+
+
+class Trace:
+    """The spans of one request, with start offsets relative to the request's start."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = []
+
+    def add(self, name, start, end, **attrs):
+        self.spans.append({
+            'name': name,
+            'start_ms': round((start - self.started) * 1000, 2),
+            'duration_ms': round((end - start) * 1000, 2),
+            **attrs,
+        })
+
+
+# Each request thread runs in its own context, so traces never mix
+_current = ContextVar('trace', default=None)
+
+
+def start_trace():
+    """Start tracing the current request; returns the token finish_trace() needs."""
+    return _current.set(Trace())
+
+
+def finish_trace(token):
+    """Stop tracing the current request and return its trace."""
+    trace = _current.get()
+    _current.reset(token)
+    return trace
+
+
+@contextmanager
+def span(name, **attrs):
+    """Record the enclosed block as a span of the current request's trace, if there is one."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        attrs['error'] = type(e).__name__
+        raise
+    finally:
+        trace.add(name, start, time.perf_counter(), **attrs)
+
+
+def traced_view(view):
+    """Wrap a view function so that it runs as the request's 'view' span."""
+    @wraps(view)
+    def traced(*args, **kwargs):
+        with span('view'):
+            return view(*args, **kwargs)
+    return traced
+
+
+class TracedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, with jsonify() traced as the 'serialize' span."""
+
+    def response(self, *args, **kwargs):
+        with span('serialize'):
+            return super().response(*args, **kwargs)
+
+
+class SlowRequestLog:
+    """A rotating file of JSON lines, opened on the first write."""
+
+    def __init__(self, path, max_bytes, backups):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._logger = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        with self._lock:
+            if self._logger is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                handler = RotatingFileHandler(self.path, maxBytes=self.max_bytes, backupCount=self.backups, encoding='utf-8')
+                handler.setFormatter(logging.Formatter('%(message)s'))
+                logger = logging.getLogger(f'slow_requests.{self.path}')
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                logger.addHandler(handler)
+                self._logger = logger
+        return self._logger
+
+    def write(self, record):
+        (self._logger or self._open()).info(json.dumps(record, default=str))
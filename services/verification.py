@@ -0,0 +1,223 @@
+
+import heapq
+import hmac
+import sqlite3
+import threading
+import time
+
+# Outcomes of VerificationCodeStore.check()
+VERIFIED = 'verified'
+INVALID = 'invalid'
+EXPIRED = 'expired'
+LOCKED = 'locked'
+
+
+class VerificationCodeStore:
+    """
+    Bounded in-memory store of email verification codes.
+
+    Every code expires after `ttl` seconds. Expiry is tracked with a min-heap
+    of (expires_at, email) pairs that is swept lazily on each write and
+    check, so abandoned registrations are reclaimed without a background
+    thread. When the store reaches `max_size`, the code closest to expiring
+    is evicted. Each email gets `max_attempts` guesses before its code is
+    discarded.
+    """
+
+    def __init__(self, ttl=900, max_size=10000, max_attempts=5, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.max_attempts = max_attempts
+        self._clock = clock
+        self._entries = {}
+        self._heap = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _pop_expiring(self, now=None):
+        # Heap entries go stale when a code is replaced or removed, so only
+        # pop the ones that still match the live entry
+        while self._heap:
+            expires_at, email = self._heap[0]
+            if now is not None and expires_at > now:
+                return None
+            heapq.heappop(self._heap)
+            entry = self._entries.get(email)
+            if entry is not None and entry['expires_at'] == expires_at:
+                del self._entries[email]
+                return email
+        return None
+
+    def sweep(self):
+        """Drop every expired code and return how many were removed."""
+        with self._lock:
+            now = self._clock()
+            removed = 0
+            while self._pop_expiring(now) is not None:
+                removed += 1
+            return removed
+
+    def put(self, email, code):
+        """Store a new code for an email, replacing any previous one."""
+        with self._lock:
+            now = self._clock()
+            while self._pop_expiring(now) is not None:
+                pass
+
+            if email not in self._entries:
+                while len(self._entries) >= self.max_size:
+                    self._pop_expiring()
+
+            expires_at = now + self.ttl
+            self._entries[email] = {'code': code, 'expires_at': expires_at, 'attempts': 0}
+            heapq.heappush(self._heap, (expires_at, email))
+
+    def check(self, email, code):
+        """
+        Check a submitted code and return VERIFIED, INVALID, EXPIRED or LOCKED.
+
+        A verified code is consumed; a code that has run out of attempts is
+        discarded so the user has to request a new one.
+        """
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None:
+                return INVALID
+
+            if entry['expires_at'] <= self._clock():
+                del self._entries[email]
+                return EXPIRED
+
+            if hmac.compare_digest(str(entry['code']), str(code)):
+                del self._entries[email]
+                return VERIFIED
+
+            entry['attempts'] += 1
+            if entry['attempts'] >= self.max_attempts:
+                del self._entries[email]
+                return LOCKED
+            return INVALID
+
+    def discard(self, email):
+        """Forget any code held for an email."""
+        with self._lock:
+            self._entries.pop(email, None)
+
+
+class SQLiteVerificationCodeStore:
+    """
+    VerificationCodeStore backed by a SQLite file shared between workers.
+
+    The interface and semantics match the in-memory store; expiry uses wall
+    clock time so that every process agrees on it, and the expiry sweep is
+    an indexed range delete.
+    """
+
+    def __init__(self, path, ttl=900, max_size=10000, max_attempts=5, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.max_size = max_size
+        self.max_attempts = max_attempts
+        self._clock = clock
+        self._local = threading.local()
+
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS verification_codes ('
+                'email TEXT PRIMARY KEY, code TEXT NOT NULL, '
+                'expires_at REAL NOT NULL, attempts INTEGER NOT NULL DEFAULT 0)'
+            )
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS verification_codes_expires_at '
+                'ON verification_codes (expires_at)'
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return _Transaction(conn)
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute('SELECT COUNT(*) FROM verification_codes').fetchone()[0]
+
+    def sweep(self):
+        """Drop every expired code and return how many were removed."""
+        with self._connect() as conn:
+            cursor = conn.execute('DELETE FROM verification_codes WHERE expires_at <= ?', (self._clock(),))
+            return cursor.rowcount
+
+    def put(self, email, code):
+        """Store a new code for an email, replacing any previous one."""
+        now = self._clock()
+        with self._connect() as conn:
+            conn.execute('DELETE FROM verification_codes WHERE expires_at <= ?', (now,))
+            conn.execute(
+                'INSERT OR REPLACE INTO verification_codes (email, code, expires_at, attempts) '
+                'VALUES (?, ?, ?, 0)',
+                (email, str(code), now + self.ttl)
+            )
+            conn.execute(
+                'DELETE FROM verification_codes WHERE email IN ('
+                'SELECT email FROM verification_codes ORDER BY expires_at '
+                'LIMIT MAX((SELECT COUNT(*) FROM verification_codes) - ?, 0))',
+                (self.max_size,)
+            )
+
+    def check(self, email, code):
+        """Check a submitted code and return VERIFIED, INVALID, EXPIRED or LOCKED."""
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT code, expires_at, attempts FROM verification_codes WHERE email = ?',
+                (email,)
+            ).fetchone()
+            if row is None:
+                return INVALID
+
+            stored_code, expires_at, attempts = row
+            if expires_at <= self._clock():
+                conn.execute('DELETE FROM verification_codes WHERE email = ?', (email,))
+                return EXPIRED
+
+            if hmac.compare_digest(stored_code, str(code)):
+                conn.execute('DELETE FROM verification_codes WHERE email = ?', (email,))
+                return VERIFIED
+
+            if attempts + 1 >= self.max_attempts:
+                conn.execute('DELETE FROM verification_codes WHERE email = ?', (email,))
+                return LOCKED
+
+            conn.execute('UPDATE verification_codes SET attempts = attempts + 1 WHERE email = ?', (email,))
+            return INVALID
+
+    def discard(self, email):
+        """Forget any code held for an email."""
+        with self._connect() as conn:
+            conn.execute('DELETE FROM verification_codes WHERE email = ?', (email,))
+
+
+class _Transaction:
+    """Run a block inside BEGIN IMMEDIATE so concurrent workers serialize."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
+
+
+def create_verification_store(db_path=None, **options):
+    """Build a SQLite-backed store when a path is given, else an in-memory one."""
+    if db_path:
+        return SQLiteVerificationCodeStore(db_path, **options)
+    return VerificationCodeStore(**options)
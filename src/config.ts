@@ -2,6 +2,8 @@
 export const API_CONFIG = {
   // Legacy configuration kept for backward compatibility
   baseURL: 'https://tisjohgybvntovgogkij.supabase.co',
+  // FastAPI backend (backend/), used for endpoints that aggregate Supabase data
+  apiURL: import.meta.env.VITE_API_URL || 'http://localhost:8000/api',
   // Default image for places when everything else fails
   defaultPlaceImage: 'https://images.unsplash.com/photo-1482938289607-e9573fc25ebb?q=80&w=800',
   // Number of retries for image loading
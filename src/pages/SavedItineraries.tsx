@@ -1,4 +1,5 @@
 import { useEffect, useState } from 'react';
+import axios from 'axios';
 import { Link } from 'react-router-dom';
 import { Calendar, Clock, MapPin, Edit, Trash2, PlusCircle } from 'lucide-react';
 import { useAuth } from '@/contexts/AuthContext';
@@ -25,68 +26,48 @@ import {
   AlertDialogTrigger,
 } from "@/components/ui/alert-dialog";
 import Navbar from '@/components/Navbar';
+import { API_CONFIG } from '@/config';
 
+// Shape of GET /api/itineraries/summary (ItinerarySummary in backend/app/models.py)
 interface SavedItinerary extends UserItinerary {
-  activities_count: number;
+  activity_count: number;
+  day_count: number;
+  first_image: string | null;
+  categories: string[];
 }
 
+// The summary endpoint returns at most 100 itineraries per request
+const SUMMARY_PAGE_SIZE = 100;
+
 const SavedItineraries = () => {
   const [itineraries, setItineraries] = useState<SavedItinerary[]>([]);
   const [loading, setLoading] = useState(true);
-  const { user } = useAuth();
+  const { user, session } = useAuth();
   const { toast } = useToast();
 
   useEffect(() => {
     const fetchItineraries = async () => {
-      if (!user) return;
+      if (!user || !session) return;
 
       try {
-        const { data, error } = await supabase
-          .from('user_itineraries')
-          .select(`
-            id, 
-            title, 
-            days, 
-            start_date, 
-            pace, 
-            budget, 
-            created_at,
-            updated_at,
-            user_id,
-            interests,
-            transportation,
-            include_food
-          `)
-          .eq('user_id', user.id)
-          .order('created_at', { ascending: false });
-
-        if (error) throw error;
-
-        // For each itinerary, get the count of activities
-        if (data) {
-          const itinerariesWithCounts = await Promise.all(
-            data.map(async (itinerary: any) => {
-              const { count, error: countError } = await supabase
-                .from('itinerary_activities')
-                .select('*', { count: 'exact', head: true })
-                .eq('itinerary_id', itinerary.id);
-
-              if (countError) throw countError;
-
-              return {
-                ...itinerary,
-                activities_count: count || 0
-              } as SavedItinerary;
-            })
-          );
-
-          setItineraries(itinerariesWithCounts);
+        // The backend embeds each itinerary's activities, so a page of cards
+        // costs one request instead of one activity query per itinerary
+        const summaries: SavedItinerary[] = [];
+        for (let offset = 0; ; offset += SUMMARY_PAGE_SIZE) {
+          const { data } = await axios.get<SavedItinerary[]>(`${API_CONFIG.apiURL}/itineraries/summary`, {
+            params: { limit: SUMMARY_PAGE_SIZE, offset },
+            headers: { Authorization: `Bearer ${session?.access_token}` }
+          });
+          summaries.push(...data);
+          if (data.length < SUMMARY_PAGE_SIZE) break;
         }
+
+        setItineraries(summaries);
       } catch (error: any) {
         console.error('Error fetching itineraries:', error);
         toast({
           title: "Error fetching itineraries",
-          description: error.message || "Could not load your saved itineraries.",
+          description: error.response?.data?.detail || error.message || "Could not load your saved itineraries.",
           variant: "destructive"
         });
       } finally {
@@ -95,7 +76,7 @@ const SavedItineraries = () => {
     };
 
     fetchItineraries();
-  }, [user, toast]);
+  }, [user, session, toast]);
 
   const handleDeleteItinerary = async (id: string) => {
     try {
@@ -205,7 +186,7 @@ const SavedItineraries = () => {
                       
                       <div className="flex justify-between text-sm">
                         <span className="text-muted-foreground">Activities:</span>
-                        <span className="font-medium">{itinerary.activities_count}</span>
+                        <span className="font-medium">{itinerary.activity_count}</span>
                       </div>
                     </div>
                   </CardContent>
@@ -0,0 +1,10 @@
+
+import os
+import sys
+import tempfile
+
+# Tests import the Flask app, services and benchmarks from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the Flask app's data files and logs out of the working tree
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp(prefix='travel-planner-tests-'))
@@ -0,0 +1,55 @@
+
+import threading
+import time
+
+import pytest
+
+import app as flask_app
+from services.admission import AdmissionController, RouteClass
+
+
+@pytest.fixture
+def slow_weather(monkeypatch):
+    """Make /api/weather block until released, with room for 2 running and 1 queued request."""
+    admission = AdmissionController(
+        classes={'upstream': RouteClass(priority=2, limit=2, queue=1, max_wait=5.0, target=1.0)}, capacity=2
+    )
+    monkeypatch.setattr(flask_app, 'admission', admission)
+    release = threading.Event()
+
+    def view():
+        release.wait(5)
+        return flask_app.jsonify({'ok': True})
+
+    monkeypatch.setitem(flask_app.app.view_functions, 'get_weather', view)
+    yield admission, release
+    release.set()
+
+
+def get(statuses):
+    client = flask_app.app.test_client()
+    response = client.get('/api/weather?city=Vashi', environ_base={'REMOTE_ADDR': '10.0.48.1'})
+    statuses.append(response.status_code)
+
+
+def test_concurrent_requests_queue_and_shed(slow_weather):
+    admission, release = slow_weather
+    statuses = []
+    threads = [threading.Thread(target=get, args=(statuses,)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+
+    deadline = time.monotonic() + 5
+    while (admission.total, len(admission._queues['upstream'])) != (2, 1) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert (admission.total, len(admission._queues['upstream'])) == (2, 1)
+
+    # Both slots are taken and the queue is full
+    get(statuses)
+    assert statuses == [503]
+
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert sorted(statuses) == [200, 200, 200, 503]
+    assert admission.total == 0
@@ -0,0 +1,31 @@
+
+import json
+
+from services.catalog import CatalogCache
+
+
+def make_cache(tmp_path, **kwargs):
+    (tmp_path / 'places.json').write_text(json.dumps([{'id': 1, 'name': 'Fort'}]))
+    return CatalogCache(str(tmp_path), **kwargs)
+
+
+def test_list_views_are_kept_in_lru_order(tmp_path):
+    cache = make_cache(tmp_path, max_encoded=2)
+    builds = []
+    view = lambda name: cache.encoded('places.json', name, lambda data: builds.append(name) or data)
+    view('all')
+    view('region')
+    view('all')
+    view('other')
+    view('all')
+    assert builds == ['all', 'region', 'other']
+
+
+def test_queries_cannot_evict_list_views(tmp_path):
+    cache = make_cache(tmp_path, max_queries=4)
+    builds = []
+    cache.encoded('places.json', 'all', lambda data: builds.append('all') or data)
+    for i in range(1000):
+        cache.encoded('places.json', ('search', str(i), None), lambda data: data, query=True)
+    cache.encoded('places.json', 'all', lambda data: builds.append('all') or data)
+    assert builds == ['all']
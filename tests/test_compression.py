@@ -0,0 +1,29 @@
+
+import pytest
+
+from services import compression
+from services.compression import negotiate_encoding
+
+
+@pytest.fixture
+def with_brotli(monkeypatch):
+    # Negotiation only checks that brotli is importable
+    monkeypatch.setattr(compression, 'brotli', object())
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('gzip, deflate, br', 'br'),
+    ('br;q=0, gzip', 'gzip'),
+    ('gzip;q=1, br;q=0.1', 'gzip'),
+    ('gzip;q=0.5, br;q=0.5', 'br'),
+    ('br;q=0, gzip;q=0', None),
+    ('*;q=0.2, br;q=0.1', 'gzip'),
+    ('identity', None),
+])
+def test_highest_quality_wins(with_brotli, header, expected):
+    assert negotiate_encoding(header) == expected
+
+
+def test_gzip_without_brotli(monkeypatch):
+    monkeypatch.setattr(compression, 'brotli', None)
+    assert negotiate_encoding('br, gzip;q=0.5') == 'gzip'
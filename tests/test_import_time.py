@@ -0,0 +1,10 @@
+
+import pytest
+
+from benchmarks.import_time import DEFAULT_BUDGET_MS, DEFERRED_MODULES, check_backend
+
+
+@pytest.mark.parametrize('backend', sorted(DEFERRED_MODULES))
+def test_backend_imports_within_budget_and_without_side_effects(backend):
+    result = check_backend(backend, DEFAULT_BUDGET_MS, repeat=3)
+    assert result['problems'] == []
@@ -0,0 +1,62 @@
+
+import json
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.kernels import KERNELS, ROOT, SCALED_KERNELS, compare_kernels
+
+
+def report(**kernels):
+    return {'results': [{'kernel': name, 'size': 1000, **stats} for name, stats in kernels.items()]}
+
+
+@pytest.fixture(scope='session')
+def catalogs(tmp_path_factory):
+    return str(tmp_path_factory.mktemp('catalogs'))
+
+
+@pytest.mark.parametrize('kernel', KERNELS)
+def test_kernel_runs(kernel, catalogs, tmp_path):
+    # Each kernel runs in its own process: the backend is imported as `app`, like this Flask app
+    output = tmp_path / 'kernels.json'
+    command = [
+        sys.executable, '-m', 'benchmarks.kernels', '--kernels', kernel, '--sizes', '1000',
+        '--catalogs', catalogs, '--min-time', '0.0001', '--max-time', '0', '--min-rounds', '3',
+        '--output', str(output),
+    ]
+    completed = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+    assert completed.returncode == 0, completed.stderr
+    results = json.loads(output.read_text())['results']
+    assert [result['size'] for result in results] == list(SCALED_KERNELS.get(kernel, (1000,)))
+    assert all(result['rounds'] == 3 and result['min_us'] > 0 for result in results)
+
+
+def test_slowdown_within_the_spread_is_not_flagged():
+    baseline = report(search={'min_us': 100.0, 'iqr_us': 40.0})
+    current = report(search={'min_us': 130.0, 'iqr_us': 10.0})
+    [row] = compare_kernels(baseline, current, 0.2)
+    assert not row['regressed']
+
+
+def test_slowdown_past_threshold_and_spread_is_flagged():
+    baseline = report(search={'min_us': 100.0, 'iqr_us': 5.0})
+    current = report(search={'min_us': 130.0, 'iqr_us': 10.0})
+    [row] = compare_kernels(baseline, current, 0.2)
+    assert row['regressed']
+    assert row['min_us'] == (100.0, 130.0, pytest.approx(0.3))
+
+
+def test_slowdown_within_threshold_is_not_flagged():
+    baseline = report(search={'min_us': 100.0, 'iqr_us': 0.0})
+    current = report(search={'min_us': 115.0, 'iqr_us': 0.0})
+    [row] = compare_kernels(baseline, current, 0.2)
+    assert not row['regressed']
+
+
+def test_old_reports_fall_back_to_stddev():
+    baseline = report(search={'min_us': 100.0, 'stddev_us': 50.0})
+    current = report(search={'min_us': 130.0, 'stddev_us': 1.0})
+    [row] = compare_kernels(baseline, current, 0.2)
+    assert row['spread_us'] == 50.0 and not row['regressed']
@@ -0,0 +1,24 @@
+
+from services.metrics import Registry, SharedMetrics, clear_metrics_dir
+
+
+def worker_registry(requests):
+    registry = Registry()
+    counter = registry.counter('http_requests_total', 'HTTP requests', ('route',))
+    for _ in range(requests):
+        counter.inc('/api/places')
+    return registry
+
+
+def test_scrape_reports_every_worker(tmp_path):
+    first = SharedMetrics(worker_registry(3), str(tmp_path))
+    second = SharedMetrics(worker_registry(4), str(tmp_path))
+    first.write()
+    assert 'http_requests_total{route="/api/places"} 7' in second.render()
+
+
+def test_clear_metrics_dir_resets_the_totals(tmp_path):
+    shared = SharedMetrics(worker_registry(2), str(tmp_path))
+    shared.write()
+    clear_metrics_dir(str(tmp_path))
+    assert shared.collect() == {}
@@ -0,0 +1,65 @@
+
+import pytest
+
+from services.ratelimit import GROUP_LIMITS, SQLiteTokenBucketStore, TokenBucketStore, check_limits
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return TokenBucketStore(clock=FakeClock())
+    return SQLiteTokenBucketStore(str(tmp_path / 'buckets.db'), clock=FakeClock())
+
+
+def test_take_all_charges_every_bucket_or_none(store):
+    limits = [('a', 2, 1.0), ('b', 1, 1.0)]
+    assert store.take_all(limits) == 0
+    # 'b' is empty, so 'a' must keep its last token
+    assert store.take_all(limits) == pytest.approx(1.0)
+    assert store.take('a', 2, 1.0) == 0
+    assert store.take('a', 2, 1.0) > 0
+
+
+def test_denied_client_does_not_drain_the_global_bucket(store):
+    ip_capacity = GROUP_LIMITS['weather']['ip'][0]
+    waits = [check_limits(store, 'weather', '10.0.0.1') for _ in range(100)]
+    assert waits.count(0) == ip_capacity
+    assert check_limits(store, 'weather', '10.0.0.2') == 0
+
+
+def test_bucket_refills_after_the_wait(store):
+    for _ in range(10):
+        check_limits(store, 'auth', '10.0.0.1')
+    wait = check_limits(store, 'auth', '10.0.0.1')
+    assert wait > 0
+    store._clock.now += wait
+    assert check_limits(store, 'auth', '10.0.0.1') == 0
+
+
+def test_user_buckets_are_separate(store):
+    user_capacity = GROUP_LIMITS['supabase']['user'][0]
+    for i in range(user_capacity):
+        assert check_limits(store, 'supabase', f'10.0.1.{i}', 'u1') == 0
+    assert check_limits(store, 'supabase', '10.0.2.1', 'u1') > 0
+    assert check_limits(store, 'supabase', '10.0.2.1', 'u2') == 0
+
+
+def test_forwarded_for_is_ignored_without_trusted_proxies(monkeypatch):
+    import app
+
+    monkeypatch.setattr(app, 'RATE_LIMIT_ENABLED', True)
+    monkeypatch.setattr(app, 'rate_limit_buckets', TokenBucketStore())
+    client = app.app.test_client()
+    statuses = [
+        client.post('/api/token', json={}, headers={'X-Forwarded-For': f'198.51.100.{i}'}).status_code
+        for i in range(20)
+    ]
+    assert statuses.count(429) == 10
@@ -0,0 +1,76 @@
+
+import pytest
+
+import app as flask_app
+from services.verification import VerificationCodeStore
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(flask_app, 'verification_codes', VerificationCodeStore(ttl=900, clock=clock))
+    return clock
+
+
+@pytest.fixture
+def client():
+    return flask_app.app.test_client()
+
+
+def register(client, email, ip):
+    response = client.post(
+        '/api/auth/register', json={'email': email, 'password': 'correct horse'}, environ_base={'REMOTE_ADDR': ip}
+    )
+    assert response.status_code == 201
+
+
+def verify(client, email, code, ip):
+    return client.post('/api/auth/verify', json={'email': email, 'code': code}, environ_base={'REMOTE_ADDR': ip})
+
+
+def resend(client, email, ip):
+    return client.post('/api/auth/resend-verification', json={'email': email}, environ_base={'REMOTE_ADDR': ip})
+
+
+def current_code(email):
+    return flask_app.verification_codes._entries[email]['code']
+
+
+def test_expired_code_can_be_replaced(client, clock):
+    email, ip = 'expired@example.com', '10.0.28.1'
+    register(client, email, ip)
+    code = current_code(email)
+    clock.now += 901
+    assert verify(client, email, code, ip).status_code == 400
+
+    assert resend(client, email, ip).status_code == 200
+    assert verify(client, email, current_code(email), ip).status_code == 200
+
+
+def test_locked_code_can_be_replaced(client, clock):
+    email, ip = 'locked@example.com', '10.0.28.2'
+    register(client, email, ip)
+    statuses = [verify(client, email, 'wrong', ip).status_code for _ in range(5)]
+    assert statuses[-1] == 429
+
+    assert resend(client, email, ip).status_code == 200
+    assert verify(client, email, current_code(email), ip).status_code == 200
+
+
+def test_verified_and_unknown_accounts_get_no_code(client, clock):
+    ip = '10.0.28.3'
+    register(client, 'done@example.com', ip)
+    assert verify(client, 'done@example.com', current_code('done@example.com'), ip).status_code == 200
+
+    for email in ('done@example.com', 'nobody@example.com'):
+        assert resend(client, email, ip).status_code == 200
+        assert email not in flask_app.verification_codes._entries